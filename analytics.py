@@ -0,0 +1,191 @@
+"""Columnar export of game and event outcomes for offline analysis
+
+``export`` streams every placed event joined with its game, event type and
+location through a chunked cursor into a NumPy ``.npz`` file, one array per
+column. Text columns are dictionary-encoded: an integer code array plus a
+``<column>__dict`` array of the distinct values. Columns are spooled to
+temporary files and copied into the archive, so memory use depends on the
+chunk size, not on the number of games.
+
+Usage:
+    python analytics.py export --out games.npz
+    python analytics.py summary games.npz --places 10
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import Any, BinaryIO
+
+import numpy as np
+
+from storage import Storage, create_storage
+
+# Exported columns and their dtypes; object means dictionary-encoded text
+EXPORT_COLUMNS: dict[str, Any] = {
+    "game_id": np.int64,
+    "status": object,
+    "money": np.int32,
+    "energy": np.int32,
+    "key_found": np.bool_,
+    "event_id": np.int32,
+    "event_name": object,
+    "money_change": np.int32,
+    "energy_change": np.int32,
+    "is_key": np.bool_,
+    "is_bully": np.bool_,
+    "resolved": np.bool_,
+    "place_id": np.int32,
+    "place_name": object,
+    "x_coord": np.int32,
+    "y_coord": np.int32,
+}
+DICT_SUFFIX = "__dict"
+CODE_DTYPE = np.int32
+# Locations listed at each end of the summary's ranking, and the fewest openings to be ranked
+SUMMARY_PLACES = 5
+SUMMARY_MIN_OPENED = 5
+
+
+class ColumnSpool:
+    """Appends one column's chunks to a temporary file of raw values"""
+
+    def __init__(self, directory: str, name: str, dtype: Any) -> None:
+        self.name = name
+        self.encoded = dtype is object
+        self.dtype = np.dtype(CODE_DTYPE if self.encoded else dtype)
+        self.length = 0
+        self.codes: dict[str, int] = {}
+        self._path = os.path.join(directory, f"{name}.bin")
+        self._file: BinaryIO = open(self._path, "wb")
+
+    def append(self, values: list[Any]) -> None:
+        if self.encoded:
+            values = [self.codes.setdefault(str(value), len(self.codes)) for value in values]
+        np.asarray(values, dtype=self.dtype).tofile(self._file)
+        self.length += len(values)
+
+    def write_to(self, archive: zipfile.ZipFile) -> None:
+        """Copy the column into the archive as ``<name>.npy``"""
+        self._file.close()
+        with archive.open(f"{self.name}.npy", "w", force_zip64=True) as member, open(self._path, "rb") as data:
+            np.lib.format.write_array_header_2_0(
+                member,
+                {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False, "shape": (self.length,)},
+            )
+            shutil.copyfileobj(data, member)
+        if self.encoded:
+            with archive.open(f"{self.name}{DICT_SUFFIX}.npy", "w") as member:
+                np.lib.format.write_array(member, np.array(list(self.codes), dtype=str))
+
+
+def export_game_events(backend: Storage, path: str, chunk_size: int = 10000) -> int:
+    """Write the columnar export and return the number of rows"""
+    with tempfile.TemporaryDirectory() as spool_dir:
+        spools = [ColumnSpool(spool_dir, name, dtype) for name, dtype in EXPORT_COLUMNS.items()]
+        rows = 0
+        for chunk in backend.iter_game_events(chunk_size):
+            for spool in spools:
+                spool.append([row[spool.name] for row in chunk])
+            rows += len(chunk)
+
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for spool in spools:
+                spool.write_to(archive)
+    return rows
+
+
+def load_export(path: str) -> dict[str, np.ndarray]:
+    """Load an export as column arrays; text columns stay as integer codes"""
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def decode(columns: dict[str, np.ndarray], name: str) -> np.ndarray:
+    """Turn a dictionary-encoded column back into strings"""
+    return columns[name + DICT_SUFFIX][columns[name]]
+
+
+def outcome_by(columns: dict[str, np.ndarray], name: str) -> list[tuple[str, int, int, float, float]]:
+    """Placed and opened counts, and win rates when opened and when left closed, per value of a text column
+
+    Only finished games count. Every game places every event type, so only
+    whether the player opened it tells the types apart. Returns (value,
+    placed, opened, win rate when opened, win rate when not) sorted by the
+    win rate when opened; a rate over no games is NaN and sorts last.
+    """
+    statuses = columns["status" + DICT_SUFFIX].tolist()
+    finished_codes = [statuses.index(status) for status in ("won", "lost", "quit") if status in statuses]
+    finished = np.isin(columns["status"], finished_codes)
+    won = columns["status"][finished] == (statuses.index("won") if "won" in statuses else -1)
+    resolved = columns["resolved"][finished].astype(bool)
+
+    codes = columns[name][finished]
+    values = columns[name + DICT_SUFFIX]
+    placed = np.bincount(codes, minlength=len(values))
+    opened = np.bincount(codes[resolved], minlength=len(values))
+    wins_opened = np.bincount(codes[resolved], weights=won[resolved], minlength=len(values))
+    wins_closed = np.bincount(codes[~resolved], weights=won[~resolved], minlength=len(values))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate_opened = wins_opened / opened
+        rate_closed = wins_closed / (placed - opened)
+    result = [
+        (str(values[i]), int(placed[i]), int(opened[i]), float(rate_opened[i]), float(rate_closed[i]))
+        for i in np.flatnonzero(placed)
+    ]
+    return sorted(result, key=lambda item: np.nan_to_num(item[3], nan=-1.0), reverse=True)
+
+
+def format_rate(rate: float) -> str:
+    return f"{rate:12.1%}" if not np.isnan(rate) else "-".rjust(12)
+
+
+def print_summary(columns: dict[str, np.ndarray], places: int = SUMMARY_PLACES) -> None:
+    game_ids, first = np.unique(columns["game_id"], return_index=True)
+    statuses = decode(columns, "status")[first]
+    print("\n📈 GAME OUTCOMES")
+    print("=" * 66)
+    print(f"Games: {len(game_ids)}, placed events: {len(columns['game_id'])}")
+    for status, count in zip(*np.unique(statuses, return_counts=True)):
+        print(f"  {status.ljust(8)} {count}")
+
+    print("\nWin rate by event type, opened or not (finished games)")
+    print("Event".ljust(20) + "Placed".rjust(10) + "Opened".rjust(10) + "If opened".rjust(13) + "If not".rjust(13))
+    print("-" * 66)
+    for name, placed, opened, rate_opened, rate_closed in outcome_by(columns, "event_name"):
+        print(f"{name.ljust(20)}{placed:10d}{opened:10d} {format_rate(rate_opened)} {format_rate(rate_closed)}")
+
+    # Places whose event was opened often enough for its win rate to mean something
+    ranked = [row for row in outcome_by(columns, "place_name") if row[2] >= SUMMARY_MIN_OPENED]
+    if not ranked:
+        return
+    for title, rows in (("wins", ranked[:places]), ("losses", ranked[::-1][:places])):
+        print(f"\nLocations most often leading to {title} (event opened at least {SUMMARY_MIN_OPENED} times)")
+        print("Location".ljust(20) + "Placed".rjust(10) + "Opened".rjust(10) + "If opened".rjust(13) + "If not".rjust(13))
+        print("-" * 66)
+        for name, placed, opened, rate_opened, rate_closed in rows:
+            print(f"{name[:19].ljust(20)}{placed:10d}{opened:10d} {format_rate(rate_opened)} {format_rate(rate_closed)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export and summarize game outcomes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write the columnar .npz export")
+    export.add_argument("--out", default="game_events.npz")
+    export.add_argument("--chunk-size", type=int, default=10000)
+    export.add_argument("--storage", help="backend (mysql, sqlite; default: $GAME_STORAGE)")
+    summary = commands.add_parser("summary", help="print outcome statistics from an export")
+    summary.add_argument("path")
+    summary.add_argument("--places", type=int, default=SUMMARY_PLACES, help="locations to list as most winning and most losing")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        rows = export_game_events(create_storage(args.storage), args.out, args.chunk_size)
+        print(f"📦 Exported {rows} placed events to {args.out} ({os.path.getsize(args.out)} bytes)")
+    else:
+        print_summary(load_export(args.path), args.places)
+
+
+if __name__ == "__main__":
+    main()
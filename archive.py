@@ -0,0 +1,142 @@
+"""Archive finished games to compressed files and delete them from the live tables
+
+Streams games that were won, lost or quit more than ``--older-than`` minutes
+ago, and games still playing with no action logged for ``--abandon-after``
+minutes (the client crashed or was closed), writes each chunk (game row plus
+its event_locations, actions and snapshots) as one gzip member of JSON lines,
+syncs it to disk, and only then deletes that chunk in batches of
+``--delete-batch`` games. Idle games a server's pool created over
+``--abandon-after`` minutes ago and never handed out (its server stopped
+without cleaning up) are deleted without being archived.
+
+Usage:
+    python archive.py --older-than 1440
+    python archive.py --every 600          # keep running, one pass every 10 minutes
+    python archive.py --keep               # export only, delete nothing (a single pass)
+    python archive.py --abandon-after 0    # leave unfinished games alone
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+from typing import Any, Optional, TypedDict
+
+from storage import GAME_CHILD_TABLES, Storage, chunked, create_storage
+
+
+class ArchiveStats(TypedDict):
+    games: int
+    abandoned: int  # of the games, those archived while still playing
+    idle: int  # pooled games never claimed, deleted without archiving
+    child_rows: int
+    bytes_written: int
+    path: Optional[str]
+
+
+def archive_record(game: dict[str, Any], children: dict[str, list[dict[str, Any]]]) -> dict[str, Any]:
+    """One archived game: its row plus the child rows that belong to it"""
+    return {"game": game, **{table: children.get(table, []) for table in GAME_CHILD_TABLES}}
+
+
+def archive_games(backend: Storage, out_dir: str, older_than: timedelta, chunk_size: int = 500, delete_batch: int = 100, delete: bool = True, abandon_after: Optional[timedelta] = None) -> ArchiveStats:
+    """Run one archiving pass and return what it did
+
+    Games still playing with no activity for ``abandon_after`` are archived
+    too, as they stand, and idle games older than that are deleted; None
+    leaves every unfinished game alone.
+    """
+    stats = ArchiveStats(games=0, abandoned=0, idle=0, child_rows=0, bytes_written=0, path=None)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"games-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+
+    chunks = backend.iter_finished_games(now - older_than, chunk_size)
+    if abandon_after is not None:
+        chunks = chain(chunks, backend.iter_abandoned_games(now - abandon_after, chunk_size))
+    for games in chunks:
+        game_ids = [game["id"] for game in games]
+        children = backend.fetch_game_children(game_ids)
+        by_game: dict[int, dict[str, list[dict[str, Any]]]] = {game_id: {} for game_id in game_ids}
+        for table, rows in children.items():
+            for row in rows:
+                by_game[row["game_id"]].setdefault(table, []).append(row)
+            stats["child_rows"] += len(rows)
+
+        # Each chunk is a complete gzip member, so the file stays readable if a later chunk fails
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as compressed:
+                for game in games:
+                    line = json.dumps(archive_record(game, by_game[game["id"]]), default=str) + "\n"
+                    compressed.write(line.encode())
+            raw.flush()
+            os.fsync(raw.fileno())
+        stats["games"] += len(games)
+        stats["abandoned"] += sum(game["status"] == "playing" for game in games)
+        stats["path"] = path
+
+        # Delete only what is safely on disk, in small transactions
+        if delete:
+            for batch in chunked(game_ids, delete_batch):
+                backend.delete_games(batch)
+
+    if delete and abandon_after is not None:
+        # They have no history to keep; a running server's pool that still lists one skips it when its claim fails
+        stats["idle"] = backend.delete_idle_games(now - abandon_after, delete_batch)
+
+    if stats["path"]:
+        stats["bytes_written"] = os.path.getsize(path)
+    return stats
+
+
+def read_archive(path: str) -> list[dict[str, Any]]:
+    """Load every game record from an archive file"""
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        return [json.loads(line) for line in archive]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Archive and delete finished games")
+    parser.add_argument("--older-than", type=float, default=60.0, help="only games finished this many minutes ago")
+    parser.add_argument("--out", default="archive", help="directory for the .jsonl.gz files")
+    parser.add_argument("--chunk-size", type=int, default=500, help="games streamed per chunk")
+    parser.add_argument("--delete-batch", type=int, default=100, help="games deleted per transaction")
+    parser.add_argument(
+        "--abandon-after", type=float, default=1440.0,
+        help="also archive games still playing with no action, and delete idle pooled games, this many minutes old (0: never)",
+    )
+    parser.add_argument("--keep", action="store_true", help="export only; do not delete")
+    parser.add_argument("--every", type=float, help="keep running, one pass every this many seconds")
+    parser.add_argument("--storage", help="backend (mysql, sqlite; default: $GAME_STORAGE)")
+    args = parser.parse_args()
+    if args.keep and args.every:
+        # Kept games stay in the live tables, so every pass would export them again
+        parser.error("--keep exports without deleting and cannot be combined with --every")
+    abandon_after = timedelta(minutes=args.abandon_after) if args.abandon_after > 0 else None
+
+    backend = create_storage(args.storage)
+    while True:
+        started = time.perf_counter()
+        stats = archive_games(
+            backend, args.out, timedelta(minutes=args.older_than), args.chunk_size, args.delete_batch, not args.keep, abandon_after
+        )
+        elapsed = time.perf_counter() - started
+        if stats["games"]:
+            action = "Archived" if args.keep else "Archived and deleted"
+            print(
+                f"🗄️  {action} {stats['games']} game(s) ({stats['abandoned']} abandoned), {stats['child_rows']} child row(s) "
+                f"→ {stats['path']} ({stats['bytes_written']} bytes) in {elapsed:.1f}s"
+            )
+        else:
+            print("🗄️  No finished games to archive.")
+        if stats["idle"]:
+            print(f"🗑️  Deleted {stats['idle']} idle pooled game(s) left by a stopped server.")
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Run many scripted game sessions without a terminal
+
+Every answer the game asks for (story prompt, name, commands and the Y/N
+event confirmation) comes from a script instead of the keyboard. A script
+file holds one answer per line, with sessions separated by ``---`` lines and
+``#`` comment lines ignored; ``-`` reads it from stdin. Without a script,
+sessions are generated from a seed. Sessions run back to back, or across a
+process pool with ``--workers``.
+
+The transcript is written as JSON lines: one ``step`` record per answer
+(prompt, input, the output it produced and how long that took) and one
+``session`` record per session with its timings.
+
+Usage:
+    python batch.py --script traffic.txt --sessions 100
+    python batch.py --generate 1000 --seed 7 --workers 4 --storage sqlite
+    cat traffic.txt | python batch.py --script - --out -
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterator, Optional, TextIO
+
+import game
+from engine import PLAYING, QUIT
+from storage import create_storage
+
+SESSION_SEPARATOR = "---"
+
+# Commands a generated session picks from, with their weights
+GENERATED_COMMANDS = {"move": 6, "locations": 2, "info": 1, "map": 1, "buy": 1, "route": 1}
+
+
+def parse_script(lines: Iterator[str]) -> list[list[str]]:
+    """Split a script into per-session answer lists"""
+    sessions: list[list[str]] = [[]]
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.strip() == SESSION_SEPARATOR:
+            sessions.append([])
+        elif not line.lstrip().startswith("#"):
+            sessions[-1].append(line)
+    return [answers for answers in sessions if answers]
+
+
+class ScriptedAnswers:
+    """Answers prompts from a fixed list; raises EOFError when it runs out, like input()"""
+
+    def __init__(self, answers: list[str]) -> None:
+        self._answers = iter(answers)
+
+    def __call__(self, prompt: str) -> str:
+        try:
+            return next(self._answers)
+        except StopIteration:
+            raise EOFError from None
+
+
+class GeneratedAnswers:
+    """Answers prompts with seeded random commands, ending with ``quit``"""
+
+    def __init__(self, seed: int, name: str, commands: int) -> None:
+        self._rng = random.Random(seed)
+        self._name = name
+        self._commands = commands
+        self._places = [location["name"].lower() for location in game.get_locations()]
+
+    def __call__(self, prompt: str) -> str:
+        rng = self._rng
+        if prompt.startswith("Enter your name"):
+            return self._name
+        if "(Y/N)" in prompt:
+            # The story prompt and event confirmations
+            return "Y" if "event" in prompt and rng.random() < 0.8 else "N"
+        if "What would you like to do" not in prompt:
+            return ""
+        if self._commands <= 0:
+            return "quit"
+        self._commands -= 1
+        command = rng.choices(list(GENERATED_COMMANDS), weights=list(GENERATED_COMMANDS.values()))[0]
+        if command in ("move", "route"):
+            return f"{command} {rng.choice(self._places)}"
+        if command == "buy":
+            return f"buy {rng.randint(1, 30)}"
+        return command
+
+
+class TranscriptRecorder:
+    """Wraps an answer source, recording each prompt, answer, output and latency"""
+
+    def __init__(self, session: int, answers: Any, output: io.StringIO) -> None:
+        self.session = session
+        self.steps: list[dict[str, Any]] = []
+        self._answers = answers
+        self._output = output
+        self._started = time.perf_counter()
+
+    def close_step(self) -> None:
+        """Attach the output and time since the last answer to its step, unless it already has them"""
+        now = time.perf_counter()
+        text = self._output.getvalue()
+        self._output.seek(0)
+        self._output.truncate()
+        if self.steps and "output" not in self.steps[-1]:
+            self.steps[-1]["output"] = text
+            self.steps[-1]["ms"] = round((now - self._started) * 1000, 3)
+        self._started = now
+
+    def __call__(self, prompt: str) -> str:
+        self.close_step()
+        answer = self._answers(prompt)
+        self.steps.append(
+            {"type": "step", "session": self.session, "step": len(self.steps), "prompt": prompt.strip(), "input": answer}
+        )
+        self._started = time.perf_counter()
+        return answer
+
+
+def run_session(index: int, answers: Any) -> list[dict[str, Any]]:
+    """Play one scripted session and return its transcript records"""
+    output = io.StringIO()
+    recorder = TranscriptRecorder(index, answers, output)
+    started = time.perf_counter()
+    exhausted = False
+    session = None
+    with contextlib.redirect_stdout(output):
+        try:
+            session = game.main_game(recorder)
+        except EOFError:
+            # The script ended mid-game: leave as a player closing the terminal would
+            exhausted = True
+            session = game.current_session
+            game.current_session = None
+            if session:
+                session.finish(QUIT)
+                session.flush()
+        recorder.close_step()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(step["ms"] for step in recorder.steps if "ms" in step)
+    summary = {
+        "type": "session",
+        "session": index,
+        "game_id": session.game_id if session else None,
+        "status": session.status if session else None,
+        "steps": len(recorder.steps),
+        "exhausted": exhausted,
+        "seconds": round(elapsed, 4),
+        "p50_ms": latencies[len(latencies) // 2] if latencies else 0.0,
+        "max_ms": latencies[-1] if latencies else 0.0,
+    }
+    return recorder.steps + [summary]
+
+
+def _init_worker(storage: Optional[str]) -> None:
+    game.use_storage(create_storage(storage))
+
+
+def run_sessions(indices: list[int], scripts: Optional[list[list[str]]], seed: int, commands: int) -> list[dict[str, Any]]:
+    """Play a chunk of sessions in this process"""
+    records: list[dict[str, Any]] = []
+    for index in indices:
+        if scripts:
+            answers: Any = ScriptedAnswers(scripts[index % len(scripts)])
+        else:
+            answers = GeneratedAnswers(seed + index, f"bot{index}", commands)
+        records.extend(run_session(index, answers))
+    return records
+
+
+def run_batch(out: TextIO, sessions: int, scripts: Optional[list[list[str]]], seed: int = 0, commands: int = 50, workers: int = 1, storage: Optional[str] = None, chunk_size: int = 20) -> list[dict[str, Any]]:
+    """Run every session, stream the transcript to ``out`` and return the session records"""
+    chunks = [list(range(start, min(start + chunk_size, sessions))) for start in range(0, sessions, chunk_size)]
+    summaries: list[dict[str, Any]] = []
+
+    def write(records: list[dict[str, Any]]) -> None:
+        for record in records:
+            out.write(json.dumps(record) + "\n")
+            if record["type"] == "session":
+                summaries.append(record)
+
+    if workers <= 1:
+        _init_worker(storage)
+        for index in range(sessions):
+            write(run_sessions([index], scripts, seed, commands))
+        return summaries
+
+    # Open the backend here first, so a fresh SQLite file is set up before the workers share it
+    create_storage(storage).fetch_locations()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(storage,)) as pool:
+        futures = [pool.submit(run_sessions, chunk, scripts, seed, commands) for chunk in chunks]
+        for future in futures:
+            write(future.result())
+    return sorted(summaries, key=lambda record: record["session"])
+
+
+def print_summary(summaries: list[dict[str, Any]], elapsed: float) -> None:
+    statuses: dict[str, int] = {}
+    for record in summaries:
+        statuses[record["status"] or PLAYING] = statuses.get(record["status"] or PLAYING, 0) + 1
+    steps = sum(record["steps"] for record in summaries)
+    seconds = sorted(record["seconds"] for record in summaries) or [0.0]
+    print(f"\n📜 BATCH RUN: {len(summaries)} session(s), {steps} answers in {elapsed:.2f}s", file=sys.stderr)
+    print("=" * 55, file=sys.stderr)
+    print(f"Outcomes: {', '.join(f'{status} {count}' for status, count in sorted(statuses.items()))}", file=sys.stderr)
+    print(f"Session time: p50 {seconds[len(seconds) // 2]:.3f}s, max {seconds[-1]:.3f}s", file=sys.stderr)
+    print(f"Throughput: {len(summaries) / max(elapsed, 1e-9):.1f} sessions/s", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run scripted game sessions without a terminal")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--script", help="answer script, one answer per line, sessions split by '---' ('-' for stdin)")
+    source.add_argument("--generate", type=int, metavar="N", help="run N sessions generated from --seed")
+    parser.add_argument("--sessions", type=int, help="sessions to run from the script, cycling through it (default: one per script session)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--commands", type=int, default=50, help="commands per generated session before quitting")
+    parser.add_argument("--workers", type=int, default=1, help="processes to spread sessions over")
+    parser.add_argument("--storage", help="backend (mysql, sqlite, memory; default: $GAME_STORAGE)")
+    parser.add_argument("--out", default="batch_transcript.jsonl", help="transcript file ('-' for stdout)")
+    args = parser.parse_args()
+
+    scripts = None
+    sessions = args.generate
+    if args.script:
+        with contextlib.ExitStack() as stack:
+            lines = sys.stdin if args.script == "-" else stack.enter_context(open(args.script, encoding="utf-8"))
+            scripts = parse_script(iter(lines))
+        if not scripts:
+            sys.exit("❌ The script has no sessions.")
+        sessions = args.sessions or len(scripts)
+
+    started = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        out = sys.stdout if args.out == "-" else stack.enter_context(open(args.out, "w", encoding="utf-8"))
+        summaries = run_batch(out, sessions, scripts, args.seed, args.commands, args.workers, args.storage)
+    print_summary(summaries, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
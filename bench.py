@@ -0,0 +1,284 @@
+"""Benchmark suite for per-command latency and game-creation throughput
+
+Runs against a local backend (SQLite by default, or the in-memory one) so no
+MySQL server is needed. Results are printed and written as JSON so runs from
+different commits can be compared.
+
+Usage:
+    python bench.py
+    python bench.py --storage memory --iterations 2000 --output bench.json
+    python bench.py --compare old_bench.json
+    python bench.py --memory 320       # also measure memory on a 320x320 town
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Iterator, Optional, TypedDict
+from unittest import mock
+
+import game
+import mapgen
+from session import GameSession
+from storage import MemoryStorage, SQLiteStorage, Storage
+from tracing import tracer
+from world import World
+
+
+class BenchResult(TypedDict):
+    name: str
+    iterations: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    ops_per_sec: float
+    queries_per_op: float
+
+
+class MemoryResult(TypedDict):
+    name: str
+    items: int
+    mib: float
+    bytes_per_item: float
+
+
+def percentile(sorted_samples: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    index = min(len(sorted_samples) - 1, max(0, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+@contextlib.contextmanager
+def scripted_input(answers: list[str]) -> Iterator[None]:
+    """Feed input() from a list of answers and silence print()"""
+    replies = iter(answers)
+    with mock.patch("builtins.input", lambda prompt="": next(replies)), contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def run_bench(name: str, iterations: int, operation: Callable[[int], None], setup: Optional[Callable[[int], None]] = None) -> BenchResult:
+    """Time ``operation(i)`` for each iteration; ``setup(i)`` runs untimed before it"""
+    samples: list[float] = []
+    queries = 0
+    for i in range(iterations):
+        if setup:
+            setup(i)
+        before = tracer.statement_count()
+        started = time.perf_counter()
+        operation(i)
+        samples.append(time.perf_counter() - started)
+        queries += tracer.statement_count() - before
+
+    samples.sort()
+    total = sum(samples)
+    return BenchResult(
+        name=name,
+        iterations=iterations,
+        p50_ms=percentile(samples, 0.50) * 1000,
+        p95_ms=percentile(samples, 0.95) * 1000,
+        p99_ms=percentile(samples, 0.99) * 1000,
+        ops_per_sec=iterations / total if total else 0.0,
+        queries_per_op=queries / iterations,
+    )
+
+
+def playthrough_script() -> list[str]:
+    """Commands that visit every location in grid order, then ride home"""
+    script = ["n", "bench", "locations", "map"]
+    for location in game.get_locations():
+        if not location["is_home"]:
+            script += [f"move {location['name'].lower()}", "y", "info"]
+    script += ["move home", "quit"]
+    return script
+
+
+def run_suite(backend: Storage, iterations: int) -> list[BenchResult]:
+    """Run every benchmark against the given backend"""
+    game.use_storage(backend)
+    locations = game.get_locations()
+    home = game.get_location_info(1)
+    assert home is not None
+    # Warm the world cache so it is not charged to the first benchmark
+    game.get_world().cost_matrix()
+
+    results = [
+        run_bench(
+            "create_game",
+            iterations,
+            lambda i: game.create_game(f"bench{i}", 100, 100),
+        )
+    ]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results.append(
+            run_bench(
+                "locations",
+                iterations,
+                lambda i: game.show_locations(locations[i % len(locations)], locations, 50),
+            )
+        )
+
+    results.append(
+        run_bench(
+            "get_reachable_locations",
+            iterations,
+            lambda i: game.get_reachable_locations(locations[i % len(locations)], 10),
+        )
+    )
+
+    # move + event resolution + write-back, on a fresh game each time
+    sessions: list[GameSession] = []
+
+    def new_session(i: int) -> None:
+        sessions[:] = [GameSession(backend, game.create_game(f"mover{i}", 100, 100))]
+
+    def move_with_event(i: int) -> None:
+        session = sessions[0]
+        target = game.get_location_info(session.unresolved_events()[0]["place_id"])
+        assert target is not None
+        energy_cost = game.calculate_energy_cost(home, target)
+        session.update(energy=session.state["energy"] - energy_cost, location=target["id"])
+        with scripted_input(["Y"]):
+            game.handle_location_event(session, target)
+        session.flush()
+
+    results.append(run_bench("move_with_event", iterations, move_with_event, setup=new_session))
+
+    playthroughs = max(1, iterations // 20)
+    script = playthrough_script()
+
+    def playthrough(i: int) -> None:
+        with scripted_input(script):
+            game.main_game()
+
+    results.append(run_bench("playthrough", playthroughs, playthrough))
+    return results
+
+
+def retained_memory(build: Callable[[], object]) -> tuple[object, int]:
+    """Run ``build()`` and return its result with the bytes still allocated afterwards"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def measure_memory(side: int, sessions: int, event_density: float = 0.01) -> list[MemoryResult]:
+    """Memory kept by the world cache of a side x side town, and by open game sessions"""
+    results: list[MemoryResult] = []
+
+    def result(name: str, items: int, size: int) -> MemoryResult:
+        return MemoryResult(name=name, items=items, mib=size / 2**20, bytes_per_item=size / max(items, 1))
+
+    # The loader generates the rows under tracing, so rows the world keeps are counted
+    town = World(lambda: mapgen.generate_town(side, side, event_density=event_density))
+    _, size = retained_memory(town.reload)
+    results.append(result("world (loaded)", side * side, size))
+    _, size = retained_memory(town.prepare)
+    results.append(result("world (name index)", side * side, size))
+    del town
+
+    backend = MemoryStorage()
+    game.use_storage(backend)
+    game_ids = game.create_games(sessions, "memory", 100, 100)
+    opened, size = retained_memory(lambda: [GameSession(backend, game_id) for game_id in game_ids])
+    results.append(result("game sessions", sessions, size))
+    del opened
+    return results
+
+
+def print_memory(results: list[MemoryResult]) -> None:
+    print("\n🧠 MEMORY")
+    print("=" * 60)
+    print("Structure".ljust(26) + "items".rjust(10) + "MiB".rjust(10) + "bytes/item".rjust(14))
+    print("-" * 60)
+    for result in results:
+        print(result["name"].ljust(26) + f"{result['items']:10d}{result['mib']:10.1f}{result['bytes_per_item']:14.1f}")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: list[BenchResult], baseline: Optional[dict[str, BenchResult]] = None) -> None:
+    print("\n⏱️  BENCHMARK RESULTS")
+    print("=" * 86)
+    print(
+        "Benchmark".ljust(26)
+        + "p50 ms".rjust(9)
+        + "p95 ms".rjust(9)
+        + "p99 ms".rjust(9)
+        + "ops/sec".rjust(11)
+        + "queries/op".rjust(12)
+        + ("  vs baseline" if baseline else "")
+    )
+    print("-" * 86)
+    for result in results:
+        line = (
+            result["name"].ljust(26)
+            + f"{result['p50_ms']:9.3f}{result['p95_ms']:9.3f}{result['p99_ms']:9.3f}"
+            + f"{result['ops_per_sec']:11.0f}{result['queries_per_op']:12.1f}"
+        )
+        if baseline and result["name"] in baseline:
+            old = baseline[result["name"]]["p50_ms"]
+            if old:
+                line += f"  {(result['p50_ms'] - old) / old:+.1%} p50"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark game commands against a local backend")
+    parser.add_argument("--storage", choices=["sqlite", "memory"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--output", default="bench_results.json", help="JSON result file")
+    parser.add_argument("--compare", help="earlier JSON result file to compare p50 latency against")
+    parser.add_argument("--memory", type=int, metavar="SIDE", help="also measure memory on a generated SIDE x SIDE town")
+    parser.add_argument("--memory-sessions", type=int, default=1000, help="game sessions to open for the memory measurement")
+    args = parser.parse_args()
+
+    backend: Storage = SQLiteStorage(args.sqlite_path) if args.storage == "sqlite" else MemoryStorage()
+    results = run_suite(backend, args.iterations)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = {result["name"]: result for result in json.load(baseline_file)["results"]}
+    print_results(results, baseline)
+
+    memory = measure_memory(args.memory, args.memory_sessions) if args.memory else None
+    if memory:
+        print_memory(memory)
+
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(
+            {
+                "revision": git_revision(),
+                "storage": args.storage,
+                "python": sys.version.split()[0],
+                "results": results,
+                **({"memory": memory} if memory else {}),
+            },
+            output_file,
+            indent=2,
+        )
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import random
+from typing import Callable, Optional
+
+import numpy as np
+
+from engine import Action, Engine, EngineState
+from planner import UNREACHABLE, RoutePlanner
+
+# A policy picks the next action for a state
+Policy = Callable[[Engine, EngineState, random.Random], Action]
+
+
+def _afford(state: EngineState, energy_cost: int, target_id: int) -> Action:
+    """Move to the target, buying the missing energy first if needed"""
+    missing = energy_cost - state["energy"]
+    if missing <= 0:
+        return Action("move", target_id)
+    if state["money"] >= missing:
+        return Action("buy", missing)
+    return Action("quit")
+
+
+def random_policy(engine: Engine, state: EngineState, rng: random.Random) -> Action:
+    """Open every event and wander to random reachable locations"""
+    if state["pending_event"] is not None:
+        return Action("open")
+    reachable = engine.world.reachable_indices(state["location"], state["energy"])
+    if len(reachable) == 0 or (state["money"] > 0 and rng.random() < 0.1):
+        if state["money"] > 0:
+            return Action("buy", rng.randint(1, state["money"]))
+        return Action("quit")
+    return Action("move", int(engine.world.get_locations().ids[rng.choice(reachable)]))
+
+
+def greedy_nearest_policy(engine: Engine, state: EngineState, rng: random.Random) -> Action:
+    """Open every event, hop to the cheapest unvisited location, go home once the key is found"""
+    if state["pending_event"] is not None:
+        return Action("open")
+    world = engine.world
+    if state["key_found"]:
+        return _afford(state, world.energy_cost(state["location"], engine.home_id), engine.home_id)
+
+    ids = world.get_locations().ids
+    row = world.cost_row(state["location"])
+    unvisited = np.ones(len(ids), dtype=bool)
+    unvisited[[world.index_of(location_id) for location_id in state["visited"]]] = False
+    if not unvisited.any():
+        return Action("quit")
+    target = int(np.argmin(np.where(unvisited, row, UNREACHABLE)))
+    return _afford(state, int(row[target]), int(ids[target]))
+
+
+def make_planner_policy(planner: Optional[RoutePlanner] = None) -> Policy:
+    """Build a policy that explores and returns home along cheapest multi-hop routes"""
+    planners: dict[int, RoutePlanner] = {}
+
+    def planner_policy(engine: Engine, state: EngineState, rng: random.Random) -> Action:
+        if state["pending_event"] is not None:
+            return Action("open")
+        route_planner = planner
+        if route_planner is None:
+            if id(engine) not in planners:
+                planners[id(engine)] = RoutePlanner(engine.world)
+            route_planner = planners[id(engine)]
+        world = engine.world
+
+        if state["key_found"]:
+            target_id = engine.home_id
+        else:
+            dist = route_planner.costs_from(state["location"])
+            ids = world.get_locations().ids
+            unvisited = np.ones(len(ids), dtype=bool)
+            unvisited[[world.index_of(location_id) for location_id in state["visited"]]] = False
+            if not unvisited.any():
+                return Action("quit")
+            target_id = int(ids[np.argmin(np.where(unvisited, dist, UNREACHABLE))])
+
+        route = route_planner.plan(state["location"], target_id)
+        if route is None:
+            return Action("quit")
+        next_hop = route[0][1]
+        return _afford(state, world.energy_cost(state["location"], next_hop["id"]), next_hop["id"])
+
+    return planner_policy
+
+
+POLICIES: dict[str, Callable[[], Policy]] = {
+    "random": lambda: random_policy,
+    "greedy": lambda: greedy_nearest_policy,
+    "planner": make_planner_policy,
+}
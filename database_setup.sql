@@ -6,6 +6,9 @@ USE bike_in_town;
 
 -- Drop tables if they exist (for clean setup)
 SET FOREIGN_KEY_CHECKS = 0;
+DROP TABLE IF EXISTS scores;
+DROP TABLE IF EXISTS game_snapshots;
+DROP TABLE IF EXISTS game_actions;
 DROP TABLE IF EXISTS event_locations;
 DROP TABLE IF EXISTS routes;
 DROP TABLE IF EXISTS events;
@@ -21,9 +24,16 @@ CREATE TABLE game (
     energy INT DEFAULT 100,
     current_place INT NOT NULL,
     key_found BOOLEAN DEFAULT FALSE,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status VARCHAR(10) NOT NULL DEFAULT 'playing',
+    finished_at DATETIME NULL,
+    layout_seed BIGINT NULL,
+    turn INT NOT NULL DEFAULT 0
 );
 
+-- Finished games by age, scanned by the archiver
+CREATE INDEX idx_game_finished ON game (status, finished_at);
+
 -- Locations table - stores map locations (grid-based)
 CREATE TABLE locations (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -68,6 +78,53 @@ CREATE TABLE event_locations (
     FOREIGN KEY (place_id) REFERENCES locations(id)
 );
 
+-- Lookup index for unresolved events of a game (per place or all at once)
+CREATE INDEX idx_event_locations_lookup ON event_locations (game_id, resolved, place_id);
+
+-- Game_actions table - append-only log of every move, buy and event decision
+-- value: location id for 'move', amount for 'buy', event_locations id for 'event'/'skip'
+CREATE TABLE game_actions (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    game_id INT NOT NULL,
+    turn INT NOT NULL,
+    kind VARCHAR(10) NOT NULL,
+    value INT NOT NULL,
+    money_change INT DEFAULT 0,
+    energy_change INT DEFAULT 0,
+    key_found BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (game_id) REFERENCES game(id) ON DELETE CASCADE,
+    UNIQUE KEY unique_game_turn (game_id, turn)
+);
+
+-- Game_snapshots table - game state every few turns, the starting point for replay
+CREATE TABLE game_snapshots (
+    game_id INT NOT NULL,
+    turn INT NOT NULL,
+    money INT NOT NULL,
+    energy INT NOT NULL,
+    current_place INT NOT NULL,
+    key_found BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (game_id, turn),
+    FOREIGN KEY (game_id) REFERENCES game(id) ON DELETE CASCADE
+);
+
+-- Scores table - one row per won game, written in the same transaction that
+-- finishes it; not tied to game rows, so it outlives archiving
+CREATE TABLE scores (
+    game_id INT PRIMARY KEY,
+    player_name VARCHAR(40) NOT NULL,
+    money INT NOT NULL,
+    energy INT NOT NULL,
+    turns INT NOT NULL,
+    finished_at DATETIME NOT NULL
+);
+
+-- One index per leaderboard, matching its ORDER BY, so a page is an index range scan
+CREATE INDEX idx_scores_money ON scores (money, energy, game_id);
+CREATE INDEX idx_scores_energy ON scores (energy, money, game_id);
+CREATE INDEX idx_scores_turns ON scores (turns, game_id);
+
 -- Insert locations (5x5 grid)
 INSERT INTO locations (name, x_coord, y_coord, is_home) VALUES
 ('HOME', 0, 0, TRUE),
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from mysql.connector import errors, pooling
+
+from storage import load_env_file
+
+load_env_file()
+
+DATABASE_USERNAME = os.environ.get("DATABASE_USERNAME", "root")
+DATABASE_PASSWORD = os.environ.get("DATABASE_PASSWORD", "")
+DATABASE_HOST = os.environ.get("DATABASE_HOST", "localhost")
+DATABASE_PORT = int(os.environ.get("DATABASE_PORT", "3306"))
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", "5"))
+# Seconds to wait for a free connection before giving up
+DATABASE_POOL_TIMEOUT = float(os.environ.get("DATABASE_POOL_TIMEOUT", "10"))
+# Seconds a pooled connection may sit unused before it is pinged on checkout
+DATABASE_PING_AFTER = float(os.environ.get("DATABASE_PING_AFTER", "60"))
+
+_pool: Optional[pooling.MySQLConnectionPool] = None
+_pool_lock = threading.Lock()
+# Server connection id -> when it went back to the pool after a use without connection errors
+_last_used: dict[int, float] = {}
+
+
+def get_pool() -> pooling.MySQLConnectionPool:
+    """Get the connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="bike_in_town",
+                    pool_size=DATABASE_POOL_SIZE,
+                    host=DATABASE_HOST,
+                    port=DATABASE_PORT,
+                    database="bike_in_town",
+                    user=DATABASE_USERNAME,
+                    password=DATABASE_PASSWORD,
+                    autocommit=True,
+                    # Sessions keep no state between uses (transaction() always commits or rolls
+                    # back), so skip the reset round trip that would also run, and could raise,
+                    # inside connection()'s finally
+                    pool_reset_session=False,
+                    # TIMESTAMP columns read and compare in UTC, like the finish times the game writes
+                    time_zone="+00:00",
+                )
+    return _pool
+
+
+def _checkout() -> pooling.PooledMySQLConnection:
+    """Take a connection from the pool, waiting while the pool is exhausted"""
+    deadline = time.monotonic() + DATABASE_POOL_TIMEOUT
+    delay = 0.001
+    while True:
+        try:
+            return get_pool().get_connection()
+        except pooling.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+
+@contextmanager
+def connection() -> Iterator[pooling.PooledMySQLConnection]:
+    """Check a healthy connection out of the pool and return it afterwards
+
+    Only a connection that is new, idle for over ``DATABASE_PING_AFTER``
+    seconds or last failed with a connection error is pinged (and
+    reconnected if the server dropped it), so a busy pool skips the round trip.
+    """
+    conn = _checkout()
+    failed = False
+    try:
+        last_used = _last_used.pop(conn.connection_id, None)
+        if last_used is None or time.monotonic() - last_used > DATABASE_PING_AFTER:
+            conn.ping(reconnect=True, attempts=3, delay=1)
+        yield conn
+    except (errors.OperationalError, errors.InterfaceError):
+        failed = True  # Not marked as used, so its next checkout pings and reconnects it
+        raise
+    finally:
+        if not failed:
+            _last_used[conn.connection_id] = time.monotonic()
+        conn.close()  # Returns the connection to the pool
+
+
+@contextmanager
+def transaction() -> Iterator[pooling.PooledMySQLConnection]:
+    """Check out a connection and run the enclosed statements as one transaction"""
+    with connection() as conn:
+        conn.start_transaction()
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
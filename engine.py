@@ -0,0 +1,176 @@
+import random
+from typing import TYPE_CHECKING, NamedTuple, Optional, TypedDict
+
+from models import EventRow, Layout
+
+if TYPE_CHECKING:
+    from world import World  # Imports NumPy, which the terminal game only needs once a game starts
+
+# Game status values
+PLAYING = "playing"
+WON = "won"
+LOST = "lost"
+QUIT = "quit"
+
+
+class EngineState(TypedDict):
+    money: int
+    energy: int
+    location: int
+    key_found: bool
+    # place_id -> unresolved event at that place
+    events: dict[int, EventRow]
+    visited: frozenset[int]
+    # place_id of an event waiting for an open/skip decision, if any
+    pending_event: Optional[int]
+    turns: int
+    status: str
+
+
+class Action(NamedTuple):
+    kind: str  # "move", "buy", "open", "skip" or "quit"
+    value: int = 0  # location id for move, amount for buy
+
+
+class Outcome(NamedTuple):
+    ok: bool
+    message: str
+    energy_cost: int = 0
+    event: Optional[EventRow] = None
+
+
+def random_layout(place_ids: list[int], event_ids: list[int], rng: Optional[random.Random] = None) -> Layout:
+    """Randomly assign events to locations as (event_id, place_id) pairs
+
+    ``place_ids`` are the non-HOME location ids and ``event_ids`` the event
+    ids, both in table order, as ``World.event_place_ids()`` and
+    ``World.event_ids()`` return them. ``place_ids`` is shuffled in place.
+    """
+    (rng or random).shuffle(place_ids)
+    return list(zip(event_ids, place_ids))
+
+
+def seeded_layout(place_ids: list[int], event_ids: list[int], seed: int) -> Layout:
+    """Event layout for a seed; the same seed and world always give the same layout"""
+    return random_layout(place_ids, event_ids, random.Random(seed))
+
+
+def new_layout_seed(rng: Optional[random.Random] = None) -> int:
+    """Draw a layout seed that fits a signed 64-bit column"""
+    return (rng or random).getrandbits(63)
+
+
+def apply_event(money: int, energy: int, key_found: bool, event: EventRow) -> tuple[int, int, bool]:
+    """Apply an event's effects to money, energy and key_found"""
+    if event["is_bully"]:
+        money = money - money // 2
+    elif event["money_change"] != 0:
+        money += event["money_change"]
+
+    if event["energy_change"] != 0:
+        energy += event["energy_change"]
+
+    if event["is_key"]:
+        key_found = True
+
+    return money, energy, key_found
+
+
+def game_status(money: int, energy: int, key_found: bool, at_home: bool) -> str:
+    """Check the win/lose conditions"""
+    # Won: key found and at home
+    if key_found and at_home:
+        return WON
+    # Lost: no energy and no money to buy more
+    if energy == 0 and money == 0:
+        return LOST
+    return PLAYING
+
+
+class Engine:
+    """Headless game rules: ``step(state, action) -> (state, outcome)``
+
+    States are never mutated; every step returns a new state, so callers can
+    keep earlier states around for search or replay.
+    """
+
+    def __init__(self, world: "World") -> None:
+        self.world = world
+        self.home_id = next(loc["id"] for loc in world.get_locations() if loc["is_home"])
+
+    def new_state(self, layout: Layout, start_money: int = 100, start_energy: int = 100) -> EngineState:
+        """Create the start state of a game with the given event layout"""
+        return EngineState(
+            money=start_money,
+            energy=start_energy,
+            location=self.home_id,
+            key_found=False,
+            events={place_id: self.world.get_event(event_id) for event_id, place_id in layout},  # type: ignore
+            visited=frozenset([self.home_id]),
+            pending_event=None,
+            turns=0,
+            status=PLAYING,
+        )
+
+    def random_state(self, rng: Optional[random.Random] = None, start_money: int = 100, start_energy: int = 100) -> EngineState:
+        """Create the start state of a game with a random event layout"""
+        layout = random_layout(self.world.event_place_ids(), self.world.event_ids(), rng)
+        return self.new_state(layout, start_money, start_energy)
+
+    def _settle(self, state: EngineState) -> EngineState:
+        at_home = self.world.is_home(state["location"])
+        state["status"] = game_status(state["money"], state["energy"], state["key_found"], at_home)
+        return state
+
+    def step(self, state: EngineState, action: Action) -> tuple[EngineState, Outcome]:
+        """Apply one action and return the new state and what happened"""
+        if state["status"] != PLAYING:
+            return state, Outcome(False, "game over")
+
+        new_state = EngineState(**state)  # type: ignore
+        new_state["turns"] += 1
+        pending = new_state["pending_event"]
+        new_state["pending_event"] = None
+
+        if action.kind == "open":
+            if pending is None:
+                return new_state, Outcome(False, "no event")
+            event = new_state["events"][pending]
+            new_state["money"], new_state["energy"], new_state["key_found"] = apply_event(
+                new_state["money"], new_state["energy"], new_state["key_found"], event
+            )
+            new_state["events"] = {place: e for place, e in new_state["events"].items() if place != pending}
+            return self._settle(new_state), Outcome(True, "event", event=event)
+
+        if action.kind == "skip":
+            return self._settle(new_state), Outcome(pending is not None, "skipped")
+
+        if action.kind == "quit":
+            new_state["status"] = QUIT
+            return new_state, Outcome(True, "quit")
+
+        if action.kind == "buy":
+            amount = action.value
+            if amount <= 0 or amount > new_state["money"]:
+                return new_state, Outcome(False, "invalid amount")
+            new_state["money"] -= amount
+            new_state["energy"] += amount
+            return new_state, Outcome(True, "bought")
+
+        if action.kind == "move":
+            if not self.world.has_location(action.value):
+                return new_state, Outcome(False, "unknown location")
+            energy_cost = self.world.energy_cost(new_state["location"], action.value)
+            if energy_cost > new_state["energy"]:
+                return new_state, Outcome(False, "not enough energy", energy_cost)
+            new_state["energy"] -= energy_cost
+            new_state["location"] = action.value
+            new_state["visited"] = new_state["visited"] | {action.value}
+            event = new_state["events"].get(action.value)
+            if event:
+                # Resolved by the next action: "open" applies it, anything else skips it
+                new_state["pending_event"] = action.value
+                return new_state, Outcome(True, "moved", energy_cost, event)
+            return self._settle(new_state), Outcome(True, "moved", energy_cost)
+
+        return new_state, Outcome(False, "unknown action")
@@ -1,133 +1,186 @@
-import random
-import story
-import mysql.connector
-from dotenv import load_dotenv
-import os
-from typing import TypedDict, Optional, Any
-
-load_dotenv()
-
-DATABASE_USERNAME = os.environ.get("DATABASE_USERNAME", "root")
-DATABASE_PASSWORD = os.environ.get("DATABASE_PASSWORD", "")
-
-
-# Type definitions for database rows
-class LocationRow(TypedDict):
-    id: int
-    name: str
-    x_coord: int
-    y_coord: int
-    is_home: bool
-
-
-class EventRow(TypedDict):
-    id: int
-    name: str
-    money_change: int
-    energy_change: int
-    is_key: bool
-    is_bully: bool
-    description: str
-
-
-class GameStateRow(TypedDict):
-    id: int
-    player_name: str
-    money: int
-    energy: int
-    current_place: int
-    key_found: bool
-
-
-class RouteInfoRow(TypedDict):
-    road_condition: str
-    terrain_multiplier: float
-
-
-class EventLocationRow(TypedDict):
-    event_location_id: int
-    name: str
-    money_change: int
-    energy_change: int
-    is_key: bool
-    is_bully: bool
-    description: str
-
-
-# Database connection
-conn = mysql.connector.connect(
-    host="localhost",
-    port=3306,
-    database="bike_in_town",
-    user=DATABASE_USERNAME,
-    password=DATABASE_PASSWORD,
-    autocommit=True,
+import sys
+import threading
+import time
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Callable, Optional
+from models import (
+    LocationRow,
+    ReachableLocation,
+    EventRow,
+    GameStateRow,
+    RouteInfoRow,
+    RouteRow,
+    EventLocationRow,
+    Layout,
+    ScoreRow,
 )
+from storage import IDLE, LEADERBOARDS, GameConflictError, Storage, get_storage, is_database_error, set_storage
+from session import GameSession
+from engine import LOST, QUIT, WON, apply_event, game_status, new_layout_seed, seeded_layout
+from pool import LayoutPool
+from tracing import dump_on_exit, tracer
 
+if TYPE_CHECKING:
+    from planner import RoutePlanner
+    from solver import Tour, TourSolver
+    from world import World
 
-def get_locations() -> list[LocationRow]:
-    """Get all locations from the database"""
-    sql = "SELECT * FROM locations ORDER BY x_coord, y_coord"
-    with conn.cursor(dictionary=True) as cursor:
-        cursor.execute(sql)
-        result = cursor.fetchall()
-    return result  # type: ignore
 
+def load_world() -> tuple[list[LocationRow], list[EventRow], list[RouteRow]]:
+    """Load the static world tables from the storage backend"""
+    backend = get_storage()
+    return backend.fetch_locations(), backend.fetch_events(), backend.fetch_routes()
 
-def get_events() -> list[EventRow]:
-    """Get all events from the database"""
-    sql = "SELECT * FROM events"
-    with conn.cursor(dictionary=True) as cursor:
-        cursor.execute(sql)
-        result = cursor.fetchall()
-    return result  # type: ignore
 
+# Static world data, loaded once and served from memory. The modules behind it pull in
+# NumPy, most of the game's import time, so they are imported on first use
+_world: Optional["World"] = None
+_planner: Optional["RoutePlanner"] = None
+_solver: Optional["TourSolver"] = None
+_world_lock = threading.RLock()
 
-def create_game(player_name: str, start_money: int, start_energy: int) -> int:
-    """Create a new game instance"""
+
+def get_world() -> "World":
+    """Get the world cache, creating it on first use"""
+    global _world
+    if _world is None:
+        with _world_lock:
+            if _world is None:
+                from world import World
+
+                _world = World(load_world)
+    return _world
+
+
+def get_planner() -> "RoutePlanner":
+    """Get the route planner over the world, creating it on first use"""
+    global _planner
+    if _planner is None:
+        with _world_lock:
+            if _planner is None:
+                from planner import RoutePlanner
+
+                _planner = RoutePlanner(get_world())
+    return _planner
+
+
+def get_solver() -> "TourSolver":
+    """Get the hint solver, creating it on first use"""
+    global _solver
+    if _solver is None:
+        with _world_lock:
+            if _solver is None:
+                from solver import TourSolver
+
+                _solver = TourSolver(get_world(), get_planner())
+    return _solver
+
+# Size of the map window drawn around the player
+MAP_VIEW_WIDTH = 21
+MAP_VIEW_HEIGHT = 11
+
+# Starting resources of a new game, and of the idle games the layout pool creates
+START_MONEY = 100
+START_ENERGY = 100
+
+# Entries shown by the leaderboard command
+LEADERBOARD_PAGE = 10
+
+# Pre-generated layouts and idle games, when start_layout_pool() was called
+layout_pool: Optional[LayoutPool] = None
+
+
+def use_storage(backend: Storage) -> None:
+    """Switch the storage backend and reload the world from it"""
+    stop_layout_pool()
+    set_storage(backend)
+    if _world is not None:
+        _world.invalidate()
+
+
+def get_locations() -> Sequence[LocationRow]:
+    """Get all locations"""
+    return get_world().get_locations()
+
+
+def get_events() -> Sequence[EventRow]:
+    """Get all events"""
+    return get_world().get_events()
+
+
+def layout_for_seed(seed: int) -> Layout:
+    """Rebuild the event layout generated from a seed"""
+    world = get_world()
+    return seeded_layout(world.event_place_ids(), world.event_ids(), seed)
+
+
+def create_games(count: int, player_name: str, start_money: int, start_energy: int, batch_size: int = 500, status: str = "playing") -> list[int]:
+    """Create many games at once, one transaction per batch"""
     # Get HOME location (id=1)
     home_location = 1
+    game_ids: list[int] = []
 
-    with conn.cursor(dictionary=True) as cursor:
-        sql = "INSERT INTO game (player_name, money, energy, current_place) VALUES (%s, %s, %s, %s)"
-        cursor.execute(sql, (player_name, start_money, start_energy, home_location))
-        game_id = cursor.lastrowid
-        if game_id is None:
-            raise ValueError("Failed to create game: no game_id returned")
+    for batch_start in range(0, count, batch_size):
+        seeds = [new_layout_seed() for _ in range(min(batch_size, count - batch_start))]
+        layouts = [layout_for_seed(seed) for seed in seeds]
+        game_ids.extend(
+            get_storage().create_games(player_name, start_money, start_energy, home_location, layouts, seeds, status)
+        )
+
+    return game_ids
 
-        # Randomly assign events to locations (excluding HOME)
-        locations = get_locations()
-        events = get_events()
 
-        # Get non-home locations
-        non_home_locations = [loc for loc in locations if not loc["is_home"]]
-        random.shuffle(non_home_locations)
+def create_game(player_name: str, start_money: int, start_energy: int) -> int:
+    """Create a new game instance, with a layout from the pool if there is one"""
+    if layout_pool is None:
+        return create_games(1, player_name, start_money, start_energy)[0]
+    seed, layout = layout_pool.take_layout()
+    return get_storage().create_games(player_name, start_money, start_energy, 1, [layout], [seed])[0]
+
+
+def claim_pooled_game(player_name: str) -> Optional[int]:
+    """Give the player one of the pool's idle games, if one is ready"""
+    while layout_pool is not None and (game_id := layout_pool.take_game()) is not None:
+        if get_storage().claim_game(game_id, player_name):
+            return game_id
+    return None
+
+
+def start_layout_pool(size: int, idle_games: int = 0, seed: Optional[int] = None) -> LayoutPool:
+    """Keep ``size`` seeded layouts and ``idle_games`` idle games ready for new games"""
+    global layout_pool
+    stop_layout_pool()
+    layout_pool = LayoutPool(
+        layout_for_seed,
+        size,
+        lambda seeds, layouts: get_storage().create_games("", START_MONEY, START_ENERGY, 1, layouts, seeds, IDLE),
+        idle_games,
+        seed,
+    )
+    return layout_pool
 
-        # Assign events to random locations
-        for i, event in enumerate(events):
-            if i < len(non_home_locations):
-                sql = "INSERT INTO event_locations (game_id, event_id, place_id) VALUES (%s, %s, %s)"
-                cursor.execute(sql, (game_id, event["id"], non_home_locations[i]["id"]))
 
-    return game_id
+def stop_layout_pool() -> None:
+    """Stop the layout pool and delete the idle games it still holds"""
+    global layout_pool
+    if layout_pool is not None:
+        get_storage().delete_games(layout_pool.close())
+        layout_pool = None
+
+
+def get_leaderboard(board: str = "money", limit: int = LEADERBOARD_PAGE, after: Optional[ScoreRow] = None) -> list[ScoreRow]:
+    """Get a page of won games ranked by money, energy or turns; pass a page's last row to get the next one"""
+    return get_storage().fetch_scores(board, limit, after)
 
 
 def get_game_state(game_id: int) -> Optional[GameStateRow]:
     """Get current game state"""
-    sql = "SELECT * FROM game WHERE id = %s"
-    with conn.cursor(dictionary=True) as cursor:
-        cursor.execute(sql, (game_id,))
-        result = cursor.fetchone()
-    return result  # type: ignore
+    return get_storage().get_game_state(game_id)
 
 
 def get_location_info(location_id: int) -> Optional[LocationRow]:
     """Get location information"""
-    sql = "SELECT * FROM locations WHERE id = %s"
-    with conn.cursor(dictionary=True) as cursor:
-        cursor.execute(sql, (location_id,))
-        result = cursor.fetchone()
-    return result  # type: ignore
+    return get_world().get_location_info(location_id)
 
 
 def calculate_manhattan_distance(loc1: LocationRow, loc2: LocationRow) -> int:
@@ -139,127 +192,90 @@ def calculate_manhattan_distance(loc1: LocationRow, loc2: LocationRow) -> int:
 
 def get_route_info(from_location_id: int, to_location_id: int) -> RouteInfoRow:
     """Get route information between two locations"""
-    sql = """SELECT road_condition, terrain_multiplier
-             FROM routes
-             WHERE from_location_id = %s \
-               AND to_location_id = %s"""
-    with conn.cursor(dictionary=True) as cursor:
-        cursor.execute(sql, (from_location_id, to_location_id))
-        result: Optional[Any] = cursor.fetchone()
-
-    if result:
-        return result  # type: ignore
-    else:
-        # Default road condition if no specific route exists
-        return RouteInfoRow(road_condition="good", terrain_multiplier=1.0)
+    return get_world().get_route_info(from_location_id, to_location_id)
 
 
 def calculate_energy_cost(current_location: LocationRow, target_location: LocationRow) -> int:
     """Calculate energy cost including route-specific road conditions"""
-    base_distance = calculate_manhattan_distance(current_location, target_location)
-    route_info = get_route_info(current_location["id"], target_location["id"])
-    terrain_multiplier = route_info["terrain_multiplier"]
-    return int(base_distance * terrain_multiplier)
-
-
-def get_reachable_locations(current_location: LocationRow, all_locations: list[LocationRow], energy: int) -> list[dict[str, Any]]:
-    """Get locations within energy range"""
-    reachable: list[dict[str, Any]] = []
-    for location in all_locations:
-        if location["id"] != current_location["id"]:
-            distance = calculate_manhattan_distance(current_location, location)
-            energy_cost = calculate_energy_cost(current_location, location)
-            if energy_cost <= energy:
-                reachable.append(
-                    {
-                        "location": location,
-                        "distance": distance,
-                        "energy_cost": energy_cost,
-                    }
-                )
-    return sorted(reachable, key=lambda x: x["energy_cost"])
-
-
-def check_event_at_location(game_id: int, location_id: int) -> Optional[EventLocationRow]:
-    """Check if there's an unresolved event at the current location"""
-    sql = """SELECT el.id AS event_location_id, \
-                    e.name, \
-                    e.money_change, \
-                    e.energy_change, \
-                    e.is_key,
-                    e.is_bully, \
-                    e.description
-             FROM event_locations el
-                      JOIN events e ON el.event_id = e.id
-             WHERE el.game_id = %s \
-               AND el.place_id = %s \
-               AND el.resolved = FALSE"""
-    with conn.cursor(dictionary=True) as cursor:
-        cursor.execute(sql, (game_id, location_id))
-        result = cursor.fetchone()
-    return result  # type: ignore
-
-
-def resolve_event(event_location_id: int) -> None:
-    """Mark an event as resolved"""
-    sql = "UPDATE event_locations SET resolved = TRUE WHERE id = %s"
-    with conn.cursor(dictionary=True) as cursor:
-        cursor.execute(sql, (event_location_id,))
-
-
-def update_game_state(game_id: int, money: Optional[int] = None, energy: Optional[int] = None, location: Optional[int] = None, key_found: Optional[bool] = None) -> None:
-    """Update game state"""
-    updates: list[str] = []
-    values: list[Any] = []
-
-    if money is not None:
-        updates.append("money = %s")
-        values.append(money)
-    if energy is not None:
-        updates.append("energy = %s")
-        values.append(energy)
-    if location is not None:
-        updates.append("current_place = %s")
-        values.append(location)
-    if key_found is not None:
-        updates.append("key_found = %s")
-        values.append(key_found)
-
-    if updates:
-        sql = f"UPDATE game SET {', '.join(updates)} WHERE id = %s"
-        values.append(game_id)
-        with conn.cursor(dictionary=True) as cursor:
-            cursor.execute(sql, values)
-
-
-def display_map(current_location: LocationRow, all_locations: list[LocationRow], visited_locations: set[int]) -> None:
-    """Display the town map"""
-    print("\n🗺️  TOWN MAP")
-    print("=" * 40)
-
-    # Create a 5x5 grid display
-    grid = [["." for _ in range(5)] for _ in range(5)]
-
-    for location in all_locations:
-        x, y = location["x_coord"], location["y_coord"]
-        if location["id"] == current_location["id"]:
-            grid[y][x] = "🏠" if location["is_home"] else "🚲"  # Current position
-        elif location["id"] in visited_locations:
-            grid[y][x] = "✓"  # Visited
-        elif location["is_home"]:
-            grid[y][x] = "🏠"  # Home
+    return get_world().energy_cost(current_location["id"], target_location["id"])
+
+
+def get_reachable_locations(current_location: LocationRow, energy: int, include_self: bool = False) -> list[ReachableLocation]:
+    """Get locations within energy range, cheapest first"""
+    world = get_world()
+    indices, distances, costs = world.reachable(current_location["id"], energy, include_self)
+    locations = world.get_locations()
+    names = locations.names
+    return [
+        ReachableLocation(location_id, names[i], is_home, distance, cost)
+        for location_id, i, is_home, distance, cost in zip(
+            locations.ids[indices].tolist(), indices.tolist(), locations.home[indices].tolist(), distances.tolist(), costs.tolist()
+        )
+    ]
+
+
+def find_location_by_name(location_name: str) -> Optional[LocationRow]:
+    """Find a location by name, ignoring case; unique prefixes and typos also match"""
+    return get_world().find_location(location_name)[0]
+
+
+def resolve_location(location_name: str) -> Optional[LocationRow]:
+    """Find a typed location, or say it was not found and suggest close names"""
+    target_location, suggestions = get_world().find_location(location_name)
+    if not target_location:
+        print(f"❌ Location '{location_name}' not found.")
+        if suggestions:
+            print(f"Did you mean: {', '.join(loc['name'] for loc in suggestions)}?")
         else:
-            grid[y][x] = "?"  # Unknown
+            print("Type 'locations' to see where you can go.")
+    return target_location
+
 
-    # Print grid with coordinates
-    print("   0 1 2 3 4")
-    for y in range(5):
-        print(f"{y}  {' '.join(grid[y])}")
+def plan_route(current_location: LocationRow, target_location: LocationRow) -> Optional[tuple[list[LocationRow], int]]:
+    """Get the cheapest multi-hop path to a location and its energy cost"""
+    return get_planner().plan(current_location["id"], target_location["id"])
 
+
+def display_map(current_location: LocationRow, visited_locations: set[int], width: int = MAP_VIEW_WIDTH, height: int = MAP_VIEW_HEIGHT) -> None:
+    """Display the part of the town map around the player"""
+    print("\n🗺️  TOWN MAP")
+    print("=" * 40)
+
+    # Center a viewport on the player, clamped to the map edges
+    world = get_world()
+    min_x, min_y, max_x, max_y = world.bounds()
+    left = max(min_x, min(current_location["x_coord"] - width // 2, max_x - width + 1))
+    top = max(min_y, min(current_location["y_coord"] - height // 2, max_y - height + 1))
+    columns = range(left, min(left + width, max_x + 1))
+    rows = range(top, min(top + height, max_y + 1))
+
+    label_width = len(str(rows[-1]))
+    print(" " * (label_width + 2) + " ".join(str(x % 10) for x in columns))
+    for y in rows:
+        cells = []
+        for x in columns:
+            location = world.get_location_at(x, y)
+            if location is None:
+                cells.append(".")
+            elif location["id"] == current_location["id"]:
+                cells.append("🏠" if location["is_home"] else "🚲")  # Current position
+            elif location["id"] in visited_locations:
+                cells.append("✓")  # Visited
+            elif location["is_home"]:
+                cells.append("🏠")  # Home
+            else:
+                cells.append("?")  # Unknown
+        print(f"{y:>{label_width}}  {' '.join(cells)}")
+
+    if len(columns) < max_x - min_x + 1 or len(rows) < max_y - min_y + 1:
+        print(
+            f"\nShowing x {columns[0]}-{columns[-1]}, y {rows[0]}-{rows[-1]} "
+            f"of a {max_x - min_x + 1}x{max_y - min_y + 1} town"
+        )
     print("\nLegend: 🏠=Home 🚲=You ✓=Visited ?=Unknown")
 
 
-def show_locations(current_location: LocationRow, all_locations: list[LocationRow], energy: int) -> None:
+def show_locations(current_location: LocationRow, all_locations: Sequence[LocationRow], energy: int) -> None:
     """Display reachable locations with energy costs and route-specific road conditions"""
     print("\n📍 REACHABLE DESTINATIONS")
     print("=" * 55)
@@ -269,38 +285,124 @@ def show_locations(current_location: LocationRow, all_locations: list[LocationRo
     print("Name".ljust(20) + "Energy Cost".ljust(12) + "Route Condition")
     print("-" * 55)
 
-    reachable_count = 0
-    for location in all_locations:
-        energy_cost = calculate_energy_cost(current_location, location)
-        if energy_cost <= energy:
-            marker = (
-                "🏠"
-                if location["is_home"]
-                else ("📍" if location["id"] == current_location["id"] else "  ")
-            )
-            route_info = get_route_info(current_location["id"], location["id"])
-            road_condition = route_info["road_condition"]
-            condition_icon = {
-                "excellent": "🛣️",
-                "good": "🚴",
-                "poor": "⚠️",
-                "rough": "🧗",
-            }.get(road_condition, "🚴")
-
-            print(
-                f"{marker} {location['name'].ljust(18)} {str(energy_cost).ljust(10)} {condition_icon} {road_condition}"
-            )
-            reachable_count += 1
+    reachable = get_reachable_locations(current_location, energy, include_self=True)
+    for location in reachable:
+        energy_cost = location.energy_cost
+        marker = (
+            "🏠"
+            if location.is_home
+            else ("📍" if location.id == current_location["id"] else "  ")
+        )
+        route_info = get_route_info(current_location["id"], location.id)
+        road_condition = route_info["road_condition"]
+        condition_icon = {
+            "excellent": "🛣️",
+            "good": "🚴",
+            "poor": "⚠️",
+            "rough": "🧗",
+        }.get(road_condition, "🚴")
+
+        print(
+            f"{marker} {location.name.ljust(18)} {str(energy_cost).ljust(10)} {condition_icon} {road_condition}"
+        )
+    reachable_count = len(reachable)
 
     if reachable_count == 1:  # Only current location
         print("No other locations within energy range!")
         print("💡 Tip: Use 'buy <amount>' to purchase energy drinks")
 
-    print(f"\nShowing {reachable_count} reachable locations (out of 25 total)")
+    print(f"\nShowing {reachable_count} reachable locations (out of {len(all_locations)} total)")
     print("Legend: 🏠=Home 📍=Current Location")
     print("Routes: 🛣️=Excellent ⚠️=Poor 🚴=Good 🧗=Rough")
 
 
+def show_route(current_location: LocationRow, target_location: LocationRow, energy: int) -> None:
+    """Display the cheapest multi-hop route to a location"""
+    route = plan_route(current_location, target_location)
+    if route is None:
+        print(f"❌ No route to {target_location['name']}.")
+        return
+
+    path, total_cost = route
+    if get_planner().multi_hop:
+        print(f"\n🧭 CHEAPEST ROUTE TO {target_location['name'].upper()}")
+    else:
+        print(f"\n🧭 DIRECT RIDE TO {target_location['name'].upper()}")
+        print("(this map is too big and spread out to search for cheaper multi-hop routes)")
+    print("=" * 55)
+    for hop_from, hop_to in zip(path, path[1:]):
+        hop_cost = calculate_energy_cost(hop_from, hop_to)
+        road_condition = get_route_info(hop_from["id"], hop_to["id"])["road_condition"]
+        print(f"  {hop_from['name']} → {hop_to['name']}: {hop_cost} energy ({road_condition})")
+
+    direct_cost = calculate_energy_cost(current_location, target_location)
+    print(f"\nTotal energy: {total_cost} (direct hop: {direct_cost})")
+    if total_cost > energy:
+        print(f"⚠️ You need {total_cost - energy} more energy for this route.")
+
+
+def find_hint(session: GameSession) -> Optional["Tour"]:
+    """Find the cheapest way to find the key and ride home from the player's position"""
+    game_state = session.state
+    home_location = 1
+    return get_solver().solve(
+        game_state["current_place"],
+        home_location,
+        game_state["energy"],
+        game_state["money"],
+        bool(game_state["key_found"]),
+        session.unresolved_events(),
+    )
+
+
+def show_hint(session: GameSession, tour: Optional["Tour"]) -> None:
+    """Display the way to the key and home found by ``find_hint()``"""
+    game_state = session.state
+    if tour is None:
+        print("😞 There is no way to find the key and get home with your energy and money.")
+        return
+
+    print("\n💡 CHEAPEST WAY " + ("HOME" if game_state["key_found"] else "TO THE KEY AND HOME"))
+    print("=" * 55)
+    for leg in tour.legs:
+        location = get_location_info(leg.location_id)
+        assert location is not None
+        buy = f"buy {leg.buy} energy, then " if leg.buy else ""
+        event = f", open {leg.event['name']}" if leg.event else ""
+        print(f"  {buy}ride to {location['name']}: {leg.energy_cost} energy{event}")
+    print(f"\nTotal energy: {tour.energy} (left at HOME: ${tour.money_left}, {tour.energy_left} energy)")
+
+
+def is_leaderboard_command(command: str) -> bool:
+    return command == "leaderboard" or command.startswith("leaderboard ")
+
+
+def leaderboard_board(command: str) -> Optional[str]:
+    """Get the board a 'leaderboard [money|energy|turns]' command asks for, or None if it is unknown"""
+    parts = command.split()
+    board = parts[1] if len(parts) > 1 else "money"
+    return board if board in LEADERBOARDS else None
+
+
+def show_leaderboard(command: str, scores: Optional[list[ScoreRow]] = None) -> None:
+    """Handle 'leaderboard [money|energy|turns]'; ``scores`` is the page if the caller already fetched it"""
+    board = leaderboard_board(command)
+    if board is None:
+        print(f"❌ Unknown leaderboard. Use: leaderboard [{'|'.join(LEADERBOARDS)}]")
+        return
+    if scores is None:
+        scores = get_leaderboard(board)
+    if not scores:
+        print("🏆 Nobody has won a game yet.")
+        return
+
+    print(f"\n🏆 LEADERBOARD - {'FEWEST TURNS' if board == 'turns' else 'MOST ' + board.upper()}")
+    print("=" * 55)
+    print(f"{'#':>3}  {'Player':<20}{'Money':>8}{'Energy':>8}{'Turns':>8}")
+    for rank, score in enumerate(scores, 1):
+        print(f"{rank:>3}. {score['player_name'][:20]:<20}{'$' + str(score['money']):>8}{score['energy']:>8}{score['turns']:>8}")
+
+
 def show_quick_info(game_state: GameStateRow, current_location: LocationRow) -> None:
     """Show quick status - location, money, and energy only"""
     print(
@@ -308,85 +410,290 @@ def show_quick_info(game_state: GameStateRow, current_location: LocationRow) ->
     )
 
 
-def handle_location_event(game_id: int, current_location: LocationRow) -> None:
-    """Checks for and processes an event at the current location automatically."""
-    game_state = get_game_state(game_id)
-    if not game_state:
-        print("Error: Game state not found.")
-        return
+# Reads one line of player input for a prompt, like input()
+Prompt = Callable[[str], str]
 
-    event = check_event_at_location(game_id, current_location["id"])
-    if not event:
-        print("Sorry! No event in this location.")
-        return
 
+def ask_to_open_event(read: Optional[Prompt] = None) -> bool:
+    """Ask the player whether to open the event here"""
+    read = read or input
     while True:
-        choice = input(
+        choice = read(
             "There is an event here! Do you want to open it? (Y/N): "
         ).upper()
         if choice == "Y":
-            event_location_id = event["event_location_id"]
-            print(f"🗝️ {event['description']}")
-            break
+            return True
         elif choice == "N":
-            print("You chose to skip the event for now!")
-            return
+            return False
         else:
             print("Please choose Y or N!")
 
-    new_money = game_state["money"]
-    new_energy = game_state["energy"]
-    key_found = game_state["key_found"]
 
-    # Get the correct ID for resolving the event
+def open_event(session: GameSession, event: EventLocationRow) -> None:
+    """Apply an event to the session and display the changes"""
+    game_state = session.state
+    old_money = game_state["money"]
+    old_energy = game_state["energy"]
 
+    print(f"🗝️ {event['description']}")
     if event["is_bully"]:
         print("💥 Oh no! You ran into a Bully! They took half your money.")
-        money_lost = new_money // 2
-        new_money = new_money - money_lost
-
-    elif event["money_change"] != 0:
-        new_money += event["money_change"]
 
-    if event["energy_change"] != 0:
-        new_energy += event["energy_change"]
-
-    if event["is_key"]:
-        key_found = True
+    new_money, new_energy, key_found = apply_event(
+        old_money, old_energy, game_state["key_found"], event  # type: ignore
+    )
 
     # Update state
-    update_game_state(game_id, money=new_money, energy=new_energy, key_found=key_found)
-    resolve_event(event_location_id)
+    session.update(money=new_money, energy=new_energy, key_found=key_found)
+    session.resolve_event(event["event_location_id"])
+    session.record("event", event["event_location_id"], new_money - old_money, new_energy - old_energy, bool(event["is_key"]))
 
     # Display changes
-    if new_money != game_state["money"]:
-        change = new_money - game_state["money"]
-        print(f"💰 Money: ${game_state['money']} → ${new_money} ({change:+})")
+    if new_money != old_money:
+        change = new_money - old_money
+        print(f"💰 Money: ${old_money} → ${new_money} ({change:+})")
+
+    if new_energy != old_energy:
+        change = new_energy - old_energy
+        print(f"⚡️ Energy: {old_energy} → {new_energy} ({change:+})")
+
+
+def handle_location_event(session: GameSession, current_location: LocationRow, read: Optional[Prompt] = None) -> None:
+    """Checks for and processes an event at the current location automatically."""
+    event = session.event_at(current_location["id"])
+    if not event:
+        print("Sorry! No event in this location.")
+        return
+
+    if ask_to_open_event(read):
+        open_event(session, event)
+    else:
+        skip_event(session, event)
+
+
+def skip_event(session: GameSession, event: EventLocationRow) -> None:
+    """Leave an event unopened for now"""
+    session.record("skip", event["event_location_id"])
+    print("You chose to skip the event for now!")
+
+
+def show_help() -> None:
+    """Display the available commands"""
+    print("\n🔧 AVAILABLE COMMANDS:")
+    print("info - Show current location, money, and energy")
+    print("map - Display the town map")
+    print("locations - Show reachable locations within energy range")
+    print("buy <amount> - Buy energy drinks (1$ = 1 energy)")
+    print("move <location_name> - Move to a location")
+    print("route <location_name> - Show the cheapest route to a location")
+    print("hint - Show the cheapest way to find the key and get home")
+    print("leaderboard [money|energy|turns] - Show the best won games")
+    print("quit - Exit the game")
+
+
+def buy_energy(session: GameSession, command: str) -> None:
+    """Handle 'buy <amount>'"""
+    game_state = session.state
+    try:
+        amount = int(command.split()[1])
+        if amount <= 0:
+            print("❌ Please enter a positive amount.")
+        elif amount > game_state["money"]:
+            print("❌ You don't have enough money.")
+        else:
+            new_money = game_state["money"] - amount
+            new_energy = game_state["energy"] + amount
+            session.update(money=new_money, energy=new_energy)
+            session.record("buy", amount, -amount, amount)
+            print(
+                f"✅ Bought {amount} energy for ${amount}. Energy: {new_energy}, Money: ${new_money}"
+            )
+    except (ValueError, IndexError):
+        print("❌ Invalid format. Use: buy <amount>")
+
+
+def move_player(session: GameSession, current_location: LocationRow, command: str, visited_locations: set[int]) -> Optional[LocationRow]:
+    """Handle 'move <location_name>'; returns the new location if the player moved"""
+    game_state = session.state
+    location_name = " ".join(command.split()[1:]).title()
+
+    # Find the location
+    target_location = resolve_location(location_name)
+    if not target_location:
+        return None
+
+    energy_cost = calculate_energy_cost(current_location, target_location)
+    route_info = get_route_info(current_location["id"], target_location["id"])
+    road_condition = route_info["road_condition"]
+    if energy_cost > game_state["energy"]:
+        print(
+            f"❌ Not enough energy! Need {energy_cost}, have {game_state['energy']}"
+        )
+        if road_condition in ["poor", "rough"]:
+            print(
+                f"⚠️ The route from {current_location['name']} to {target_location['name']} has {road_condition} conditions!"
+            )
+        return None
+
+    new_energy = game_state["energy"] - energy_cost
+    session.update(energy=new_energy, location=target_location["id"])
+    session.record("move", target_location["id"], energy_change=-energy_cost)
+    visited_locations.add(target_location["id"])
+    if road_condition == "excellent":
+        road_msg = " (smooth ride! 🛣️)"
+    elif road_condition == "poor":
+        road_msg = " (bumpy route ⚠️)"
+    elif road_condition == "rough":
+        road_msg = " (rough terrain! 🧗)"
+    else:
+        road_msg = " (normal route 🚴)"
+    print(
+        f"🚲 Moved to {target_location['name']}{road_msg} Energy remaining: {new_energy}"
+    )
+    return target_location
+
+
+def check_game_over(session: GameSession) -> bool:
+    """Check the win/lose conditions after a move and announce the result"""
+    game_state = session.state
+    current_location = get_location_info(game_state["current_place"])
+    if not current_location:
+        print("Error: Current location not found.")
+        return True
+
+    status = game_status(
+        game_state["money"],
+        game_state["energy"],
+        game_state["key_found"],
+        current_location["is_home"],
+    )
+
+    # Check if won (key found and at home)
+    if status == WON:
+        session.finish(WON)
+        print("\n🎉 CONGRATULATIONS! 🎉")
+        print("You found the key and made it back home!")
+        print(
+            f"Final score - Money: ${game_state['money']}, Energy: {game_state['energy']}"
+        )
+        return True
+
+    # Check if lost (no energy and no money to buy more)
+    if status == LOST:
+        session.finish(LOST)
+        print("\n💀 GAME OVER!")
+        print("You ran out of both energy and money!")
+        return True
+
+    if game_state["energy"] == 0:
+        print(
+            "⚠️ Warning: You're out of energy! Use 'buy' command to purchase energy drinks."
+        )
+    return False
+
+
+def run_command(session: GameSession, command: str, visited_locations: set[int]) -> tuple[bool, Optional[LocationRow]]:
+    """Run one command; returns whether the game is over and where the player arrived, if they moved
+
+    Events at the new location and the win/lose check after a move are left
+    to the caller, which decides how to ask the player about the event.
+    """
+    game_state = session.state
+    current_location = get_location_info(game_state["current_place"])
+    if not current_location:
+        print("Error: Current location not found.")
+        return True, None
+    all_locations = get_locations()
+
+    if command == "help":
+        show_help()
+
+    elif command == "info":
+        show_quick_info(game_state, current_location)
+
+    elif command == "map":
+        display_map(current_location, visited_locations)
+
+    elif command == "locations":
+        show_locations(current_location, all_locations, game_state["energy"])
+
+    elif command == "debug":
+        print(f"DEBUG: Current location data: {current_location}")
+        print(
+            f"DEBUG: Sample location data: {all_locations[1] if len(all_locations) > 1 else 'None'}"
+        )
+
+    elif command == "stats":
+        print(tracer.report())
+
+    elif command == "hint":
+        show_hint(session, find_hint(session))
+
+    elif is_leaderboard_command(command):
+        show_leaderboard(command)
+
+    elif command.startswith("buy "):
+        buy_energy(session, command)
+
+    elif command.startswith("move "):
+        return False, move_player(session, current_location, command, visited_locations)
+
+    elif command.startswith("route "):
+        location_name = " ".join(command.split()[1:]).title()
+        target_location = resolve_location(location_name)
+        if target_location:
+            show_route(current_location, target_location, game_state["energy"])
+
+    elif command == "quit":
+        session.finish(QUIT)
+        print("👋 Thanks for playing!")
+        return True, None
+
+    else:
+        print("❌ Unknown command. Type 'help' for available commands.")
+
+    return False, None
+
 
-    if new_energy != game_state["energy"]:
-        change = new_energy - game_state["energy"]
-        print(f"⚡️ Energy: {game_state['energy']} → {new_energy} ({change:+})")
+def start_game(player_name: str, start_money: int = START_MONEY, start_energy: int = START_ENERGY) -> GameSession:
+    """Create a new game (or claim an idle one from the pool) and open a session on it"""
+    with tracer.command("new game"):
+        game_id = None
+        if (start_money, start_energy) == (START_MONEY, START_ENERGY):
+            game_id = claim_pooled_game(player_name)
+        if game_id is None:
+            game_id = create_game(player_name, start_money, start_energy)
+        return GameSession(get_storage(), game_id)
+
+
+# Session of the game being played, flushed if the player interrupts
+current_session: Optional[GameSession] = None
 
 
-def main_game() -> None:
+def main_game(read: Optional[Prompt] = None) -> GameSession:
+    """Play one game, reading every answer through ``read`` (default: input())"""
+    read = read or input
     # Ask to show the story
-    story_dialog = input("Do you want to read the background story? (Y/N): ").upper()
+    story_dialog = read("Do you want to read the background story? (Y/N): ").upper()
     if story_dialog == "Y":
+        import story  # Only needed when the player asks for it
+
         for line in story.get_story():
             print(line)
-        input("\nPress Enter to continue...")
+        read("\nPress Enter to continue...")
 
     # Game setup
     print("\n🚲 BIKE IN TOWN 🚲")
     print("Welcome to your adventure!")
-    player_name = input("Enter your name: ")
+    player_name = read("Enter your name: ")
 
     # Game settings
-    start_money = 100
-    start_energy = 100
+    start_money = START_MONEY
+    start_energy = START_ENERGY
 
     # Create new game
-    game_id = create_game(player_name, start_money, start_energy)
+    global current_session
+    session = current_session = start_game(player_name, start_money, start_energy)
     visited_locations = set([1])  # Start with HOME visited
 
     # Game state
@@ -399,176 +706,111 @@ def main_game() -> None:
 
     # Main game loop
     while not game_over:
-        # Get current state
-        game_state = get_game_state(game_id)
-        if not game_state:
-            print("Error: Game state not found.")
-            break
-
-        current_location = get_location_info(game_state["current_place"])
+        current_location = get_location_info(session.state["current_place"])
         if not current_location:
             print("Error: Current location not found.")
             break
 
-        all_locations = get_locations()
-
         print(f"\n📍 You are at {current_location['name']}")
 
         # Get user command
-        command = input("\nWhat would you like to do? ").lower().strip()
-
-        if command == "help":
-            print("\n🔧 AVAILABLE COMMANDS:")
-            print("info - Show current location, money, and energy")
-            print("map - Display the town map")
-            print("locations - Show reachable locations within energy range")
-            print("buy <amount> - Buy energy drinks (1$ = 1 energy)")
-            print("move <location_name> - Move to a location")
-            print("quit - Exit the game")
-
-        elif command == "info":
-            show_quick_info(game_state, current_location)
-
-        elif command == "map":
-            display_map(current_location, all_locations, visited_locations)
-
-        elif command == "locations":
-            show_locations(current_location, all_locations, game_state["energy"])
-
-        elif command == "debug":
-            print(f"DEBUG: Current location data: {current_location}")
-            print(
-                f"DEBUG: Sample location data: {all_locations[1] if len(all_locations) > 1 else 'None'}"
-            )
-
-        elif command.startswith("buy "):
-            try:
-                amount = int(command.split()[1])
-                if amount <= 0:
-                    print("❌ Please enter a positive amount.")
-                elif amount > game_state["money"]:
-                    print("❌ You don't have enough money.")
-                else:
-                    new_money = game_state["money"] - amount
-                    new_energy = game_state["energy"] + amount
-                    update_game_state(game_id, money=new_money, energy=new_energy)
-                    print(
-                        f"✅ Bought {amount} energy for ${amount}. Energy: {new_energy}, Money: ${new_money}"
-                    )
-            except (ValueError, IndexError):
-                print("❌ Invalid format. Use: buy <amount>")
-
-        elif command.startswith("move "):
-            location_name = " ".join(command.split()[1:]).title()
-
-            # Find the location
-            target_location = None
-            for loc in all_locations:
-                if loc["name"].lower() == location_name.lower():
-                    target_location = loc
-                    break
-
-            if not target_location:
-                print(f"❌ Location '{location_name}' not found.")
-                print("Available locations:")
-                reachable = get_reachable_locations(
-                    current_location, all_locations, game_state["energy"]
-                )
-                for option in reachable:
-                    loc = option["location"]
-                    print(
-                        f"  - {loc['name']} (Distance: {option['distance']}, Energy cost: {option['energy_cost']})"
-                    )
-            else:
-                energy_cost = calculate_energy_cost(current_location, target_location)
-                if energy_cost > game_state["energy"]:
-                    print(
-                        f"❌ Not enough energy! Need {energy_cost}, have {game_state['energy']}"
-                    )
-                    route_info = get_route_info(
-                        current_location["id"], target_location["id"]
-                    )
-                    road_condition = route_info["road_condition"]
-                    if road_condition in ["poor", "rough"]:
-                        print(
-                            f"⚠️ The route from {current_location['name']} to {target_location['name']} has {road_condition} conditions!"
-                        )
-                else:
-                    new_energy = game_state["energy"] - energy_cost
-                    update_game_state(
-                        game_id, energy=new_energy, location=target_location["id"]
-                    )
-                    visited_locations.add(target_location["id"])
-                    route_info = get_route_info(
-                        current_location["id"], target_location["id"]
-                    )
-                    road_condition = route_info["road_condition"]
-                    road_msg = ""
-                    if road_condition == "excellent":
-                        road_msg = " (smooth ride! 🛣️)"
-                    elif road_condition == "poor":
-                        road_msg = " (bumpy route ⚠️)"
-                    elif road_condition == "rough":
-                        road_msg = " (rough terrain! 🧗)"
-                    else:
-                        road_msg = " (normal route 🚴)"
-                    print(
-                        f"🚲 Moved to {target_location['name']}{road_msg} Energy remaining: {new_energy}"
-                    )
-                    handle_location_event(game_id, target_location)
-                # Check win/lose conditions
-            game_state = get_game_state(game_id)
-            if not game_state:
-                print("Error: Game state not found.")
-                break
-
-            current_location = get_location_info(game_state["current_place"])
-            if not current_location:
-                print("Error: Current location not found.")
-                break
-
-            # Check if won (key found and at home)
-            if game_state["key_found"] and current_location["is_home"]:
-                print("\n🎉 CONGRATULATIONS! 🎉")
-                print("You found the key and made it back home!")
-                print(
-                    f"Final score - Money: ${game_state['money']}, Energy: {game_state['energy']}"
-                )
-                game_over = True
-
-                # Check if lost (no energy and no money, or can't reach home)
-
-            if game_state["energy"] == 0 and game_state["money"] == 0:
-                print("\n💀 GAME OVER!")
-                print("You ran out of both energy and money!")
-                game_over = True
-
-            elif game_state["energy"] == 0:
-                # Check if can buy energy
-                if game_state["money"] == 0:
-                    print("\n💀 GAME OVER!")
-                    print("You ran out of energy and have no money to buy more!")
-                    game_over = True
-                else:
-                    print(
-                        "⚠️ Warning: You're out of energy! Use 'buy' command to purchase energy drinks."
-                    )
-
-        elif command == "quit":
-            print("👋 Thanks for playing!")
-            game_over = True
-
+        command = read("\nWhat would you like to do? ").lower().strip()
+        tracer.begin_command(command.split()[0] if command else "(empty)")
+
+        game_over, arrived_at = run_command(session, command, visited_locations)
+        if arrived_at:
+            handle_location_event(session, arrived_at, read)
+        if command.startswith("move "):
+            # Check win/lose conditions
+            game_over = check_game_over(session)
+
+        # Write back on win/lose/quit, otherwise every few commands
+        if game_over:
+            session.flush()
         else:
-            print("❌ Unknown command. Type 'help' for available commands.")
-
-
-if __name__ == "__main__":
+            session.command_done()
+        tracer.end_command()
+
+    current_session = None
+    return session
+
+
+def profile_startup(runs: int = 5) -> None:
+    """Time ``python game.py`` from launch to its first prompt, and break its imports down"""
+    import re
+    import subprocess
+
+    first_prompt = b"(Y/N): "
+
+    def launch(*options: str) -> tuple[float, str]:
+        started = time.perf_counter()
+        child = subprocess.Popen(
+            [sys.executable, *options, __file__], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        assert child.stdout is not None
+        shown = b""
+        while first_prompt not in shown:
+            chunk = child.stdout.read1(4096)
+            if not chunk:
+                break
+            shown += chunk
+        elapsed = time.perf_counter() - started
+        child.kill()
+        _, errors = child.communicate()
+        if first_prompt not in shown:
+            sys.exit(f"❌ The game exited before its first prompt:\n{errors.decode(errors='replace')}")
+        return elapsed, errors.decode(errors="replace")
+
+    def bare() -> float:
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        return time.perf_counter() - started
+
+    baseline = sorted(bare() for _ in range(runs))[runs // 2]
+    to_prompt = sorted(launch()[0] for _ in range(runs))[runs // 2]
+
+    # -X importtime lines: "import time: <self us> | <cumulative us> | <indented module name>"
+    _, report = launch("-X", "importtime")
+    imports: list[tuple[str, int, int]] = []
+    for line in report.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)", line)
+        if match:
+            imports.append((match[4], len(match[3]) // 2, int(match[2])))
+    # The interpreter's own startup imports end with site; what follows is the game's
+    site = next((i for i, (name, depth, _) in enumerate(imports) if name == "site" and depth == 0), -1)
+    direct = sorted(((name, us) for name, depth, us in imports[site + 1:] if depth == 0), key=lambda item: -item[1])
+    loaded = {name: us for name, _, us in imports}
+
+    print(f"\n🚀 STARTUP PROFILE (median of {runs} runs)")
+    print("=" * 55)
+    print(f"Time to first prompt:  {to_prompt * 1000:8.1f} ms")
+    print(f"  bare interpreter:    {baseline * 1000:8.1f} ms")
+    print(f"  game imports + setup:{(to_prompt - baseline) * 1000:8.1f} ms")
+    print("\nImports before the first prompt (cumulative, one -X importtime run):")
+    for name, us in direct[:12]:
+        print(f"  {name:<30}{us / 1000:8.1f} ms")
+    print(f"  ({len(imports) - site - 1} modules in total)")
+    heavy = [name for name in ("numpy", "mysql.connector", "dotenv") if name in loaded]
+    if heavy:
+        print("\nHeavy modules loaded before the first prompt: " + ", ".join(f"{name} ({loaded[name] / 1000:.1f} ms)" for name in heavy))
+
+
+if __name__ == "__main__" and "--profile-startup" in sys.argv[1:]:
+    profile_startup()
+elif __name__ == "__main__":
+    dump_on_exit()
     try:
         main_game()
     except KeyboardInterrupt:
+        if current_session:
+            current_session.finish(QUIT)
+            current_session.flush()
         print("\n👋 Game interrupted. Thanks for playing!")
-    except mysql.connector.Error as err:
-        print(f"❌ Database error: {err}")
-        print("Make sure the database is set up correctly using database_setup.sql")
+    except GameConflictError:
+        print("❌ This game was saved from another window; your latest moves were not kept.")
     except Exception as e:
-        print(f"❌ An error occurred: {e}")
+        if is_database_error(e):
+            print(f"❌ Database error: {e}")
+            print("Make sure the database is set up correctly using database_setup.sql")
+        else:
+            print(f"❌ An error occurred: {e}")
@@ -0,0 +1,167 @@
+"""Procedural town generator for maps larger than the built-in 5x5 grid
+
+Generates locations, routes and an event mix for a WIDTH x HEIGHT town and
+either loads them straight into a storage backend (chunked multi-row INSERTs)
+or writes tab-separated files plus a LOAD DATA LOCAL INFILE script for MySQL.
+Loading a new town deletes every existing game.
+
+Usage:
+    python mapgen.py --width 200 --height 200 --storage sqlite
+    python mapgen.py --width 1000 --height 1000 --event-density 0.001 --out town/
+    mysql --local-infile=1 bike_in_town < town/load.sql
+"""
+import argparse
+import csv
+import os
+import random
+import time
+from typing import Iterator
+
+from models import EventRow, LocationRow, RouteRow
+from storage import WORLD_COLUMNS, WORLD_RESET_ORDER, create_storage
+
+# Place kinds used for names, from the original 5x5 town
+PLACE_KINDS = [
+    "Park", "Market", "School", "Hospital", "Library", "Cafe", "Bank", "Post Office",
+    "Police Station", "Gym", "Restaurant", "Store", "Theater", "Museum", "Playground",
+    "Gas Station", "Mall", "Church", "Fire Station", "Beach", "Pier", "Lighthouse",
+    "Marina", "Observatory",
+]
+
+# Road condition -> terrain multiplier, as in database_setup.sql
+ROAD_CONDITIONS = {"excellent": 0.8, "good": 1.0, "poor": 1.5, "rough": 2.0}
+ROAD_WEIGHTS = {"excellent": 3, "good": 2, "poor": 2, "rough": 1}
+
+# Event templates and their share of the mix; the single key is added separately
+EVENT_TEMPLATES: list[tuple[int, EventRow]] = [
+    (4, EventRow(id=0, name="$10 Note", money_change=10, energy_change=0, is_key=False, is_bully=False, description="You found a $10 note on the ground!")),
+    (3, EventRow(id=0, name="$20 Note", money_change=20, energy_change=0, is_key=False, is_bully=False, description="You found a $20 note!")),
+    (2, EventRow(id=0, name="Energy Stash", money_change=0, energy_change=20, is_key=False, is_bully=False, description="You found an energy drink stash!")),
+    (2, EventRow(id=0, name="Bullies", money_change=-50, energy_change=0, is_key=False, is_bully=True, description="Bullies took half your money!")),
+    (2, EventRow(id=0, name="Flat Tire", money_change=-10, energy_change=0, is_key=False, is_bully=False, description="You got a flat tire and had to pay for repairs!")),
+    (1, EventRow(id=0, name="Crash", money_change=0, energy_change=-20, is_key=False, is_bully=False, description="You crashed and lost energy!")),
+]
+KEY_EVENT = EventRow(id=0, name="Hidden Key", money_change=0, energy_change=0, is_key=True, is_bully=False, description="You found the hidden key! Now return home to win!")
+
+
+def location_id(x: int, y: int, width: int) -> int:
+    """Id of the location at (x, y); ids run along each row, HOME (0, 0) is 1"""
+    return y * width + x + 1
+
+
+def generate_locations(width: int, height: int, seed: int = 0) -> Iterator[LocationRow]:
+    """Yield one location per grid cell, HOME at (0, 0)"""
+    rng = random.Random(f"{seed}-locations")
+    for y in range(height):
+        for x in range(width):
+            place_id = location_id(x, y, width)
+            if place_id == 1:
+                yield LocationRow(id=1, name="HOME", x_coord=0, y_coord=0, is_home=True)
+            else:
+                yield LocationRow(id=place_id, name=f"{rng.choice(PLACE_KINDS)} {place_id}", x_coord=x, y_coord=y, is_home=False)
+
+
+def generate_routes(width: int, height: int, density: float = 0.3, seed: int = 0) -> Iterator[RouteRow]:
+    """Yield routes between neighbouring cells; each direction may differ"""
+    rng = random.Random(f"{seed}-routes")
+    conditions = list(ROAD_WEIGHTS)
+    weights = list(ROAD_WEIGHTS.values())
+    for y in range(height):
+        for x in range(width):
+            for nx, ny in ((x + 1, y), (x, y + 1)):
+                if nx >= width or ny >= height or rng.random() >= density:
+                    continue
+                there = rng.choices(conditions, weights)[0]
+                # Most roads are the same both ways; some are better in one direction
+                back = there if rng.random() < 0.8 else rng.choices(conditions, weights)[0]
+                a, b = location_id(x, y, width), location_id(nx, ny, width)
+                yield RouteRow(from_location_id=a, to_location_id=b, road_condition=there, terrain_multiplier=ROAD_CONDITIONS[there])
+                yield RouteRow(from_location_id=b, to_location_id=a, road_condition=back, terrain_multiplier=ROAD_CONDITIONS[back])
+
+
+def generate_events(count: int, seed: int = 0) -> Iterator[EventRow]:
+    """Yield ``count`` events in the original mix, exactly one of them the key"""
+    rng = random.Random(f"{seed}-events")
+    weights = [weight for weight, _ in EVENT_TEMPLATES]
+    templates = [template for _, template in EVENT_TEMPLATES]
+    for event_id in range(1, count):
+        yield EventRow(**{**rng.choices(templates, weights)[0], "id": event_id})  # type: ignore
+    yield EventRow(**{**KEY_EVENT, "id": max(count, 1)})  # type: ignore
+
+
+def event_count(width: int, height: int, density: float) -> int:
+    """Events for a town: ``density`` per non-home location, at least one (the key)"""
+    return max(1, min(width * height - 1, round((width * height - 1) * density)))
+
+
+def generate_town(width: int, height: int, seed: int = 0, route_density: float = 0.3, event_density: float = 0.6) -> tuple[list[LocationRow], list[EventRow], list[RouteRow]]:
+    """Generate the three world tables in memory, in the shape World loaders return"""
+    locations = sorted(generate_locations(width, height, seed), key=lambda loc: (loc["x_coord"], loc["y_coord"]))
+    events = list(generate_events(event_count(width, height, event_density), seed))
+    routes = list(generate_routes(width, height, route_density, seed))
+    return locations, events, routes
+
+
+def write_load_files(out_dir: str, width: int, height: int, seed: int, route_density: float, event_density: float) -> None:
+    """Stream the tables to TSV files and write a LOAD DATA script for them"""
+    os.makedirs(out_dir, exist_ok=True)
+    tables = {
+        "locations": generate_locations(width, height, seed),
+        "events": generate_events(event_count(width, height, event_density), seed),
+        "routes": generate_routes(width, height, route_density, seed),
+    }
+    statements = [
+        "SET FOREIGN_KEY_CHECKS = 0;",
+        *(f"TRUNCATE TABLE {table};" for table in WORLD_RESET_ORDER),
+        "SET FOREIGN_KEY_CHECKS = 1;",
+    ]
+    for table, rows in tables.items():
+        path = os.path.abspath(os.path.join(out_dir, f"{table}.tsv"))
+        columns = WORLD_COLUMNS[table]
+        with open(path, "w", encoding="utf-8", newline="") as tsv_file:
+            writer = csv.writer(tsv_file, delimiter="\t", lineterminator="\n", quoting=csv.QUOTE_NONE, escapechar="\\")
+            for row in rows:
+                writer.writerow([int(value) if isinstance(value, bool) else value for value in (row[column] for column in columns)])  # type: ignore
+        statements.append(
+            f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {table} "
+            f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(columns)});"
+        )
+
+    with open(os.path.join(out_dir, "load.sql"), "w", encoding="utf-8") as script:
+        script.write("\n".join(statements) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a large town and bulk-load it")
+    parser.add_argument("--width", type=int, default=100)
+    parser.add_argument("--height", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--route-density", type=float, default=0.3, help="share of neighbouring cells joined by a route")
+    parser.add_argument("--event-density", type=float, default=0.6, help="events per location; every new game places all of them")
+    parser.add_argument("--storage", choices=["mysql", "sqlite"], help="backend to load into (default: $GAME_STORAGE)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per multi-row INSERT")
+    parser.add_argument("--out", help="write TSV files and a LOAD DATA LOCAL INFILE script here instead of loading")
+    args = parser.parse_args()
+
+    if not 1 <= args.width <= 1000 or not 1 <= args.height <= 1000:
+        parser.error("width and height must be between 1 and 1000")
+
+    started = time.perf_counter()
+    if args.out:
+        write_load_files(args.out, args.width, args.height, args.seed, args.route_density, args.event_density)
+        print(f"🗺️  Wrote {args.width}x{args.height} town to {args.out}/ in {time.perf_counter() - started:.1f}s")
+        print(f"Load it with: mysql --local-infile=1 bike_in_town < {os.path.join(args.out, 'load.sql')}")
+        return
+
+    backend = create_storage(args.storage)
+    backend.load_world(
+        generate_locations(args.width, args.height, args.seed),
+        generate_events(event_count(args.width, args.height, args.event_density), args.seed),
+        generate_routes(args.width, args.height, args.route_density, args.seed),
+        args.batch_size,
+    )
+    print(f"🗺️  Loaded {args.width}x{args.height} town in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
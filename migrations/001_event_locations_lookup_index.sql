@@ -0,0 +1,9 @@
+-- Adds the event_locations lookup index to databases created before it
+-- was part of database_setup.sql.
+--
+-- Serves both the per-place check (game_id, place_id, resolved = FALSE) and
+-- loading all unresolved events of a game (game_id, resolved = FALSE).
+
+USE bike_in_town;
+
+CREATE INDEX idx_event_locations_lookup ON event_locations (game_id, resolved, place_id);
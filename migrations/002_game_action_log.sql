@@ -0,0 +1,32 @@
+-- Adds the append-only action log and state snapshots to databases created
+-- before they were part of database_setup.sql.
+--
+-- Games created before this migration have no turn-0 snapshot, so they
+-- cannot be replayed; their live game row is unaffected.
+
+USE bike_in_town;
+
+CREATE TABLE IF NOT EXISTS game_actions (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    game_id INT NOT NULL,
+    turn INT NOT NULL,
+    kind VARCHAR(10) NOT NULL,
+    value INT NOT NULL,
+    money_change INT DEFAULT 0,
+    energy_change INT DEFAULT 0,
+    key_found BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (game_id) REFERENCES game(id) ON DELETE CASCADE,
+    UNIQUE KEY unique_game_turn (game_id, turn)
+);
+
+CREATE TABLE IF NOT EXISTS game_snapshots (
+    game_id INT NOT NULL,
+    turn INT NOT NULL,
+    money INT NOT NULL,
+    energy INT NOT NULL,
+    current_place INT NOT NULL,
+    key_found BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (game_id, turn),
+    FOREIGN KEY (game_id) REFERENCES game(id) ON DELETE CASCADE
+);
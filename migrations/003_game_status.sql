@@ -0,0 +1,13 @@
+-- Adds the game status and finish time used by archive.py to databases
+-- created before they were part of database_setup.sql.
+--
+-- Existing games stay 'playing' and are never archived; mark them finished
+-- by hand if they should be.
+
+USE bike_in_town;
+
+ALTER TABLE game
+    ADD COLUMN status VARCHAR(10) NOT NULL DEFAULT 'playing',
+    ADD COLUMN finished_at DATETIME NULL;
+
+CREATE INDEX idx_game_finished ON game (status, finished_at);
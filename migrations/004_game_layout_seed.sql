@@ -0,0 +1,10 @@
+-- Adds the seed each game's event layout was generated from, so the layout
+-- can be reproduced, to databases created before it was part of
+-- database_setup.sql.
+--
+-- Existing games keep a NULL seed; their layouts stay only in event_locations.
+
+USE bike_in_town;
+
+ALTER TABLE game
+    ADD COLUMN layout_seed BIGINT NULL;
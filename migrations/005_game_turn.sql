@@ -0,0 +1,13 @@
+-- Adds the game's latest logged turn, which every session commit checks and
+-- bumps in the same transaction, to databases created before it was part of
+-- database_setup.sql.
+--
+-- Existing games take the turn of their last logged action.
+
+USE bike_in_town;
+
+ALTER TABLE game
+    ADD COLUMN turn INT NOT NULL DEFAULT 0;
+
+UPDATE game g
+SET turn = (SELECT COALESCE(MAX(a.turn), 0) FROM game_actions a WHERE a.game_id = g.id);
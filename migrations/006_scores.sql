@@ -0,0 +1,25 @@
+-- Adds the materialized scores table behind the leaderboard to databases
+-- created before it was part of database_setup.sql.
+--
+-- Games already won are scored from their final game row. Safe to run again:
+-- the indexes are part of the table definition and scored games are skipped.
+
+USE bike_in_town;
+
+-- One index per leaderboard, matching its ORDER BY, so a page is an index range scan
+CREATE TABLE IF NOT EXISTS scores (
+    game_id INT PRIMARY KEY,
+    player_name VARCHAR(40) NOT NULL,
+    money INT NOT NULL,
+    energy INT NOT NULL,
+    turns INT NOT NULL,
+    finished_at DATETIME NOT NULL,
+    INDEX idx_scores_money (money, energy, game_id),
+    INDEX idx_scores_energy (energy, money, game_id),
+    INDEX idx_scores_turns (turns, game_id)
+);
+
+INSERT IGNORE INTO scores (game_id, player_name, money, energy, turns, finished_at)
+SELECT id, player_name, money, energy, turn, finished_at
+FROM game
+WHERE status = 'won' AND finished_at IS NOT NULL;
@@ -0,0 +1,118 @@
+from datetime import datetime
+from typing import Any, NamedTuple, Optional, TypedDict
+
+# A layout is the list of (event_id, place_id) pairs placed in one game
+Layout = list[tuple[int, int]]
+
+
+# Type definitions for database rows
+class LocationRow(TypedDict):
+    id: int
+    name: str
+    x_coord: int
+    y_coord: int
+    is_home: bool
+
+
+class EventRow(TypedDict):
+    id: int
+    name: str
+    money_change: int
+    energy_change: int
+    is_key: bool
+    is_bully: bool
+    description: str
+
+
+class GameStateRow(TypedDict):
+    id: int
+    player_name: str
+    money: int
+    energy: int
+    current_place: int
+    key_found: bool
+    layout_seed: Optional[int]  # seed the event layout was generated from
+    turn: int  # latest logged turn, the version a session commit is checked against
+
+
+class ReachableLocation(NamedTuple):
+    """A location within energy range; a tuple, so listings need no dict per candidate"""
+
+    id: int
+    name: str
+    is_home: bool
+    distance: int
+    energy_cost: int
+
+
+class RouteInfoRow(TypedDict):
+    road_condition: str
+    terrain_multiplier: float
+
+
+class RouteRow(TypedDict):
+    from_location_id: int
+    to_location_id: int
+    road_condition: str
+    terrain_multiplier: float
+
+
+class EventLocationRow(TypedDict):
+    event_location_id: int
+    name: str
+    money_change: int
+    energy_change: int
+    is_key: bool
+    is_bully: bool
+    description: str
+
+
+class GameEventRow(EventLocationRow):
+    place_id: int
+
+
+class ActionRow(TypedDict):
+    game_id: int
+    turn: int
+    kind: str  # "move", "buy", "event" or "skip"
+    value: int  # location id, amount or event_locations id, depending on kind
+    money_change: int
+    energy_change: int
+    key_found: bool
+
+
+class SnapshotRow(TypedDict):
+    game_id: int
+    turn: int
+    money: int
+    energy: int
+    current_place: int
+    key_found: bool
+
+
+class ScoreRow(TypedDict):
+    game_id: int
+    player_name: str
+    money: int
+    energy: int
+    turns: int
+    finished_at: datetime
+
+
+class GameCommit(NamedTuple):
+    """Everything one session flush writes, applied by ``Storage.commit_game()`` as one transaction"""
+
+    game_id: int
+    base_turn: int  # game.turn the session last saw; the commit fails if it has moved on
+    actions: list[ActionRow]
+    fields: dict[str, Any]  # changed money, energy, location and key_found values
+    resolved: list[int]  # event_locations ids
+    snapshot: Optional[SnapshotRow]
+    status: Optional[str]  # "won", "lost" or "quit" once the game ends
+    finished_at: Optional[datetime]
+    score: Optional[ScoreRow]  # leaderboard entry, for a won game
+
+    @property
+    def turn(self) -> int:
+        """The game's turn once the commit is applied"""
+        return self.actions[-1]["turn"] if self.actions else self.base_turn
@@ -0,0 +1,266 @@
+from array import array
+from bisect import bisect_left
+from typing import Optional
+
+import numpy as np
+
+# Suggestions returned when a name does not match exactly
+NAME_SUGGESTIONS = 5
+# Most name postings read per typo-tolerant lookup, which bounds its cost on huge maps
+TRIGRAM_POSTING_BUDGET = 20000
+
+
+def normalize(name: str) -> str:
+    """Case-fold a name and collapse its whitespace"""
+    return " ".join(name.casefold().split())
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between two strings"""
+    # Typos leave most of a long name alone, so only the differing middle goes through the table
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        # Plain comparisons instead of min() roughly halve the time of this hot loop
+        current = [i]
+        left = i
+        for j, cb in enumerate(b):
+            cost = previous[j] + (ca != cb)
+            above = previous[j + 1] + 1
+            if above < cost:
+                cost = above
+            if left + 1 < cost:
+                cost = left + 1
+            current.append(cost)
+            left = cost
+        previous = current
+    return previous[-1]
+
+
+def _runs(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Distinct values of an array, sorted, with how often each occurs
+
+    Does what ``np.unique(..., return_counts=True)`` does without its first-call
+    import of ``numpy.ma``, which costs a lookup tens of milliseconds.
+    """
+    values = np.sort(values)
+    starts = np.flatnonzero(np.diff(values, prepend=values[:1] - 1)) if len(values) else np.zeros(0, dtype=np.int64)
+    return values[starts], np.diff(np.append(starts, len(values)))
+
+
+def _trigram_codes(text: str) -> np.ndarray:
+    """Distinct trigrams of a padded name as integers, three 21-bit code points each"""
+    points = np.frombuffer(f"  {text} ".encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    return _runs((points[:-2] << 42) | (points[1:-1] << 21) | points[2:])[0]
+
+
+class NameIndex:
+    """Lookup index over location names
+
+    Three structures, all built once from the names and kept as arrays:
+
+    - sorted hashes of the normalized names for exact matches,
+    - a sorted byte-string array of every word start ("post office" is
+      stored as "post office" and "office"), so a prefix is a binary search,
+    - a trigram index (sorted trigram codes with their name postings) for
+      typo-tolerant matching, ranked by trigram similarity, then edit distance.
+
+    Single typos are found first by looking up every one-edit variant of the
+    query as an exact name, trying only characters that form letter pairs
+    seen in some name with their new neighbours; the trigram index handles
+    anything further off.
+    The names list is kept as given (the world's own list) and only the few
+    candidates being ranked are normalized again.
+    """
+
+    def __init__(self, names: list[str]) -> None:
+        self._names = names
+        normalized = [normalize(name) for name in names]
+        # Characters worth trying in a typo fix, by the characters either side of it
+        # ("\0" for the start or end of a name): only those forming pairs that occur in
+        # some name can give one
+        points = np.frombuffer(f"\0{chr(0).join(normalized)}\0".encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+        pairs = _runs((points[:-1] << 21) | points[1:])[0].tolist()
+        follows: dict[str, set[str]] = {}
+        precedes: dict[str, set[str]] = {}
+        for pair in pairs:
+            first, second = chr(pair >> 21), chr(pair & 0x1FFFFF)
+            follows.setdefault(first, set()).add(second)
+            precedes.setdefault(second, set()).add(first)
+        self._fillers = {
+            (left, right): "".join(sorted((after & precedes.get(right, set())) - {"\0"}))
+            for left, after in follows.items() for right in precedes
+        }
+
+        # Word starts, sorted; each entry remembers its name and that name's length
+        starts: list[str] = []
+        owners: list[int] = []
+        for i, name in enumerate(normalized):
+            starts.append(name)
+            owners.append(i)
+            position = name.find(" ")
+            while position >= 0:
+                starts.append(name[position + 1:])
+                owners.append(i)
+                position = name.find(" ", position + 1)
+        keys = np.char.encode(np.array(starts, dtype=str), "utf-8") if starts else np.zeros(0, dtype="S1")
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._key_owners = np.asarray(owners, dtype=np.int32)[order]
+        self._lengths = np.array([len(name) for name in normalized], dtype=np.int32)
+        # Exact names as sorted string hashes, so no second copy of every name is kept
+        hashes = np.fromiter((hash(name) for name in normalized), dtype=np.int64, count=len(normalized))
+        order = np.argsort(hashes, kind="stable")
+        # array.array buffers for single lookups, with NumPy views over them for batches
+        self._hash_list = array("q", hashes[order].tobytes())
+        self._hash_owner_list = array("i", order.astype(np.int32).tobytes())
+        self._hashes = np.frombuffer(self._hash_list, dtype=np.int64)
+        self._key_lengths = self._lengths[self._key_owners]
+
+        # Trigram postings: distinct (trigram, name) pairs sorted by trigram, built over
+        # one buffer of every padded name so no per-name NumPy calls are needed
+        points = np.frombuffer("\0".join(f"  {name} " for name in normalized).encode("utf-32-le"), dtype=np.uint32)
+        points = points.astype(np.int64)
+        codes = (points[:-2] << 42) | (points[1:-1] << 21) | points[2:]
+        separators = points == 0
+        owner = np.cumsum(separators)[:-2].astype(np.int32)
+        valid = ~(separators[:-2] | separators[1:-1] | separators[2:])
+        codes, owner = codes[valid], owner[valid]
+        # Owners already ascend, so a stable sort by trigram leaves each trigram's names in order
+        order = np.argsort(codes, kind="stable")
+        codes, owner = codes[order], owner[order]
+        distinct = np.ones(len(codes), dtype=bool)
+        distinct[1:] = (codes[1:] != codes[:-1]) | (owner[1:] != owner[:-1])
+        codes, self._postings = codes[distinct], owner[distinct]
+        self._trigram_counts = np.bincount(self._postings, minlength=len(normalized))
+        self._trigrams, offsets = np.unique(codes, return_index=True)
+        self._offsets = np.append(offsets, len(codes))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _exact_all(self, texts: list[str]) -> list[int]:
+        """Get the first index of the name equal to each normalized text, -1 where there is none"""
+        found = [-1] * len(texts)
+        if not len(self._hashes):
+            return found
+        hashes = np.fromiter(map(hash, texts), dtype=np.int64, count=len(texts))
+        positions = np.searchsorted(self._hashes, hashes)
+        hit = self._hashes[np.minimum(positions, len(self._hashes) - 1)] == hashes
+        for k in np.flatnonzero(hit).tolist():
+            found[k] = self._exact_from(texts[k], int(positions[k]))
+        return found
+
+    def _exact_from(self, text: str, position: int) -> int:
+        """Check the names whose hash sits at ``position`` and after against a normalized text"""
+        hashes = self._hash_list
+        # Equal hashes list their names in index order; a collision fails the comparison
+        while position < len(hashes) and hashes[position] == hash(text):
+            i = self._hash_owner_list[position]
+            if normalize(self._names[i]) == text:
+                return i
+            position += 1
+        return -1
+
+    def exact(self, query: str) -> Optional[int]:
+        """Get the index of the name equal to the query, ignoring case"""
+        text = normalize(query)
+        match = self._exact_from(text, bisect_left(self._hash_list, hash(text))) if text else -1
+        return match if match >= 0 else None
+
+    def prefix(self, query: str, limit: int = NAME_SUGGESTIONS) -> list[int]:
+        """Get indices of names with a word starting with the query, shortest names first"""
+        key = normalize(query).encode()
+        if not key:
+            return []
+        lo = int(np.searchsorted(self._keys, key, side="left"))
+        # No UTF-8 byte is 0xff, so this bounds every key that starts with the query
+        hi = int(np.searchsorted(self._keys, key + b"\xff", side="left"))
+        owners = self._key_owners[lo:hi]
+        if len(owners) > limit * 2:
+            # A name can own several matching word starts, so keep some spare before deduplicating
+            owners = owners[np.argpartition(self._key_lengths[lo:hi], limit * 2 - 1)[:limit * 2]]
+        return sorted(set(owners.tolist()), key=lambda i: (self._lengths[i], i))[:limit]
+
+    def one_edit(self, query: str) -> list[int]:
+        """Get indices of names one insertion, deletion, substitution or swap away from the query"""
+        text = normalize(query)
+        splits = [(text[:i], text[i:]) for i in range(len(text) + 1)]
+        variants = {left + right[1:] for left, right in splits if right}
+        variants.update(left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1)
+        padded = f"\0{text}\0"
+        fillers = self._fillers
+        for i, (left, right) in enumerate(splits):
+            if right:
+                variants.update(left + c + right[1:] for c in fillers.get((padded[i], padded[i + 2]), ""))
+            variants.update(left + c + right for c in fillers.get((padded[i], padded[i + 1]), ""))
+        variants.discard(text)
+        variants.discard("")
+        found = set(self._exact_all(list(variants)))
+        found.discard(-1)
+        return sorted(found, key=lambda i: (self._lengths[i], i))
+
+    def similar(self, query: str, limit: int = NAME_SUGGESTIONS) -> list[tuple[int, int]]:
+        """Get (index, edit distance) of the names most similar to the query, closest first"""
+        text = normalize(query)
+        if not text or not len(self._trigrams):
+            return []
+        codes = _trigram_codes(text)
+        found = np.searchsorted(self._trigrams, codes)
+        inside = found < len(self._trigrams)
+        found, codes_inside = found[inside], codes[inside]
+        found = found[self._trigrams[found] == codes_inside]
+        if not len(found):
+            return []
+        # Rarest trigrams first, within a budget of postings, so the "obs" shared by a
+        # million observatories is only read when nothing rarer matched
+        order = np.argsort(self._offsets[found + 1] - self._offsets[found], kind="stable")
+        sizes = np.cumsum((self._offsets[found + 1] - self._offsets[found])[order])
+        used = found[order[:max(1, int(np.searchsorted(sizes, TRIGRAM_POSTING_BUDGET, side="right")))]]
+        owners, shared = _runs(np.concatenate([self._postings[self._offsets[t]:self._offsets[t + 1]] for t in used]))
+        # Trigram Jaccard similarity, then the exact edit distance of the best few
+        score = shared / (len(codes) + self._trigram_counts[owners] - shared)
+        keep = min(len(owners), limit * 2)
+        best = owners[np.argpartition(-score, keep - 1)[:keep]]
+        ranked = sorted((edit_distance(text, normalize(self._names[i])), int(i)) for i in best)
+        return [(i, distance) for distance, i in ranked[:limit]]
+
+    def resolve(self, query: str, limit: int = NAME_SUGGESTIONS) -> tuple[Optional[int], list[int]]:
+        """Match a typed name to one index, or return ranked suggestions
+
+        An exact name, a prefix of only one name, a single typo away from only
+        one name, or a typo clearly closer to one name than to any other
+        resolves; anything else gives suggestions.
+        """
+        match = self.exact(query)
+        if match is not None:
+            return match, []
+        prefixed = self.prefix(query, limit)
+        if len(prefixed) == 1:
+            return prefixed[0], []
+        if prefixed:
+            return None, prefixed
+
+        close = self.one_edit(query)
+        if len(close) == 1:
+            return close[0], []
+        if close:
+            return None, close[:limit]
+
+        similar = self.similar(query, limit)
+        if similar:
+            # Allow one typo in short names and two in longer ones
+            best, distance = similar[0]
+            budget = 1 if len(normalize(query)) <= 5 else 2
+            runner_up = similar[1][1] if len(similar) > 1 else None
+            if distance <= budget and (runner_up is None or distance < runner_up):
+                return best, []
+        return None, [i for i, _ in similar]
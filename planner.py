@@ -0,0 +1,360 @@
+from array import array
+from bisect import bisect_left
+from heapq import heappop, heappush
+from typing import Optional
+
+import numpy as np
+
+from models import LocationRow
+from world import MATRIX_MAX_LOCATIONS, World
+
+UNREACHABLE = np.iinfo(np.int64).max // 2
+# Big maps are searched cell by cell when their grid has at most this many cells per location
+LATTICE_MAX_CELLS_PER_LOCATION = 4
+
+
+def dijkstra(costs: np.ndarray, source: int) -> tuple[np.ndarray, np.ndarray]:
+    """Single-source shortest paths over a dense cost matrix
+
+    Every pair of locations can be reached with a direct hop, so the graph is
+    complete and each relaxation step is one vectorized pass over a matrix row.
+    Returns the cost to every index and the predecessor of every index.
+    """
+    n = costs.shape[0]
+    dist = np.full(n, UNREACHABLE, dtype=np.int64)
+    pred = np.full(n, -1, dtype=np.int64)
+    done = np.zeros(n, dtype=bool)
+    dist[source] = 0
+
+    for _ in range(n):
+        u = int(np.argmin(np.where(done, UNREACHABLE, dist)))
+        if done[u] or dist[u] >= UNREACHABLE:
+            break
+        done[u] = True
+        candidate = dist[u] + costs[u]
+        # Strict comparison keeps the earlier (fewer hop) path on ties
+        better = (candidate < dist) & ~done
+        dist[better] = candidate[better]
+        pred[better] = u
+
+    return dist, pred
+
+
+def dijkstra_many(costs: np.ndarray, sources: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    """Shortest paths from several sources at once over a dense cost matrix
+
+    Runs one ``dijkstra()`` per source in lockstep, so each step is a single
+    vectorized pass over a (sources x N) block instead of one pass per source.
+    Returns the cost and predecessor matrices, one row per source.
+    """
+    k, n = len(sources), costs.shape[0]
+    rows = np.arange(k)
+    dist = np.full((k, n), UNREACHABLE, dtype=np.int64)
+    pred = np.full((k, n), -1, dtype=np.int64)
+    dist[rows, sources] = 0
+    # Costs of the indices each source has not settled yet; settled ones are above UNREACHABLE
+    pending = dist.copy()
+    candidate = np.empty((k, n), dtype=np.int64)
+    better = np.empty((k, n), dtype=bool)
+
+    for _ in range(n):
+        u = pending.argmin(axis=1)
+        reached = pending[rows, u]
+        if reached.min() >= UNREACHABLE:
+            break
+        pending[rows, u] = UNREACHABLE + 1
+        np.add(reached[:, None], costs[u], out=candidate)
+        # A settled index never gets a cheaper candidate, as costs are not negative
+        np.less(candidate, dist, out=better)
+        np.copyto(pending, candidate, where=better)
+        np.copyto(dist, candidate, where=better)
+        np.copyto(pred, u[:, None], where=better)
+
+    return dist, pred
+
+
+class RoutePlanner:
+    """Cheapest multi-hop routes over the world's direct hops
+
+    Edges are the direct-hop costs: the route multiplier where a route
+    exists, otherwise plain Manhattan distance. On maps small enough for
+    ``World.cost_matrix()`` shortest-path trees are computed per source on
+    demand and cached until the world is reloaded.
+
+    Big maps have no matrix, so ``cheapest_cost()``, ``plan()`` and
+    ``costs_between()`` run an A* search over the routes plus single steps
+    across the map grid: a hop without a route costs its Manhattan distance,
+    which is what riding it one cell at a time costs, so a ride of several
+    cells is a walk of several steps. A first step onto a location the ride
+    has a route to is left to that route. The heuristic is the Manhattan
+    distance to the goal times the cheapest energy per cell any hop takes.
+    Maps whose grid is mostly empty (``multi_hop`` is False) are not
+    searched, and get the direct hop.
+    """
+
+    def __init__(self, world: World) -> None:
+        self._world = world
+        self._version = -1
+        self._trees: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        # Big-map search state: coordinates by index, grid cell -> location index
+        # (-1 for none, -2 for several), the cheapest energy per cell of any hop,
+        # and the routes that cost more than riding the same distance off-road
+        self._lattice_version = -1
+        self._xs: list[int] = []
+        self._ys: list[int] = []
+        self._cells: Optional[array] = None
+        self._cell_cost = 1.0
+        self._dearer: dict[int, set[int]] = {}
+        self._ride_slots = 1
+
+    def invalidate(self) -> None:
+        """Drop all cached shortest-path trees"""
+        self._trees.clear()
+        self._lattice_version = -1
+
+    def _cost_matrix(self) -> np.ndarray:
+        if not self._world.dense:
+            raise ValueError(f"shortest-path trees need the cost matrix, which maps over {MATRIX_MAX_LOCATIONS} locations do not keep")
+        costs = self._world.cost_matrix()
+        if self._version != self._world.version:
+            self._trees.clear()
+            self._version = self._world.version
+        return costs
+
+    def _tree(self, source: int) -> tuple[np.ndarray, np.ndarray]:
+        costs = self._cost_matrix()
+        tree = self._trees.get(source)
+        if tree is None:
+            tree = dijkstra(costs, source)
+            self._trees[source] = tree
+        return tree
+
+    def _trees_from(self, sources: list[int]) -> list[tuple[np.ndarray, np.ndarray]]:
+        """Get the trees of several sources, computing the missing ones in one pass"""
+        costs = self._cost_matrix()
+        missing = sorted(set(sources) - self._trees.keys())
+        if len(missing) > 1:
+            dist, pred = dijkstra_many(costs, missing)
+            for row, source in enumerate(missing):
+                self._trees[source] = (dist[row], pred[row])
+        return [self._tree(source) for source in sources]
+
+    def _prepare_lattice(self) -> None:
+        world = self._world
+        if self._lattice_version == world.version and world.version > 0:
+            return
+        locations = world.get_locations()
+        self._lattice_version = world.version
+        self._xs, self._ys = locations.xs.tolist(), locations.ys.tolist()
+        self._cells = None
+        min_x, min_y, max_x, max_y = world.bounds()
+        width, height = max_x - min_x + 1, max_y - min_y + 1
+        if not len(locations) or width * height > LATTICE_MAX_CELLS_PER_LOCATION * len(locations):
+            return
+        keys = (locations.xs - min_x) * height + (locations.ys - min_y)
+        cells = np.full(width * height, -1, dtype=np.int32)
+        cells[keys] = np.arange(len(keys), dtype=np.int32)
+        cells[np.bincount(keys, minlength=width * height) > 1] = -2
+        self._cells = array("i", cells.tobytes())
+
+        offsets, targets, costs = world.route_table()
+        self._cell_cost, self._dearer, self._ride_slots = 1.0, {}, 1
+        if not len(targets):
+            return
+        sources = np.repeat(np.arange(len(locations)), np.diff(np.frombuffer(offsets, dtype=np.int64)))
+        target_array = np.frombuffer(targets, dtype=np.int32)
+        cost_array = np.frombuffer(costs, dtype=np.int64)
+        distances = np.abs(locations.xs[target_array] - locations.xs[sources]) + np.abs(locations.ys[target_array] - locations.ys[sources])
+        hops = distances > 0
+        if hops.any():
+            self._cell_cost = min(1.0, float((cost_array[hops] / distances[hops]).min()))
+        dearer = cost_array > distances
+        for source, target in zip(sources[dearer].tolist(), target_array[dearer].tolist()):
+            self._dearer.setdefault(source, set()).add(target)
+        if dearer.any():
+            self._ride_slots = 1 + int(np.bincount(target_array[dearer]).max())
+
+    @property
+    def multi_hop(self) -> bool:
+        """Whether costs and plans are cheapest multi-hop ones (False only on big, mostly empty maps)"""
+        if self._world.dense:
+            return True
+        self._prepare_lattice()
+        return self._cells is not None
+
+    def _search(self, source: int, targets: set[int], limit: int, goal: int = -1) -> tuple[dict[int, int], dict[int, int]]:
+        """Search a big map from index ``source`` until every target index is settled or costs pass ``limit``
+
+        Returns the cost and the previous stop of every location reached.
+        ``goal`` (an index) steers the search when there is one target.
+        """
+        self._prepare_lattice()
+        cells = self._cells
+        assert cells is not None
+        offsets, route_targets, route_costs = self._world.route_table()
+        xs, ys, dearer, slots = self._xs, self._ys, self._dearer, self._ride_slots
+        min_x, min_y, max_x, max_y = self._world.bounds()
+        height = max_y - min_y + 1
+        scale = self._cell_cost if goal >= 0 else 0.0
+        goal_x, goal_y = (xs[goal], ys[goal]) if goal >= 0 else (0, 0)
+
+        # A ride without a route is a walk of unit steps across the grid, but a
+        # ride may not end where its start has a dearer route than the walk.
+        # Rides are kept per cell, cheapest first, as [spent, start]; a start
+        # without dearer routes is unrestricted and beats every dearer ride, and
+        # one more ride than the most dearer routes into a location always
+        # leaves an allowed one.
+        cost = {source: 0}
+        via = {source: source}
+        rides: dict[int, list[list[int]]] = {}
+        heap = [(scale * (abs(xs[source] - goal_x) + abs(ys[source] - goal_y)), 0, -1, source)]
+        remaining = set(targets)
+        remaining.discard(source)
+        while heap and remaining:
+            _, spent, cell, start = heappop(heap)
+            if cell < 0:
+                if spent > cost[start]:
+                    continue
+                remaining.discard(start)
+                x, y = xs[start], ys[start]
+                for k in range(offsets[start], offsets[start + 1]):
+                    j, reached = route_targets[k], spent + route_costs[k]
+                    if reached <= limit and reached < cost.get(j, UNREACHABLE):
+                        cost[j], via[j] = reached, start
+                        heappush(heap, (reached + scale * (abs(xs[j] - goal_x) + abs(ys[j] - goal_y)), reached, -1, j))
+                if cells[(x - min_x) * height + (y - min_y)] == -2:
+                    # Locations sharing a cell are a free ride apart
+                    for j in self._world.indices_at(x, y):
+                        if j not in dearer.get(start, ()) and spent < cost.get(j, UNREACHABLE):
+                            cost[j], via[j] = spent, start
+                            heappush(heap, (spent + scale * (abs(x - goal_x) + abs(y - goal_y)), spent, -1, j))
+            else:
+                if [spent, start] not in rides.get(cell, ()):
+                    continue
+                x, y = cell // height + min_x, cell % height + min_y
+            reached = spent + 1
+            if reached > limit:
+                continue
+            avoid = dearer.get(start)
+            for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if not (min_x <= nx <= max_x and min_y <= ny <= max_y):
+                    continue
+                next_cell = (nx - min_x) * height + (ny - min_y)
+                estimate = reached + scale * (abs(nx - goal_x) + abs(ny - goal_y))
+                slot = cells[next_cell]
+                if slot >= 0 and slot not in dearer and (avoid is None or slot not in avoid):
+                    # Stopping here costs no more and leaves an unrestricted ride on
+                    if reached < cost.get(slot, UNREACHABLE):
+                        cost[slot], via[slot] = reached, start
+                        heappush(heap, (estimate, reached, -1, slot))
+                    continue
+                if self._keep_ride(rides.setdefault(next_cell, []), reached, start, avoid is None, slots):
+                    heappush(heap, (estimate, reached, next_cell, start))
+                if slot == -1:
+                    continue
+                for j in ([slot] if slot >= 0 else self._world.indices_at(nx, ny)):
+                    if (avoid is None or j not in avoid) and reached < cost.get(j, UNREACHABLE):
+                        cost[j], via[j] = reached, start
+                        heappush(heap, (estimate, reached, -1, j))
+        return cost, via
+
+    def _keep_ride(self, kept: list[list[int]], spent: int, start: int, free: bool, slots: int) -> bool:
+        """Add a ride to a cell's cheapest rides, if it is one of them"""
+        for position, (other_spent, other_start) in enumerate(kept):
+            if other_spent > spent:
+                break
+            if other_start == start or other_start not in self._dearer:
+                return False
+        else:
+            position = len(kept)
+        if position >= slots:
+            return False
+        kept[:] = [ride for ride in kept if ride[1] != start]
+        kept.insert(min(position, len(kept)), [spent, start])
+        if free:
+            del kept[position + 1:]
+        del kept[slots:]
+        return True
+
+    def all_pairs(self) -> np.ndarray:
+        """Get the N x N matrix of cheapest multi-hop energy costs; only for maps small enough to be dense"""
+        if not self._world.dense:
+            raise ValueError(f"an all-pairs cost matrix is only built for maps of at most {MATRIX_MAX_LOCATIONS} locations")
+        n = len(self._world.get_locations())
+        return np.stack([self._tree(i)[0] for i in range(n)])
+
+    def costs_from(self, from_location_id: int) -> np.ndarray:
+        """Get the cheapest multi-hop energy cost from a location to every index
+
+        Big maps are not searched whole: there it is the direct-hop cost, an
+        upper bound; use ``costs_between()`` for the cheapest costs to a few places.
+        """
+        if not self._world.dense:
+            return self._world.cost_row(from_location_id)
+        return self._tree(self._world.index_of(from_location_id))[0]
+
+    def costs_rows(self, from_location_ids: list[int]) -> list[np.ndarray]:
+        """Get ``costs_from()`` for several locations, computing the missing trees in one pass"""
+        if not self._world.dense:
+            return [self.costs_from(location_id) for location_id in from_location_ids]
+        return [dist for dist, _ in self._trees_from([self._world.index_of(location_id) for location_id in from_location_ids])]
+
+    def costs_between(self, from_location_ids: list[int], to_location_ids: list[int], limit: int = UNREACHABLE) -> list[list[int]]:
+        """Get the cheapest multi-hop energy cost from each of some locations to each of others
+
+        Big maps are only searched up to ``limit``; a cost above it may come
+        back as the direct hop instead, which is never cheaper.
+        """
+        world = self._world
+        if world.dense or not self.multi_hop:
+            rows = self.costs_rows(from_location_ids)
+            columns = [world.index_of(location_id) for location_id in to_location_ids]
+            return [[int(row[j]) for j in columns] for row in rows]
+        targets = [world.index_of(location_id) for location_id in to_location_ids]
+        result = []
+        for location_id in from_location_ids:
+            # No cheapest cost is above the direct hop
+            direct = [world.energy_cost(location_id, target) for target in to_location_ids]
+            source = world.index_of(location_id)
+            cost, _ = self._search(source, set(targets), min(max(direct, default=0), limit))
+            result.append([min(cost.get(j, UNREACHABLE), hop) if j != source else 0 for j, hop in zip(targets, direct)])
+        return result
+
+    def cheapest_cost(self, from_location_id: int, to_location_id: int) -> Optional[int]:
+        """Get the cheapest energy cost between two locations, or None if unreachable"""
+        if not self._world.dense:
+            route = self.plan(from_location_id, to_location_id)
+            return route[1] if route else None
+        dist, _ = self._tree(self._world.index_of(from_location_id))
+        cost = int(dist[self._world.index_of(to_location_id)])
+        return None if cost >= UNREACHABLE else cost
+
+    def plan(self, from_location_id: int, to_location_id: int) -> Optional[tuple[list[LocationRow], int]]:
+        """Get the cheapest path (including both ends) and its energy cost"""
+        locations = self._world.get_locations()
+        source = self._world.index_of(from_location_id)
+        target = self._world.index_of(to_location_id)
+        if not self._world.dense:
+            direct = self._world.energy_cost(from_location_id, to_location_id)
+            if source == target:
+                return [locations[source]], 0
+            if not self.multi_hop:
+                return [locations[source], locations[target]], direct
+            cost, via = self._search(source, {target}, direct, target)
+            if cost.get(target, UNREACHABLE) >= direct:
+                return [locations[source], locations[target]], direct
+            path = [target]
+            while path[-1] != source:
+                path.append(via[path[-1]])
+            path.reverse()
+            return [locations[i] for i in path], cost[target]
+
+        dist, pred = self._tree(source)
+        if dist[target] >= UNREACHABLE:
+            return None
+
+        path = [target]
+        while path[-1] != source:
+            path.append(int(pred[path[-1]]))
+        path.reverse()
+        return [locations[i] for i in path], int(dist[target])
@@ -0,0 +1,108 @@
+import random
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+from engine import new_layout_seed
+from models import Layout
+
+# Seeded layouts (or idle games) generated per refill round
+POOL_REFILL_BATCH = 50
+
+
+class LayoutPool:
+    """Background pool of seeded event layouts and, optionally, idle game rows
+
+    A worker thread keeps ``size`` layouts ready, and ``idle_games`` games
+    already inserted with status ``idle``, so starting a game only claims
+    one. Every game stores the seed its layout came from, so
+    ``engine.seeded_layout()`` rebuilds any game's layout; passing ``seed``
+    makes the stream of seeds itself repeatable.
+    """
+
+    def __init__(
+        self,
+        make_layout: Callable[[int], Layout],
+        size: int,
+        create_idle: Optional[Callable[[list[int], list[Layout]], list[int]]] = None,
+        idle_games: int = 0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.size = size
+        self.idle_games = idle_games if create_idle else 0
+        self._make_layout = make_layout
+        self._create_idle = create_idle
+        self._seeds = random.Random(seed)
+        self._layouts: deque[tuple[int, Layout]] = deque()
+        self._games: deque[int] = deque()
+        self._wanted = threading.Condition()
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._refill, name="layout-pool", daemon=True)
+        self._thread.start()
+
+    def _next_seed(self) -> int:
+        with self._wanted:
+            return new_layout_seed(self._seeds)
+
+    def _refill(self) -> None:
+        while True:
+            with self._wanted:
+                self._wanted.wait_for(
+                    lambda: self._closed or len(self._layouts) < self.size or len(self._games) < self.idle_games
+                )
+                if self._closed:
+                    return
+                layouts_wanted = min(POOL_REFILL_BATCH, self.size - len(self._layouts))
+                games_wanted = min(POOL_REFILL_BATCH, self.idle_games - len(self._games))
+
+            if layouts_wanted > 0:
+                seeds = [self._next_seed() for _ in range(layouts_wanted)]
+                layouts = [(seed, self._make_layout(seed)) for seed in seeds]
+                with self._wanted:
+                    self._layouts.extend(layouts)
+            if games_wanted > 0 and self._create_idle:
+                seeds = [self._next_seed() for _ in range(games_wanted)]
+                try:
+                    game_ids = self._create_idle(seeds, [self._make_layout(seed) for seed in seeds])
+                except Exception:
+                    # Storage hiccup: count it and let players fall back to creating games
+                    self.errors += 1
+                    with self._wanted:
+                        self._wanted.wait(1.0)
+                    continue
+                with self._wanted:
+                    self._games.extend(game_ids)
+
+    def take_layout(self) -> tuple[int, Layout]:
+        """Get a (seed, layout) pair, generating one on the spot if the pool is empty"""
+        with self._wanted:
+            if self._layouts:
+                self.hits += 1
+                item = self._layouts.popleft()
+                self._wanted.notify()
+                return item
+            self.misses += 1
+        seed = self._next_seed()
+        return seed, self._make_layout(seed)
+
+    def take_game(self) -> Optional[int]:
+        """Get the id of an idle pre-inserted game, if one is ready"""
+        with self._wanted:
+            if not self._games:
+                return None
+            game_id = self._games.popleft()
+            self._wanted.notify()
+            return game_id
+
+    def close(self) -> list[int]:
+        """Stop the worker and return the idle games nobody claimed"""
+        with self._wanted:
+            self._closed = True
+            self._wanted.notify()
+        self._thread.join()
+        unclaimed = list(self._games)
+        self._games.clear()
+        return unclaimed
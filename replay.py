@@ -0,0 +1,114 @@
+"""Rebuild a game's state at any turn from its snapshots and action log
+
+Usage:
+    python replay.py 42                # state after the last logged turn
+    python replay.py 42 --turn 10 --log
+    python replay.py 42 --verify       # compare with the live game row
+    python replay.py 42 --layout       # rebuild the event layout from its seed
+"""
+import argparse
+import sys
+from typing import Optional
+
+from engine import seeded_layout
+from models import ActionRow, Layout, SnapshotRow
+from storage import Storage, create_storage
+
+
+def apply_action(state: SnapshotRow, action: ActionRow) -> SnapshotRow:
+    """Apply one logged action to a state"""
+    state = SnapshotRow(**state)
+    state["turn"] = action["turn"]
+    state["money"] += action["money_change"]
+    state["energy"] += action["energy_change"]
+    if action["kind"] == "move":
+        state["current_place"] = action["value"]
+    if action["key_found"]:
+        state["key_found"] = True
+    return state
+
+
+def replay(backend: Storage, game_id: int, turn: Optional[int] = None) -> Optional[tuple[SnapshotRow, list[ActionRow]]]:
+    """Get a game's state after ``turn`` (default: the last one) and the actions replayed to reach it
+
+    Starts from the latest snapshot at or before the turn, so only the
+    actions logged since that snapshot are read.
+    """
+    if turn is None:
+        turn = backend.fetch_last_turn(game_id)
+    snapshot = backend.fetch_snapshot(game_id, turn)
+    if snapshot is None:
+        return None
+    state = SnapshotRow(**snapshot)
+    state["key_found"] = bool(state["key_found"])
+    actions = backend.fetch_actions(game_id, snapshot["turn"], turn)
+    for action in actions:
+        state = apply_action(state, action)
+    return state, actions
+
+
+def stored_layout(backend: Storage, game_id: int) -> Layout:
+    """Get a game's placed events as (event id, location id) pairs"""
+    rows = backend.fetch_game_children([game_id])["event_locations"]
+    return sorted((row["event_id"], row["place_id"]) for row in rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild a game's state from its action log")
+    parser.add_argument("game_id", type=int)
+    parser.add_argument("--turn", type=int, help="turn to rebuild (default: the last logged one)")
+    parser.add_argument("--storage", help="backend to read from (mysql, sqlite; default: $GAME_STORAGE)")
+    parser.add_argument("--log", action="store_true", help="print the replayed actions")
+    parser.add_argument("--verify", action="store_true", help="compare the result with the live game row")
+    parser.add_argument("--layout", action="store_true", help="regenerate the event layout from the game's seed and compare it")
+    args = parser.parse_args()
+
+    backend = create_storage(args.storage)
+    result = replay(backend, args.game_id, args.turn)
+    if result is None:
+        sys.exit(f"❌ No snapshot for game {args.game_id}; it cannot be replayed.")
+    state, actions = result
+
+    if args.log:
+        print(f"\n📜 ACTIONS REPLAYED (from the turn {state['turn'] - len(actions)} snapshot)")
+        print("=" * 55)
+        for action in actions:
+            print(
+                f"{action['turn']:5d}  {action['kind'].ljust(6)} {str(action['value']).ljust(8)} "
+                f"money {action['money_change']:+d}, energy {action['energy_change']:+d}"
+                + (" 🗝️" if action["key_found"] else "")
+            )
+
+    print(f"\n🔁 GAME {args.game_id} AFTER TURN {state['turn']}")
+    print("=" * 40)
+    print(f"📍 Location id: {state['current_place']}")
+    print(f"💰 Money: ${state['money']}")
+    print(f"⚡ Energy: {state['energy']}")
+    print(f"🗝️ Key found: {'Yes' if state['key_found'] else 'No'}")
+
+    if args.verify:
+        live = backend.get_game_state(args.game_id)
+        fields = ("money", "energy", "current_place", "key_found")
+        if live and all(live[field] == state[field] for field in fields):  # type: ignore
+            print("✅ Matches the live game row")
+        else:
+            print("❌ Differs from the live game row (unflushed turns or a crash)")
+            sys.exit(1)
+
+    if args.layout:
+        live = backend.get_game_state(args.game_id)
+        if not live or live.get("layout_seed") is None:
+            sys.exit(f"❌ Game {args.game_id} has no layout seed (created before seeded layouts).")
+        place_ids = [location["id"] for location in backend.fetch_locations() if not location["is_home"]]
+        event_ids = [event["id"] for event in backend.fetch_events()]
+        layout = sorted(seeded_layout(place_ids, event_ids, live["layout_seed"]))
+        print(f"\n🎲 LAYOUT SEED {live['layout_seed']}: {len(layout)} events")
+        if layout == stored_layout(backend, args.game_id):
+            print("✅ Regenerates the stored event layout")
+        else:
+            print("❌ Differs from the stored event layout (the locations or events changed since)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
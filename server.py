@@ -0,0 +1,298 @@
+"""Asyncio game server: many concurrent sessions over TCP or a Unix socket
+
+Line protocol: the client sends one command per line (the same commands as the
+terminal game). Every server reply ends with a line containing only ">", so a
+client knows when to send the next line. The first line is the player name,
+and a move onto an event is answered with a Y/N line.
+
+Usage:
+    python server.py --port 8765
+    python server.py --unix /tmp/bike_in_town.sock
+    python server.py --load-test 1000        # server plus 1000 local clients
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar, Union
+
+import game
+from engine import QUIT
+from models import EventLocationRow, ScoreRow
+from session import GameSession
+from solver import Tour
+from storage import GameConflictError
+from tracing import tracer
+
+PROMPT = ">"
+T = TypeVar("T")
+
+
+class ServerSession:
+    """One connected player: the game session plus protocol state"""
+
+    def __init__(self, session: GameSession) -> None:
+        self.session = session
+        self.visited_locations = {1}  # Start with HOME visited
+        self.pending_event: Optional[EventLocationRow] = None
+        self.game_over = False
+
+    def needs_prefetch(self, line: str) -> bool:
+        """Whether the command reads storage or searches routes, so ``prefetch()`` must run before ``respond()``"""
+        command = line.lower().strip()
+        return self.pending_event is None and (game.is_leaderboard_command(command) or command == "hint")
+
+    def prefetch(self, line: str) -> Union[list[ScoreRow], Tour, None]:
+        """Fetch the data or search result a command needs before ``respond()``; run it on the executor"""
+        command = line.lower().strip()
+        if command == "hint":
+            return game.find_hint(self.session)
+        board = game.leaderboard_board(command)
+        return game.get_leaderboard(board) if board else None
+
+    def respond(self, line: str, prefetched: Union[list[ScoreRow], Tour, None] = None) -> str:
+        """Handle one line from the client and return the reply text
+
+        Runs synchronously with no awaits inside, so redirecting stdout to
+        capture the game's output cannot interleave with other sessions.
+        It runs on the event loop, so commands that read storage or search
+        routes get their data from ``prefetch()`` (the scores for the
+        leaderboard, the tour for a hint).
+        """
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            command = line.lower().strip()
+            tracer.begin_command(command.split()[0] if command else "(empty)")
+            try:
+                if self.pending_event is not None:
+                    self._answer_event(command)
+                elif game.is_leaderboard_command(command):
+                    game.show_leaderboard(command, prefetched)  # type: ignore
+                elif command == "hint":
+                    game.show_hint(self.session, prefetched)  # type: ignore
+                else:
+                    self._run(command)
+            finally:
+                tracer.end_command()
+            if not self.game_over and self.pending_event is None:
+                current_location = game.get_location_info(self.session.state["current_place"])
+                if current_location:
+                    print(f"\n📍 You are at {current_location['name']}")
+        return output.getvalue()
+
+    def _run(self, command: str) -> None:
+        self.game_over, arrived_at = game.run_command(self.session, command, self.visited_locations)
+        if arrived_at:
+            event = self.session.event_at(arrived_at["id"])
+            if event:
+                self.pending_event = event
+                print("There is an event here! Do you want to open it? (Y/N): ")
+                return
+            print("Sorry! No event in this location.")
+        if command.startswith("move "):
+            self.game_over = game.check_game_over(self.session)
+
+    def _answer_event(self, answer: str) -> None:
+        if answer.upper() == "Y":
+            game.open_event(self.session, self.pending_event)  # type: ignore
+        elif answer.upper() == "N":
+            game.skip_event(self.session, self.pending_event)  # type: ignore
+        else:
+            print("Please choose Y or N!")
+            return
+        self.pending_event = None
+        self.game_over = game.check_game_over(self.session)
+
+
+class GameServer:
+    """Serves the line protocol; database work runs on a bounded thread pool"""
+
+    def __init__(self, max_sessions: int = 10000, idle_timeout: float = 300.0, db_workers: int = 8, max_line: int = 1024) -> None:
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_line = max_line
+        self.active_sessions = 0
+        self.total_sessions = 0
+        self._executor = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix="db")
+
+    async def run_db(self, func: Callable[..., T], *args: Any) -> T:
+        """Run blocking storage work on the bounded executor"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args))
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765, unix_path: Optional[str] = None) -> asyncio.AbstractServer:
+        """Warm the world cache and start listening"""
+        await self.run_db(game.get_world().prepare)
+        if unix_path:
+            return await asyncio.start_unix_server(self.handle_client, path=unix_path, limit=self.max_line)
+        return await asyncio.start_server(self.handle_client, host, port, limit=self.max_line, backlog=1024)
+
+    async def _send(self, writer: asyncio.StreamWriter, text: str) -> None:
+        writer.write((text.rstrip("\n") + f"\n{PROMPT}\n").encode())
+        # Backpressure: stop reading this client's commands until it drains our replies
+        await writer.drain()
+
+    async def _read_line(self, reader: asyncio.StreamReader) -> Optional[str]:
+        try:
+            line = await asyncio.wait_for(reader.readline(), timeout=self.idle_timeout)
+        except (asyncio.TimeoutError, asyncio.LimitOverrunError, ValueError):
+            return None
+        return line.decode(errors="replace").rstrip("\r\n") if line else None
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self.active_sessions >= self.max_sessions:
+            writer.write(b"Server is full, try again later.\n")
+            await writer.drain()
+            writer.close()
+            return
+
+        self.active_sessions += 1
+        self.total_sessions += 1
+        client: Optional[ServerSession] = None
+        try:
+            await self._send(writer, "🚲 BIKE IN TOWN 🚲\nWelcome to your adventure!\nEnter your name:")
+            player_name = await self._read_line(reader)
+            if player_name is None:
+                return
+            client = ServerSession(await self.run_db(game.start_game, player_name[:40]))
+            await self._send(
+                writer,
+                "Game started! You begin at HOME with $100 and 100 energy.\n"
+                "Type 'help' for available commands.\n\n📍 You are at HOME",
+            )
+
+            while not client.game_over:
+                line = await self._read_line(reader)
+                if line is None:
+                    await self._send(writer, "⏰ Session closed.")
+                    break
+                prefetched = await self.run_db(client.prefetch, line) if client.needs_prefetch(line) else None
+                reply = client.respond(line, prefetched)
+                if client.game_over:
+                    await self.run_db(client.session.flush)
+                else:
+                    await self.run_db(client.session.command_done)
+                await self._send(writer, reply)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except GameConflictError:
+            # Another session saved this game first: its progress stands and this one's is dropped
+            client = None
+            with contextlib.suppress(ConnectionError):
+                await self._send(writer, "❌ This game was saved from another session; closing.")
+        finally:
+            self.active_sessions -= 1
+            if client and not client.game_over:
+                # Disconnected or timed out: there is no way back into this game
+                client.session.finish(QUIT)
+            if client and client.session.dirty:
+                await self.run_db(client.session.flush)
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+async def _read_reply(reader: asyncio.StreamReader) -> str:
+    lines: list[str] = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        text = line.decode().rstrip("\n")
+        if text == PROMPT:
+            return "\n".join(lines)
+        lines.append(text)
+
+
+async def _load_client(host: str, port: int, commands: list[str], latencies: list[float]) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await _read_reply(reader)
+        for command in commands:
+            started = time.perf_counter()
+            writer.write((command + "\n").encode())
+            await writer.drain()
+            reply = await _read_reply(reader)
+            latencies.append(time.perf_counter() - started)
+            if "(Y/N)" in reply:
+                writer.write(b"Y\n")
+                await writer.drain()
+                await _read_reply(reader)
+    finally:
+        writer.close()
+
+
+async def load_test(server: GameServer, clients: int, port: int) -> None:
+    """Run ``clients`` concurrent scripted sessions against a local server"""
+    listener = await server.start("127.0.0.1", port)
+    port = listener.sockets[0].getsockname()[1]
+    commands = ["loadtest", "info", "locations", "move park", "buy 5", "map", "move library", "quit"]
+    latencies: list[float] = []
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(_load_client("127.0.0.1", port, commands, latencies) for _ in range(clients)),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - started
+    listener.close()
+    await listener.wait_closed()
+
+    failures = [result for result in results if isinstance(result, BaseException)]
+    latencies.sort()
+    print("\n🌐 LOAD TEST")
+    print("=" * 40)
+    print(f"Sessions:        {clients} ({len(failures)} failed)")
+    print(f"Commands:        {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s)")
+    if latencies:
+        for label, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+            print(f"Latency {label}:     {latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000:.2f} ms")
+    if failures:
+        print(f"First failure:   {failures[0]!r}")
+
+
+async def serve(server: GameServer, host: str, port: int, unix_path: Optional[str]) -> None:
+    listener = await server.start(host, port, unix_path)
+    print(f"🚲 Serving on {unix_path or f'{host}:{port}'} (max {server.max_sessions} sessions)")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the game to many players at once")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="seconds before an idle session is closed")
+    parser.add_argument("--db-workers", type=int, default=int(os.environ.get("DATABASE_POOL_SIZE", "5")))
+    parser.add_argument("--load-test", type=int, metavar="CLIENTS", help="start the server and run this many local clients against it")
+    parser.add_argument("--pool-size", type=int, default=0, help="pre-generated event layouts to keep ready")
+    parser.add_argument("--pool-games", type=int, default=0, help="idle games to keep inserted, ready to be claimed")
+    parser.add_argument("--pool-seed", type=int, help="seed for the pool's layout seeds, for repeatable runs")
+    args = parser.parse_args()
+
+    server = GameServer(args.max_sessions, args.idle_timeout, args.db_workers)
+    if args.pool_size or args.pool_games:
+        game.get_world().prepare()
+        game.start_layout_pool(args.pool_size, args.pool_games, args.pool_seed)
+    try:
+        if args.load_test:
+            asyncio.run(load_test(server, args.load_test, 0))
+        else:
+            asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped.")
+    finally:
+        server.close()
+        game.stop_layout_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import os
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from engine import PLAYING, WON
+from models import ActionRow, EventLocationRow, GameCommit, GameEventRow, GameStateRow, ScoreRow, SnapshotRow
+from storage import Storage
+
+# Flush dirty state to storage after this many commands (0 disables the periodic flush)
+SESSION_FLUSH_EVERY = int(os.environ.get("SESSION_FLUSH_EVERY", "10"))
+# Snapshot the game state on flush once this many turns were logged since the last one
+SESSION_SNAPSHOT_EVERY = int(os.environ.get("SESSION_SNAPSHOT_EVERY", "50"))
+
+# update() argument name -> game table column
+_COLUMNS = {
+    "money": "money",
+    "energy": "energy",
+    "location": "current_place",
+    "key_found": "key_found",
+}
+
+# An event's (name, money_change, energy_change, is_key, is_bully, description)
+EventKind = tuple[str, int, int, bool, bool, str]
+
+# Every distinct event kind seen by any session, so sessions share one copy of its text
+_event_kinds: dict[EventKind, EventKind] = {}
+
+
+def _intern_kind(event: GameEventRow) -> EventKind:
+    kind = (event["name"], event["money_change"], event["energy_change"], event["is_key"], event["is_bully"], event["description"])
+    return _event_kinds.setdefault(kind, kind)
+
+
+class GameSession:
+    """In-memory state of one game, written back to storage in batches
+
+    The session owns the game row and the game's unresolved event_locations.
+    Updates only touch memory and mark fields dirty; ``flush()`` hands every
+    dirty field, resolved event and action passed to ``record()`` (with a
+    state snapshot every ``snapshot_every`` turns) to ``commit_game()``, which
+    applies them in one transaction, with the leaderboard score of a won
+    game. The commit only applies while the game
+    is still at the turn this session last saw, so a second client playing
+    the same game gets GameConflictError instead of overwriting it.
+
+    Sessions are slotted, and the game's events are kept as arrays sorted by
+    place (place, event_locations id, still open) plus a shared, interned kind
+    per event; event rows are built when asked for.
+    """
+
+    __slots__ = (
+        "game_id", "state", "flush_every", "snapshot_every", "turn", "status", "_backend",
+        "_event_places", "_event_location_ids", "_event_kinds", "_open",
+        "_dirty", "_resolved", "_commands", "_snapshot_turn", "_actions", "_finished",
+    )
+
+    def __init__(self, backend: Storage, game_id: int, flush_every: int = SESSION_FLUSH_EVERY, snapshot_every: int = SESSION_SNAPSHOT_EVERY) -> None:
+        state = backend.get_game_state(game_id)
+        if not state:
+            raise ValueError(f"Game {game_id} not found")
+        self.game_id = game_id
+        self.state: GameStateRow = state
+        self.flush_every = flush_every
+        self.snapshot_every = snapshot_every
+        self._backend = backend
+        # Unresolved events, loaded once so arriving somewhere needs no query
+        events = sorted(backend.fetch_unresolved_events(game_id), key=lambda event: event["place_id"])
+        self._event_places = array("q", [event["place_id"] for event in events])
+        self._event_location_ids = array("q", [event["event_location_id"] for event in events])
+        self._event_kinds = [_intern_kind(event) for event in events]
+        self._open = bytearray(b"\x01") * len(events)
+        self._dirty: set[str] = set()
+        self._resolved: list[int] = []
+        self._commands = 0
+        self.turn = state["turn"]
+        self._snapshot_turn = self.turn
+        self._actions: list[ActionRow] = []
+        # Final status ("won", "lost" or "quit") waiting to be written
+        self._finished: Optional[str] = None
+        self.status = PLAYING
+
+    @property
+    def dirty(self) -> bool:
+        """Whether there are changes not yet written to storage"""
+        return bool(self._dirty or self._resolved or self._actions or self._finished)
+
+    def update(self, money: Optional[int] = None, energy: Optional[int] = None, location: Optional[int] = None, key_found: Optional[bool] = None) -> None:
+        """Update game state in memory"""
+        changes = {"money": money, "energy": energy, "location": location, "key_found": key_found}
+        for name, value in changes.items():
+            if value is not None and self.state[_COLUMNS[name]] != value:  # type: ignore
+                self.state[_COLUMNS[name]] = value  # type: ignore
+                self._dirty.add(name)
+
+    def _event_row(self, i: int) -> GameEventRow:
+        name, money_change, energy_change, is_key, is_bully, description = self._event_kinds[i]
+        row: GameEventRow = {
+            "event_location_id": self._event_location_ids[i],
+            "name": name,
+            "money_change": money_change,
+            "energy_change": energy_change,
+            "is_key": is_key,
+            "is_bully": is_bully,
+            "description": description,
+            "place_id": self._event_places[i],
+        }
+        return row
+
+    def unresolved_events(self) -> list[GameEventRow]:
+        """Get the game's unresolved events as seen by this session"""
+        return [self._event_row(i) for i, is_open in enumerate(self._open) if is_open]
+
+    def event_at(self, location_id: int) -> Optional[EventLocationRow]:
+        """Get the unresolved event at a location, if any"""
+        i = bisect_left(self._event_places, location_id)
+        while i < len(self._event_places) and self._event_places[i] == location_id:
+            if self._open[i]:
+                return self._event_row(i)
+            i += 1
+        return None
+
+    def resolve_event(self, event_location_id: int) -> None:
+        """Mark an event as resolved in memory"""
+        if event_location_id in self._event_location_ids:
+            self._open[self._event_location_ids.index(event_location_id)] = 0
+        self._resolved.append(event_location_id)
+
+    def record(self, kind: str, value: int, money_change: int = 0, energy_change: int = 0, key_found: bool = False) -> None:
+        """Log an action ("move", "buy", "event" or "skip") as the next turn"""
+        self.turn += 1
+        self._actions.append(
+            ActionRow(
+                game_id=self.game_id,
+                turn=self.turn,
+                kind=kind,
+                value=value,
+                money_change=money_change,
+                energy_change=energy_change,
+                key_found=key_found,
+            )
+        )
+
+    def finish(self, status: str) -> None:
+        """Mark the game won, lost or quit; written on the next flush"""
+        self._finished = status
+        self.status = status
+
+    def command_done(self) -> None:
+        """Count a finished command and flush every ``flush_every`` commands"""
+        self._commands += 1
+        if self.flush_every and self._commands % self.flush_every == 0:
+            self.flush()
+
+    def flush(self) -> None:
+        """Commit logged actions, dirty fields, resolved events and the final status in one transaction
+
+        Raises GameConflictError if another session saved the game first;
+        the pending changes are then kept, not written.
+        """
+        if not self.dirty:
+            return
+        snapshot = None
+        if self.snapshot_every and self.turn - self._snapshot_turn >= self.snapshot_every:
+            snapshot = SnapshotRow(
+                game_id=self.game_id,
+                turn=self.turn,
+                money=self.state["money"],
+                energy=self.state["energy"],
+                current_place=self.state["current_place"],
+                key_found=bool(self.state["key_found"]),
+            )
+        fields: dict[str, Any] = {
+            name: self.state[column] for name, column in _COLUMNS.items() if name in self._dirty  # type: ignore
+        }
+        finished_at = datetime.now(timezone.utc).replace(tzinfo=None) if self._finished else None
+        score = None
+        if self._finished == WON and finished_at:
+            score = ScoreRow(
+                game_id=self.game_id,
+                player_name=self.state["player_name"],
+                money=self.state["money"],
+                energy=self.state["energy"],
+                turns=self.turn,
+                finished_at=finished_at,
+            )
+        commit = GameCommit(
+            game_id=self.game_id,
+            base_turn=self.state["turn"],
+            actions=self._actions,
+            fields=fields,
+            resolved=self._resolved,
+            snapshot=snapshot,
+            status=self._finished,
+            finished_at=finished_at,
+            score=score,
+        )
+        self._backend.commit_game(commit)
+        self.state["turn"] = commit.turn
+        self._actions = []
+        self._dirty.clear()
+        self._resolved = []
+        if snapshot:
+            self._snapshot_turn = self.turn
+        self._finished = None
@@ -0,0 +1,172 @@
+"""Headless Monte Carlo runner: plays many games with a bot policy across all cores
+
+Usage:
+    python simulate.py --games 1000000 --policy greedy
+    python simulate.py --games 10000 --policy planner --workers 1 --json result.json
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, TypedDict
+
+from bots import POLICIES, Policy
+from engine import LOST, PLAYING, QUIT, WON, Action, Engine
+from models import EventRow, LocationRow, RouteRow
+from storage import create_storage
+from world import World
+
+WorldTables = tuple[list[LocationRow], list[EventRow], list[RouteRow]]
+
+
+class SimulationStats(TypedDict):
+    games: int
+    wins: int
+    losses: int
+    quits: int
+    timeouts: int
+    total_money: int
+    total_energy: int
+    total_turns_to_win: int
+
+
+def empty_stats() -> SimulationStats:
+    return SimulationStats(
+        games=0,
+        wins=0,
+        losses=0,
+        quits=0,
+        timeouts=0,
+        total_money=0,
+        total_energy=0,
+        total_turns_to_win=0,
+    )
+
+
+def merge_stats(total: SimulationStats, part: SimulationStats) -> None:
+    """Add a partial result into a running total"""
+    for key in total:
+        total[key] += part[key]  # type: ignore
+
+
+def play_game(engine: Engine, policy: Policy, rng: random.Random, max_turns: int, start_money: int = 100, start_energy: int = 100) -> tuple[str, int, int, int]:
+    """Play one game to the end; returns status, final money, final energy and turns"""
+    state = engine.random_state(rng, start_money, start_energy)
+    while state["status"] == PLAYING and state["turns"] < max_turns:
+        state, outcome = engine.step(state, policy(engine, state, rng))
+        if not outcome.ok and state["pending_event"] is None:
+            # A policy that keeps issuing invalid actions would never finish
+            state, _ = engine.step(state, Action("quit"))
+    return state["status"], state["money"], state["energy"], state["turns"]
+
+
+# Per-process engine, built once by the pool initializer
+_engine: Optional[Engine] = None
+
+
+def _init_worker(tables: WorldTables) -> None:
+    global _engine
+    _engine = Engine(World(lambda: tables))
+
+
+def run_chunk(policy_name: str, games: int, seed: int, max_turns: int) -> SimulationStats:
+    """Play a chunk of games in this process"""
+    assert _engine is not None, "worker not initialised"
+    policy = POLICIES[policy_name]()
+    rng = random.Random(seed)
+    stats = empty_stats()
+    for _ in range(games):
+        status, money, energy, turns = play_game(_engine, policy, rng, max_turns)
+        stats["games"] += 1
+        stats["total_money"] += money
+        stats["total_energy"] += energy
+        if status == WON:
+            stats["wins"] += 1
+            stats["total_turns_to_win"] += turns
+        elif status == LOST:
+            stats["losses"] += 1
+        elif status == QUIT:
+            stats["quits"] += 1
+        else:
+            stats["timeouts"] += 1
+    return stats
+
+
+def run_simulation(tables: WorldTables, policy_name: str, games: int, workers: int, chunk_size: int = 2000, seed: int = 0, max_turns: int = 500) -> SimulationStats:
+    """Play ``games`` games split into seeded chunks over a process pool"""
+    chunks = [
+        (policy_name, min(chunk_size, games - start), seed + index, max_turns)
+        for index, start in enumerate(range(0, games, chunk_size))
+    ]
+    total = empty_stats()
+
+    if workers <= 1:
+        _init_worker(tables)
+        for chunk in chunks:
+            merge_stats(total, run_chunk(*chunk))
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tables,)) as pool:
+        futures = [pool.submit(run_chunk, *chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            merge_stats(total, future.result())
+    return total
+
+
+def summarize(stats: SimulationStats) -> dict[str, float]:
+    """Compute rates and averages from raw totals"""
+    games = max(stats["games"], 1)
+    return {
+        "games": stats["games"],
+        "win_rate": stats["wins"] / games,
+        "loss_rate": stats["losses"] / games,
+        "quit_rate": stats["quits"] / games,
+        "timeout_rate": stats["timeouts"] / games,
+        "avg_final_money": stats["total_money"] / games,
+        "avg_final_energy": stats["total_energy"] / games,
+        "avg_turns_to_win": stats["total_turns_to_win"] / max(stats["wins"], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play many headless games with a bot policy")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="greedy")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=500)
+    parser.add_argument("--storage", default="memory", help="backend to read the world from (mysql, sqlite, memory)")
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+
+    backend = create_storage(args.storage)
+    tables: WorldTables = (backend.fetch_locations(), backend.fetch_events(), backend.fetch_routes())
+
+    started = time.perf_counter()
+    stats = run_simulation(tables, args.policy, args.games, args.workers, args.chunk_size, args.seed, args.max_turns)
+    elapsed = time.perf_counter() - started
+    summary = summarize(stats)
+    summary["seconds"] = elapsed
+    summary["games_per_second"] = stats["games"] / elapsed if elapsed else 0.0
+
+    print(f"\n🤖 SIMULATION: {args.policy} policy, {args.workers} worker(s)")
+    print("=" * 40)
+    print(f"Games played:     {summary['games']}")
+    print(f"Win rate:         {summary['win_rate']:.2%}")
+    print(f"Loss rate:        {summary['loss_rate']:.2%}")
+    print(f"Gave up/timeout:  {summary['quit_rate']:.2%} / {summary['timeout_rate']:.2%}")
+    print(f"Avg final money:  ${summary['avg_final_money']:.1f}")
+    print(f"Avg final energy: {summary['avg_final_energy']:.1f}")
+    print(f"Avg turns to win: {summary['avg_turns_to_win']:.1f}")
+    print(f"Throughput:       {summary['games_per_second']:.0f} games/s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as result_file:
+            json.dump({"policy": args.policy, **summary}, result_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
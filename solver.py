@@ -0,0 +1,157 @@
+from typing import Callable, NamedTuple, Optional
+
+from engine import apply_event
+from models import GameEventRow
+from planner import UNREACHABLE, RoutePlanner
+from world import World
+
+# Most optional events the tour search considers, those nearest the start and the key first
+HINT_MAX_EVENTS = 12
+
+
+class TourLeg(NamedTuple):
+    location_id: int
+    energy_cost: int
+    buy: int  # energy to buy before setting off
+    event: Optional[GameEventRow]  # event to open on arrival, None to ride on (or for HOME)
+
+
+class Tour(NamedTuple):
+    legs: list[TourLeg]
+    energy: int  # total energy ridden
+    money_left: int
+    energy_left: int
+
+
+def event_gain(event: GameEventRow, money: int) -> int:
+    """Change in energy plus money from opening an event"""
+    new_money, new_energy, _ = apply_event(money, 0, False, event)  # type: ignore
+    return new_money - money + new_energy
+
+
+class TourSolver:
+    """Cheapest tour from the player's position to the key and back HOME
+
+    Money buys energy one for one at any time, so energy plus money acts as
+    one budget: riding spends it and opening an event adds the event's gain.
+    Along any order of stops the budget left is the start budget plus the
+    gains minus the energy ridden, so for each (opened stops, position) state
+    the cheapest arrival is also the richest. That makes a memoized bitmask
+    search over the stops exact. Optional stops are events with a positive
+    gain (notes, energy stashes), which only pay off when the budget does not
+    cover the direct ride. Branches are cut when the cheapest way to finish
+    already costs more than the best tour found, or more than the budget plus
+    every gain still on the map.
+    """
+
+    def __init__(self, world: World, planner: RoutePlanner) -> None:
+        self._world = world
+        self._planner = planner
+
+    def _costs(self, stops: list[int], budget: int) -> tuple[list[list[int]], list[list[int]]]:
+        """Cheapest ride costs between stops, and the stop each ride goes through (-1 for none)
+
+        Rides dearer than ``budget`` cannot be afforded, so big maps are not searched past it.
+        """
+        n = len(stops)
+        costs = self._planner.costs_between(stops, stops, budget)
+        # Mostly empty big maps only have direct hops, and riding via another stop may be cheaper
+        via = [[-1] * n for _ in range(n)]
+        for k in range(n):
+            for i in range(n):
+                for j in range(n):
+                    if costs[i][k] + costs[k][j] < costs[i][j]:
+                        costs[i][j] = costs[i][k] + costs[k][j]
+                        via[i][j] = k
+        return costs, via
+
+    def _detour(self, start: int, target: int) -> Callable[[GameEventRow], int]:
+        """Rough cost of fitting an event between the start and the target"""
+        if self._world.dense:
+            from_start, from_target = self._planner.costs_rows([start, target])
+
+            def detour(event: GameEventRow) -> int:
+                i = self._world.index_of(event["place_id"])
+                return int(from_start[i]) + int(from_target[i])
+
+            return detour
+        return lambda event: self._world.energy_cost(start, event["place_id"]) + self._world.energy_cost(target, event["place_id"])
+
+    def solve(self, start: int, home: int, energy: int, money: int, key_found: bool, events: list[GameEventRow]) -> Optional[Tour]:
+        """Find the cheapest way to the key (unless already found) and HOME, or None if there is none"""
+        key = next((event for event in events if event["is_key"]), None)
+        if not key_found and key is None:
+            return None
+        targets = [] if key_found or key is None else [key]
+        optional = [e for e in events if not e["is_key"] and event_gain(e, money) > 0]
+        if len(optional) > HINT_MAX_EVENTS:
+            optional = sorted(optional, key=self._detour(start, targets[0]["place_id"] if targets else home))
+            optional = optional[:HINT_MAX_EVENTS]
+        targets += optional
+
+        # Stop 0 is the start, stops 1..n the events (the key first, if needed), the last one HOME
+        stops = [start] + [event["place_id"] for event in targets] + [home]
+        events_at: list[Optional[GameEventRow]] = [None, *targets, None]
+        gains = [0] + [event_gain(event, money) for event in targets] + [0]
+        costs, via = self._costs(stops, energy + money + sum(gains))
+        home_stop = len(stops) - 1
+        key_stop = 1 if not key_found else -1
+        key_bit = 1 << 1 if not key_found else 0
+        total_gain = sum(gains)
+
+        best_cost = UNREACHABLE
+        best_order: list[int] = []
+        memo: dict[tuple[int, int], int] = {}
+
+        def search(stop: int, mask: int, cost: int, budget: int, gained: int, order: list[int]) -> None:
+            nonlocal best_cost, best_order
+            have_key = mask & key_bit == key_bit
+            to_finish = costs[stop][home_stop] if have_key else costs[stop][key_stop] + costs[key_stop][home_stop]
+            if cost + to_finish >= best_cost or budget + total_gain - gained < to_finish:
+                return
+            if memo.get((mask, stop), UNREACHABLE) <= cost:
+                return
+            memo[(mask, stop)] = cost
+            if have_key and budget >= costs[stop][home_stop]:
+                # Costs are shortest paths, so another stop on the way could only add energy
+                best_cost, best_order = cost + costs[stop][home_stop], order
+                return
+            candidates = [nxt for nxt in range(1, home_stop) if not mask & (1 << nxt) and costs[stop][nxt] <= budget]
+            # The key first, then the cheapest rides, so good tours and tight bounds come early
+            candidates.sort(key=lambda nxt: (nxt != key_stop, costs[stop][nxt]))
+            for nxt in candidates:
+                ride = costs[stop][nxt]
+                search(nxt, mask | (1 << nxt), cost + ride, budget - ride + gains[nxt], gained + gains[nxt], order + [nxt])
+
+        search(0, 0, 0, energy + money, 0, [])
+        if best_cost >= UNREACHABLE:
+            return None
+
+        # Expand rides into single moves: through other stops (riding past their
+        # events), then along the planner's path unless it only has direct hops
+        def expand(i: int, j: int) -> list[int]:
+            k = via[i][j]
+            return [j] if k < 0 else expand(i, k) + expand(k, j)
+
+        hops: list[tuple[int, Optional[GameEventRow]]] = []
+        here = 0
+        for target in best_order + [home_stop]:
+            for stop in expand(here, target):
+                if self._planner.multi_hop:
+                    path = self._planner.plan(stops[here], stops[stop])
+                    assert path is not None
+                    hops += [(location["id"], None) for location in path[0][1:-1]]
+                hops.append((stops[stop], events_at[stop] if stop == target else None))
+                here = stop
+
+        legs: list[TourLeg] = []
+        location = start
+        for target_id, event in hops:
+            ride = self._world.energy_cost(location, target_id)
+            buy = max(0, ride - energy)
+            money, energy = money - buy, energy + buy - ride
+            if event is not None:
+                money, energy, key_found = apply_event(money, energy, key_found, event)  # type: ignore
+            legs.append(TourLeg(target_id, ride, buy, event))
+            location = target_id
+        return Tour(legs, best_cost, money, energy)
@@ -0,0 +1,58 @@
+import numpy as np
+
+# Side length of a grid bucket, in map cells
+GRID_CELL_SIZE = 32
+
+
+class GridIndex:
+    """Grid-bucket spatial index over location coordinates
+
+    Locations are grouped into square buckets of ``cell_size`` cells. A
+    Manhattan-radius query only visits the buckets that overlap the diamond
+    around the query point and hold locations, so its cost depends on the
+    radius, and never exceeds the number of occupied buckets.
+    """
+
+    def __init__(self, xs: np.ndarray, ys: np.ndarray, cell_size: int = GRID_CELL_SIZE) -> None:
+        self.cell_size = cell_size
+        self._xs = xs
+        self._ys = ys
+        bx = xs // cell_size
+        by = ys // cell_size
+        # Location indices sorted by bucket, and each bucket's slice of them
+        self._order = np.lexsort((np.arange(len(xs)), by, bx)).astype(np.int64)
+        self._buckets: dict[tuple[int, int], tuple[int, int]] = {}
+        # Range of occupied bucket columns and rows; queries never look outside it
+        self._bx_range = (int(bx.min()), int(bx.max())) if len(xs) else (0, -1)
+        self._by_range = (int(by.min()), int(by.max())) if len(xs) else (0, -1)
+        if len(xs):
+            keys = np.stack([bx[self._order], by[self._order]], axis=1)
+            starts = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+            bounds = np.concatenate([[0], starts, [len(xs)]])
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                key = keys[start]
+                self._buckets[(int(key[0]), int(key[1]))] = (int(start), int(end))
+
+    def within(self, x: int, y: int, radius: int) -> np.ndarray:
+        """Get indices of locations within Manhattan ``radius`` of (x, y), ascending"""
+        if radius < 0:
+            return np.zeros(0, dtype=np.int64)
+        size = self.cell_size
+        slices: list[np.ndarray] = []
+        bx_min, bx_max = self._bx_range
+        by_min, by_max = self._by_range
+        for bx in range(max((x - radius) // size, bx_min), min((x + radius) // size, bx_max) + 1):
+            # Horizontal gap from the point to this bucket column
+            dx = max(bx * size - x, 0, x - (bx * size + size - 1))
+            for by in range(max((y - radius) // size, by_min), min((y + radius) // size, by_max) + 1):
+                dy = max(by * size - y, 0, y - (by * size + size - 1))
+                if dx + dy > radius:
+                    continue  # Bucket lies entirely outside the diamond
+                bucket = self._buckets.get((bx, by))
+                if bucket is not None:
+                    slices.append(self._order[bucket[0]:bucket[1]])
+        if not slices:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.concatenate(slices)
+        distance = np.abs(self._xs[candidates] - x) + np.abs(self._ys[candidates] - y)
+        return np.sort(candidates[distance <= radius])
@@ -0,0 +1,946 @@
+import os
+import re
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_right, insort
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
+
+from tracing import TracedCursor, traced
+from models import ActionRow, EventRow, GameCommit, GameEventRow, GameStateRow, Layout, LocationRow, RouteRow, ScoreRow, SnapshotRow
+
+
+
+def load_env_file() -> None:
+    """Load a .env file into the environment, importing python-dotenv only if there is one
+
+    Looks where load_dotenv() would: this file's directory, then its parents.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+
+            load_dotenv(path)
+            return
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return
+        directory = parent
+
+
+load_env_file()
+
+T = TypeVar("T")
+
+SETUP_SQL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database_setup.sql")
+
+# Queries shared by the SQL backends, written with MySQL-style %s placeholders
+LOCATIONS_SQL = "SELECT * FROM locations ORDER BY x_coord, y_coord"
+EVENTS_SQL = "SELECT * FROM events ORDER BY id"
+ROUTES_SQL = """SELECT from_location_id, to_location_id, road_condition, terrain_multiplier
+                FROM routes"""
+GAME_STATE_SQL = "SELECT * FROM game WHERE id = %s"
+INSERT_GAME_SQL = """INSERT INTO game (player_name, money, energy, current_place, layout_seed, status)
+                     VALUES (%s, %s, %s, %s, %s, %s)"""
+AUTO_INCREMENT_STEP_SQL = "SELECT @@auto_increment_increment"
+INSERT_EVENT_LOCATION_SQL = "INSERT INTO event_locations (game_id, event_id, place_id) VALUES (%s, %s, %s)"
+UNRESOLVED_EVENTS_SQL = """SELECT el.id AS event_location_id, \
+                                  el.place_id, \
+                                  e.name, \
+                                  e.money_change, \
+                                  e.energy_change, \
+                                  e.is_key,
+                                  e.is_bully, \
+                                  e.description
+                           FROM event_locations el
+                                    JOIN events e ON el.event_id = e.id
+                           WHERE el.game_id = %s \
+                             AND el.resolved = FALSE"""
+INSERT_ACTION_SQL = """INSERT INTO game_actions (game_id, turn, kind, value, money_change, energy_change, key_found)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s)"""
+INSERT_SNAPSHOT_SQL = """INSERT INTO game_snapshots (game_id, turn, money, energy, current_place, key_found)
+                         VALUES (%s, %s, %s, %s, %s, %s)"""
+LAST_TURN_SQL = "SELECT COALESCE(MAX(turn), 0) AS turn FROM game_actions WHERE game_id = %s"
+SNAPSHOT_SQL = """SELECT game_id, turn, money, energy, current_place, key_found
+                  FROM game_snapshots
+                  WHERE game_id = %s AND turn <= %s
+                  ORDER BY turn DESC
+                  LIMIT 1"""
+ACTIONS_SQL = """SELECT game_id, turn, kind, value, money_change, energy_change, key_found
+                 FROM game_actions
+                 WHERE game_id = %s AND turn > %s AND turn <= %s
+                 ORDER BY turn"""
+# Status of games created ahead of time and waiting in a pool for a player
+IDLE = "idle"
+CLAIM_GAME_SQL = f"""UPDATE game SET player_name = %s, status = 'playing', created_at = CURRENT_TIMESTAMP
+                    WHERE id = %s AND status = '{IDLE}'"""
+# Range scan on idx_game_finished
+FINISHED_GAMES_SQL = """SELECT * FROM game
+                        WHERE status IN ('won', 'lost', 'quit') AND finished_at < %s"""
+# Games still 'playing' that started before a time and logged no action since (a crashed or closed client)
+ABANDONED_GAMES_SQL = """SELECT * FROM game g
+                         WHERE g.status = 'playing' AND g.created_at < %s
+                           AND NOT EXISTS (SELECT 1 FROM game_actions a WHERE a.game_id = g.id AND a.created_at >= %s)"""
+# Idle games created before a time: a pool whose server stopped uncleanly never deleted them.
+# A batch per statement; a game claimed meanwhile is no longer idle and stays
+DELETE_IDLE_GAMES_SQL = f"""DELETE FROM game WHERE status = '{IDLE}' AND created_at < %s LIMIT %s"""
+# SQLite has no DELETE ... LIMIT by default
+SQLITE_DELETE_IDLE_GAMES_SQL = f"""DELETE FROM game
+                                  WHERE id IN (SELECT id FROM game WHERE status = '{IDLE}' AND created_at < %s LIMIT %s)"""
+# One row per placed event, with the outcome of its game, for analytics export
+GAME_EVENTS_EXPORT_SQL = """SELECT g.id AS game_id, g.status, g.money, g.energy, g.key_found,
+                                  el.event_id, el.place_id, el.resolved,
+                                  e.name AS event_name, e.money_change, e.energy_change, e.is_key, e.is_bully,
+                                  l.name AS place_name, l.x_coord, l.y_coord
+                           FROM game g
+                                    JOIN event_locations el ON el.game_id = g.id
+                                    JOIN events e ON e.id = el.event_id
+                                    JOIN locations l ON l.id = el.place_id"""
+
+INSERT_SCORE_SQL = """INSERT INTO scores (game_id, player_name, money, energy, turns, finished_at)
+                      VALUES (%s, %s, %s, %s, %s, %s)"""
+# Leaderboard -> (sort columns, ending with the game id to break ties; best first when descending)
+LEADERBOARDS: dict[str, tuple[tuple[str, ...], bool]] = {
+    "money": (("money", "energy", "game_id"), True),
+    "energy": (("energy", "money", "game_id"), True),
+    "turns": (("turns", "game_id"), False),
+}
+
+# GameCommit.fields name -> game table column
+GAME_FIELD_COLUMNS = {"money": "money", "energy": "energy", "location": "current_place", "key_found": "key_found"}
+
+# Child tables archived with each game -> their ordering column
+GAME_CHILD_TABLES = {"event_locations": "id", "game_actions": "turn", "game_snapshots": "turn"}
+
+# Columns written when bulk loading the static world tables
+WORLD_COLUMNS: dict[str, tuple[str, ...]] = {
+    "locations": ("id", "name", "x_coord", "y_coord", "is_home"),
+    "events": ("id", "name", "money_change", "energy_change", "is_key", "is_bully", "description"),
+    "routes": ("from_location_id", "to_location_id", "road_condition", "terrain_multiplier"),
+}
+# Tables emptied before a new world is loaded, children first
+WORLD_RESET_ORDER = ("scores", "game_snapshots", "game_actions", "event_locations", "game", "routes", "events", "locations")
+
+
+def chunked(rows: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Split an iterable into lists of at most ``size`` items"""
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def insert_rows_sql(table: str, count: int) -> str:
+    """Build a multi-row INSERT for ``count`` rows of a world table"""
+    columns = WORLD_COLUMNS[table]
+    row = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([row] * count)}"
+
+
+def commit_game_sql(commit: GameCommit, finished_at: Any = None) -> tuple[str, list[Any]]:
+    """Build the UPDATE applying a session commit to the game row, if it is still at the session's turn
+
+    It runs first in the commit's transaction: it locks the game row, so a
+    second client committing the same game waits, then finds the turn moved
+    on and updates nothing.
+    """
+    updates = ["turn = %s"]
+    values: list[Any] = [commit.turn]
+    for name, value in commit.fields.items():
+        updates.append(f"{GAME_FIELD_COLUMNS[name]} = %s")
+        values.append(value)
+    if commit.status:
+        updates += ["status = %s", "finished_at = %s"]
+        values += [commit.status, finished_at or commit.finished_at]
+    values += [commit.game_id, commit.base_turn]
+    return f"UPDATE game SET {', '.join(updates)} WHERE id = %s AND turn = %s", values
+
+
+def leaderboard_sql(board: str, after: bool) -> str:
+    """Build the SELECT for one page of a leaderboard, starting after a given score if ``after``
+
+    Pages are sought by a row-value comparison on the board's sort columns
+    (keyset pagination), which is a range scan of the board's index, so a
+    page costs its own size however deep into the board it is.
+    """
+    columns, descending = LEADERBOARDS[board]
+    where = ""
+    if after:
+        where = f"WHERE ({', '.join(columns)}) {'<' if descending else '>'} ({in_list(len(columns))})"
+    order = ", ".join(f"{column} DESC" if descending else column for column in columns)
+    return f"SELECT game_id, player_name, money, energy, turns, finished_at FROM scores {where} ORDER BY {order} LIMIT %s"
+
+
+def leaderboard_params(board: str, limit: int, after: Optional[ScoreRow]) -> tuple[Any, ...]:
+    columns, _ = LEADERBOARDS[board]
+    return (*(after[column] for column in columns), limit) if after else (limit,)  # type: ignore
+
+
+def score_values(score: ScoreRow) -> tuple[Any, ...]:
+    return (score["game_id"], score["player_name"], score["money"], score["energy"], score["turns"], score["finished_at"])
+
+
+def action_values(action: ActionRow) -> tuple[Any, ...]:
+    return (action["game_id"], action["turn"], action["kind"], action["value"], action["money_change"], action["energy_change"], action["key_found"])
+
+
+def snapshot_values(snapshot: SnapshotRow) -> tuple[Any, ...]:
+    return (snapshot["game_id"], snapshot["turn"], snapshot["money"], snapshot["energy"], snapshot["current_place"], snapshot["key_found"])
+
+
+def in_list(count: int) -> str:
+    return ", ".join(["%s"] * count)
+
+
+def game_children_sql(table: str, count: int) -> str:
+    """Build the SELECT for a child table's rows of ``count`` games"""
+    return f"SELECT * FROM {table} WHERE game_id IN ({in_list(count)}) ORDER BY game_id, {GAME_CHILD_TABLES[table]}"
+
+
+def delete_games_sql(count: int) -> str:
+    """Build the DELETE for ``count`` games; their child rows go with them (ON DELETE CASCADE)"""
+    return f"DELETE FROM game WHERE id IN ({in_list(count)})"
+
+
+def resolve_events_sql(event_location_ids: list[int]) -> str:
+    """Build the UPDATE statement resolving several events at once"""
+    placeholders = ", ".join(["%s"] * len(event_location_ids))
+    return f"UPDATE event_locations SET resolved = TRUE WHERE id IN ({placeholders})"
+
+
+class GameConflictError(Exception):
+    """Another session saved the game since this one loaded it; nothing was written"""
+
+
+class Storage(ABC):
+    """Persistence interface used by the game"""
+
+    @abstractmethod
+    def fetch_locations(self) -> list[LocationRow]:
+        """Get all locations ordered by x_coord, y_coord"""
+
+    @abstractmethod
+    def fetch_events(self) -> list[EventRow]:
+        """Get all event types"""
+
+    @abstractmethod
+    def fetch_routes(self) -> list[RouteRow]:
+        """Get all routes"""
+
+    @abstractmethod
+    def load_world(self, locations: Iterable[LocationRow], events: Iterable[EventRow], routes: Iterable[RouteRow], batch_size: int = 5000) -> None:
+        """Replace the static world tables in bulk; deletes every game"""
+
+    @abstractmethod
+    def create_games(self, player_name: str, start_money: int, start_energy: int, home_location: int, layouts: list[Layout], seeds: Optional[list[int]] = None, status: str = "playing") -> list[int]:
+        """Create one game per layout in a single transaction and return their ids
+
+        ``seeds`` are the layout seeds stored with the games, if known. Games
+        created with status ``IDLE`` wait for ``claim_game()``.
+        """
+
+    @abstractmethod
+    def claim_game(self, game_id: int, player_name: str) -> bool:
+        """Hand an idle game to a player; False if it is no longer idle"""
+
+    @abstractmethod
+    def get_game_state(self, game_id: int) -> Optional[GameStateRow]:
+        """Get current game state"""
+
+    @abstractmethod
+    def fetch_unresolved_events(self, game_id: int) -> list[GameEventRow]:
+        """Get every unresolved event of a game with its place_id"""
+
+    @abstractmethod
+    def commit_game(self, commit: GameCommit) -> None:
+        """Apply a session's logged actions, state, resolved events, snapshot and final status atomically
+
+        Raises GameConflictError, writing nothing, if the game's turn is no
+        longer ``commit.base_turn``.
+        """
+
+    @abstractmethod
+    def fetch_scores(self, board: str, limit: int, after: Optional[ScoreRow] = None) -> list[ScoreRow]:
+        """Get up to ``limit`` leaderboard entries, best first, following ``after`` (the last row of the previous page)"""
+
+    @abstractmethod
+    def fetch_last_turn(self, game_id: int) -> int:
+        """Get the turn of a game's latest logged action, 0 if none"""
+
+    @abstractmethod
+    def fetch_snapshot(self, game_id: int, turn: int) -> Optional[SnapshotRow]:
+        """Get a game's latest snapshot taken at or before a turn"""
+
+    @abstractmethod
+    def fetch_actions(self, game_id: int, after_turn: int, up_to_turn: int) -> list[ActionRow]:
+        """Get a game's logged actions with after_turn < turn <= up_to_turn, in order"""
+
+    @abstractmethod
+    def iter_finished_games(self, finished_before: datetime, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        """Stream game rows finished before a time, ``chunk_size`` rows at a time"""
+
+    @abstractmethod
+    def iter_abandoned_games(self, active_before: datetime, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        """Stream rows of games still playing but untouched since a time, ``chunk_size`` rows at a time"""
+
+    @abstractmethod
+    def delete_idle_games(self, created_before: datetime, batch_size: int) -> int:
+        """Delete games still idle since before a time, ``batch_size`` per transaction; return how many"""
+
+    @abstractmethod
+    def fetch_game_children(self, game_ids: list[int]) -> dict[str, list[dict[str, Any]]]:
+        """Get the event_locations, game_actions and game_snapshots rows of some games"""
+
+    @abstractmethod
+    def delete_games(self, game_ids: list[int]) -> None:
+        """Delete games and their child rows in one transaction"""
+
+    @abstractmethod
+    def iter_game_events(self, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        """Stream every placed event joined with its game and location, ``chunk_size`` rows at a time"""
+
+
+class MySQLStorage(Storage):
+    """The bike_in_town MySQL schema, accessed through the connection pool"""
+
+    def __init__(self) -> None:
+        import db  # Only needed when the MySQL backend is selected
+
+        self._db = db
+        # Gap between consecutive auto-increment ids, read on first use
+        self._id_step: Optional[int] = None
+
+    def _fetch_all(self, sql: str, params: tuple[Any, ...] = ()) -> list[Any]:
+        with self._db.connection() as conn, traced(conn.cursor(dictionary=True)) as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _fetch_one(self, sql: str, params: tuple[Any, ...] = ()) -> Optional[Any]:
+        with self._db.connection() as conn, traced(conn.cursor(dictionary=True)) as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()
+
+    def fetch_locations(self) -> list[LocationRow]:
+        return self._fetch_all(LOCATIONS_SQL)
+
+    def fetch_events(self) -> list[EventRow]:
+        return self._fetch_all(EVENTS_SQL)
+
+    def fetch_routes(self) -> list[RouteRow]:
+        return self._fetch_all(ROUTES_SQL)
+
+    def load_world(self, locations: Iterable[LocationRow], events: Iterable[EventRow], routes: Iterable[RouteRow], batch_size: int = 5000) -> None:
+        with self._db.transaction() as conn, traced(conn.cursor()) as cursor:
+            for table in WORLD_RESET_ORDER:
+                cursor.execute(f"DELETE FROM {table}")
+            for table, rows in (("locations", locations), ("events", events), ("routes", routes)):
+                columns = WORLD_COLUMNS[table]
+                for chunk in chunked(rows, batch_size):
+                    values = [row[column] for row in chunk for column in columns]  # type: ignore
+                    cursor.execute(insert_rows_sql(table, len(chunk)), values)
+
+    def create_games(self, player_name: str, start_money: int, start_energy: int, home_location: int, layouts: list[Layout], seeds: Optional[list[int]] = None, status: str = "playing") -> list[int]:
+        count = len(layouts)
+        if count == 0:
+            return []
+        with self._db.transaction() as conn, traced(conn.cursor()) as cursor:
+            # A single multi-row INSERT is a "simple insert" for InnoDB, so its
+            # auto-increment ids are allocated consecutively from lastrowid, one
+            # auto_increment_increment apart (more than 1 on multi-primary setups)
+            if self._id_step is None:
+                cursor.execute(AUTO_INCREMENT_STEP_SQL)
+                self._id_step = int(cursor.fetchone()[0])
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * count)
+            sql = f"INSERT INTO game (player_name, money, energy, current_place, layout_seed, status) VALUES {placeholders}"
+            values: list[Any] = []
+            for seed in seeds or [None] * count:
+                values.extend((player_name, start_money, start_energy, home_location, seed, status))
+            cursor.execute(sql, values)
+            first_id = cursor.lastrowid
+            if not first_id or cursor.rowcount != count:
+                raise ValueError("Failed to create game: no game_id returned")
+            game_ids = list(range(first_id, first_id + count * self._id_step, self._id_step))
+
+            cursor.executemany(
+                INSERT_EVENT_LOCATION_SQL,
+                [
+                    (game_id, event_id, place_id)
+                    for game_id, layout in zip(game_ids, layouts)
+                    for event_id, place_id in layout
+                ],
+            )
+            # Turn 0 snapshot: the starting point for replaying the action log
+            cursor.executemany(
+                INSERT_SNAPSHOT_SQL,
+                [(game_id, 0, start_money, start_energy, home_location, False) for game_id in game_ids],
+            )
+        return game_ids
+
+    def claim_game(self, game_id: int, player_name: str) -> bool:
+        with self._db.connection() as conn, traced(conn.cursor()) as cursor:
+            cursor.execute(CLAIM_GAME_SQL, (player_name, game_id))
+            return cursor.rowcount == 1
+
+    def get_game_state(self, game_id: int) -> Optional[GameStateRow]:
+        return self._fetch_one(GAME_STATE_SQL, (game_id,))
+
+    def fetch_unresolved_events(self, game_id: int) -> list[GameEventRow]:
+        return self._fetch_all(UNRESOLVED_EVENTS_SQL, (game_id,))
+
+    def commit_game(self, commit: GameCommit) -> None:
+        with self._db.transaction() as conn, traced(conn.cursor()) as cursor:
+            cursor.execute(*commit_game_sql(commit))
+            # Matched rows only count changed ones here, but a commit always changes the turn or the status
+            if cursor.rowcount != 1:
+                raise GameConflictError(commit.game_id)
+            if commit.actions:
+                cursor.executemany(INSERT_ACTION_SQL, [action_values(action) for action in commit.actions])
+            if commit.resolved:
+                cursor.execute(resolve_events_sql(commit.resolved), commit.resolved)
+            if commit.snapshot:
+                cursor.execute(INSERT_SNAPSHOT_SQL, snapshot_values(commit.snapshot))
+            if commit.score:
+                cursor.execute(INSERT_SCORE_SQL, score_values(commit.score))
+
+    def fetch_scores(self, board: str, limit: int, after: Optional[ScoreRow] = None) -> list[ScoreRow]:
+        return self._fetch_all(leaderboard_sql(board, after is not None), leaderboard_params(board, limit, after))
+
+    def fetch_last_turn(self, game_id: int) -> int:
+        row = self._fetch_one(LAST_TURN_SQL, (game_id,))
+        return int(row["turn"]) if row else 0
+
+    def fetch_snapshot(self, game_id: int, turn: int) -> Optional[SnapshotRow]:
+        return self._fetch_one(SNAPSHOT_SQL, (game_id, turn))
+
+    def fetch_actions(self, game_id: int, after_turn: int, up_to_turn: int) -> list[ActionRow]:
+        return self._fetch_all(ACTIONS_SQL, (game_id, after_turn, up_to_turn))
+
+    def iter_finished_games(self, finished_before: datetime, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        # Unbuffered cursor: rows stream from the server as they are fetched. It
+        # holds its own pooled connection, so the caller can delete on another one
+        with self._db.connection() as conn, traced(conn.cursor(dictionary=True, buffered=False)) as cursor:
+            cursor.execute(FINISHED_GAMES_SQL, (finished_before,))
+            while rows := cursor.fetchmany(chunk_size):
+                yield rows
+
+    def iter_abandoned_games(self, active_before: datetime, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        with self._db.connection() as conn, traced(conn.cursor(dictionary=True, buffered=False)) as cursor:
+            cursor.execute(ABANDONED_GAMES_SQL, (active_before, active_before))
+            while rows := cursor.fetchmany(chunk_size):
+                yield rows
+
+    def delete_idle_games(self, created_before: datetime, batch_size: int) -> int:
+        deleted = 0
+        while True:
+            with self._db.transaction() as conn, traced(conn.cursor()) as cursor:
+                cursor.execute(DELETE_IDLE_GAMES_SQL, (created_before, batch_size))
+                count = cursor.rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+    def fetch_game_children(self, game_ids: list[int]) -> dict[str, list[dict[str, Any]]]:
+        return {table: self._fetch_all(game_children_sql(table, len(game_ids)), tuple(game_ids)) for table in GAME_CHILD_TABLES}
+
+    def delete_games(self, game_ids: list[int]) -> None:
+        if game_ids:
+            with self._db.transaction() as conn, traced(conn.cursor()) as cursor:
+                cursor.execute(delete_games_sql(len(game_ids)), game_ids)
+
+    def iter_game_events(self, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        with self._db.connection() as conn, traced(conn.cursor(dictionary=True, buffered=False)) as cursor:
+            cursor.execute(GAME_EVENTS_EXPORT_SQL)
+            while rows := cursor.fetchmany(chunk_size):
+                yield rows
+
+
+def sqlite_schema_script(mysql_script: str) -> str:
+    """Translate database_setup.sql from MySQL to SQLite syntax"""
+    script = re.sub(r"--[^\n]*", "", mysql_script)
+    statements: list[str] = []
+    for statement in script.split(";"):
+        statement = statement.strip()
+        if not statement or re.match(r"(CREATE DATABASE|USE|SET)\b", statement, re.IGNORECASE):
+            continue
+        statement = re.sub(r"\b(?:BIG)?INT AUTO_INCREMENT PRIMARY KEY\b", "INTEGER PRIMARY KEY AUTOINCREMENT", statement)
+        statement = re.sub(r"\bENUM\([^)]*\)", "TEXT", statement)
+        statement = re.sub(r"\bDECIMAL\(\d+,\s*\d+\)", "REAL", statement)
+        statement = re.sub(r"\bUNIQUE KEY \w+ \(", "UNIQUE (", statement)
+        statements.append(statement)
+    return ";\n".join(statements) + ";\n"
+
+
+class SQLiteStorage(Storage):
+    """SQLite copy of the schema, bootstrapped from database_setup.sql
+
+    ``path`` defaults to a private in-memory database; pass a file path to
+    keep games between runs. An existing file is reused as-is.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        bootstrap = path == ":memory:" or not os.path.exists(path)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._lock = threading.RLock()
+        if bootstrap:
+            with open(SETUP_SQL_PATH, encoding="utf-8") as setup_file:
+                self._conn.executescript(sqlite_schema_script(setup_file.read()))
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The underlying sqlite3 connection"""
+        return self._conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _execute(self, sql: str, params: Any = ()) -> TracedCursor:
+        with self._lock:
+            cursor = traced(self._conn.cursor())
+            cursor.execute(sql.replace("%s", "?"), params)
+            return cursor
+
+    def _fetch_all(self, sql: str, params: tuple[Any, ...] = ()) -> list[Any]:
+        with self._lock:
+            return [dict(row) for row in self._execute(sql, params).fetchall()]
+
+    def _fetch_one(self, sql: str, params: tuple[Any, ...] = ()) -> Optional[Any]:
+        with self._lock:
+            row = self._execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    def fetch_locations(self) -> list[LocationRow]:
+        return self._fetch_all(LOCATIONS_SQL)
+
+    def fetch_events(self) -> list[EventRow]:
+        return self._fetch_all(EVENTS_SQL)
+
+    def fetch_routes(self) -> list[RouteRow]:
+        return self._fetch_all(ROUTES_SQL)
+
+    def load_world(self, locations: Iterable[LocationRow], events: Iterable[EventRow], routes: Iterable[RouteRow], batch_size: int = 5000) -> None:
+        with self._transaction() as conn:
+            cursor = traced(conn.cursor())
+            for table in WORLD_RESET_ORDER:
+                cursor.execute(f"DELETE FROM {table}")
+            for table, rows in (("locations", locations), ("events", events), ("routes", routes)):
+                columns = WORLD_COLUMNS[table]
+                insert = insert_rows_sql(table, 1).replace("%s", "?")
+                for chunk in chunked(rows, batch_size):
+                    cursor.executemany(insert, [tuple(row[column] for column in columns) for row in chunk])  # type: ignore
+
+    def create_games(self, player_name: str, start_money: int, start_energy: int, home_location: int, layouts: list[Layout], seeds: Optional[list[int]] = None, status: str = "playing") -> list[int]:
+        game_ids: list[int] = []
+        insert_game = INSERT_GAME_SQL.replace("%s", "?")
+        with self._transaction() as conn:
+            cursor = traced(conn.cursor())
+            for seed in seeds or [None] * len(layouts):
+                cursor.execute(insert_game, (player_name, start_money, start_energy, home_location, seed, status))
+                if cursor.lastrowid is None:
+                    raise ValueError("Failed to create game: no game_id returned")
+                game_ids.append(cursor.lastrowid)
+            cursor.executemany(
+                INSERT_EVENT_LOCATION_SQL.replace("%s", "?"),
+                [
+                    (game_id, event_id, place_id)
+                    for game_id, layout in zip(game_ids, layouts)
+                    for event_id, place_id in layout
+                ],
+            )
+            cursor.executemany(
+                INSERT_SNAPSHOT_SQL.replace("%s", "?"),
+                [(game_id, 0, start_money, start_energy, home_location, False) for game_id in game_ids],
+            )
+        return game_ids
+
+    def claim_game(self, game_id: int, player_name: str) -> bool:
+        return self._execute(CLAIM_GAME_SQL, (player_name, game_id)).rowcount == 1
+
+    def get_game_state(self, game_id: int) -> Optional[GameStateRow]:
+        return self._fetch_one(GAME_STATE_SQL, (game_id,))
+
+    def fetch_unresolved_events(self, game_id: int) -> list[GameEventRow]:
+        return self._fetch_all(UNRESOLVED_EVENTS_SQL, (game_id,))
+
+    def commit_game(self, commit: GameCommit) -> None:
+        finished_at = commit.finished_at.isoformat(sep=" ", timespec="seconds") if commit.finished_at else None
+        sql, values = commit_game_sql(commit, finished_at)
+        with self._transaction() as conn:
+            cursor = traced(conn.cursor())
+            cursor.execute(sql.replace("%s", "?"), values)
+            if cursor.rowcount != 1:
+                raise GameConflictError(commit.game_id)
+            if commit.actions:
+                cursor.executemany(INSERT_ACTION_SQL.replace("%s", "?"), [action_values(action) for action in commit.actions])
+            if commit.resolved:
+                cursor.execute(resolve_events_sql(commit.resolved).replace("%s", "?"), commit.resolved)
+            if commit.snapshot:
+                cursor.execute(INSERT_SNAPSHOT_SQL.replace("%s", "?"), snapshot_values(commit.snapshot))
+            if commit.score:
+                score = {**commit.score, "finished_at": finished_at}
+                cursor.execute(INSERT_SCORE_SQL.replace("%s", "?"), score_values(score))  # type: ignore
+
+    def fetch_scores(self, board: str, limit: int, after: Optional[ScoreRow] = None) -> list[ScoreRow]:
+        return self._fetch_all(leaderboard_sql(board, after is not None), leaderboard_params(board, limit, after))
+
+    def fetch_last_turn(self, game_id: int) -> int:
+        row = self._fetch_one(LAST_TURN_SQL, (game_id,))
+        return int(row["turn"]) if row else 0
+
+    def fetch_snapshot(self, game_id: int, turn: int) -> Optional[SnapshotRow]:
+        return self._fetch_one(SNAPSHOT_SQL, (game_id, turn))
+
+    def fetch_actions(self, game_id: int, after_turn: int, up_to_turn: int) -> list[ActionRow]:
+        return self._fetch_all(ACTIONS_SQL, (game_id, after_turn, up_to_turn))
+
+    def iter_finished_games(self, finished_before: datetime, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        # Keyset pagination, so rows deleted between chunks cannot disturb the scan
+        cutoff = finished_before.isoformat(sep=" ", timespec="seconds")
+        last_id = 0
+        while rows := self._fetch_all(FINISHED_GAMES_SQL + " AND id > %s ORDER BY id LIMIT %s", (cutoff, last_id, chunk_size)):
+            yield rows
+            last_id = rows[-1]["id"]
+
+    def iter_abandoned_games(self, active_before: datetime, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        cutoff = active_before.isoformat(sep=" ", timespec="seconds")
+        last_id = 0
+        sql = ABANDONED_GAMES_SQL + " AND g.id > %s ORDER BY g.id LIMIT %s"
+        while rows := self._fetch_all(sql, (cutoff, cutoff, last_id, chunk_size)):
+            yield rows
+            last_id = rows[-1]["id"]
+
+    def delete_idle_games(self, created_before: datetime, batch_size: int) -> int:
+        cutoff = created_before.isoformat(sep=" ", timespec="seconds")
+        deleted = 0
+        while True:
+            with self._transaction() as conn:
+                count = traced(conn.cursor()).execute(SQLITE_DELETE_IDLE_GAMES_SQL.replace("%s", "?"), (cutoff, batch_size)).rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+    def fetch_game_children(self, game_ids: list[int]) -> dict[str, list[dict[str, Any]]]:
+        return {table: self._fetch_all(game_children_sql(table, len(game_ids)), tuple(game_ids)) for table in GAME_CHILD_TABLES}
+
+    def delete_games(self, game_ids: list[int]) -> None:
+        if game_ids:
+            with self._transaction() as conn:
+                traced(conn.cursor()).execute(delete_games_sql(len(game_ids)).replace("%s", "?"), game_ids)
+
+    def iter_game_events(self, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        with self._lock:
+            cursor = self._execute(GAME_EVENTS_EXPORT_SQL)
+            while rows := cursor.fetchmany(chunk_size):
+                yield [dict(row) for row in rows]
+
+
+class MemoryStorage(Storage):
+    """Pure in-memory storage; static tables are seeded from database_setup.sql"""
+
+    def __init__(self) -> None:
+        seed = SQLiteStorage()
+        self._locations = seed.fetch_locations()
+        self._events = seed.fetch_events()
+        self._routes = seed.fetch_routes()
+        seed.connection.close()
+
+        self._events_by_id = {event["id"]: event for event in self._events}
+        self._games: dict[int, GameStateRow] = {}
+        # event_location id -> [game_id, event_id, place_id, resolved]
+        self._event_locations: dict[int, list[Any]] = {}
+        self._game_event_locations: dict[int, list[int]] = {}
+        # game_id -> action log and snapshots, both in turn order
+        self._actions: dict[int, list[ActionRow]] = {}
+        self._snapshots: dict[int, list[SnapshotRow]] = {}
+        # game_id -> (status, finished_at) of finished games
+        self._finished: dict[int, tuple[str, datetime]] = {}
+        self._idle: set[int] = set()
+        # game_id -> when the game was started, claimed or last committed
+        self._active: dict[int, datetime] = {}
+        # Leaderboard -> scores kept sorted best first, so a page is a bisect and a slice
+        self._scores: dict[str, list[ScoreRow]] = {board: [] for board in LEADERBOARDS}
+        self._lock = threading.Lock()
+        self._next_game_id = 1
+        self._next_event_location_id = 1
+
+    def fetch_locations(self) -> list[LocationRow]:
+        return [dict(row) for row in self._locations]  # type: ignore
+
+    def fetch_events(self) -> list[EventRow]:
+        return [dict(row) for row in self._events]  # type: ignore
+
+    def fetch_routes(self) -> list[RouteRow]:
+        return [dict(row) for row in self._routes]  # type: ignore
+
+    def load_world(self, locations: Iterable[LocationRow], events: Iterable[EventRow], routes: Iterable[RouteRow], batch_size: int = 5000) -> None:
+        with self._lock:
+            self._locations = sorted(locations, key=lambda loc: (loc["x_coord"], loc["y_coord"]))
+            self._events = list(events)
+            self._routes = list(routes)
+            self._events_by_id = {event["id"]: event for event in self._events}
+            self._games.clear()
+            self._event_locations.clear()
+            self._game_event_locations.clear()
+            self._actions.clear()
+            self._snapshots.clear()
+            self._finished.clear()
+            self._idle.clear()
+            self._active.clear()
+            for scores in self._scores.values():
+                scores.clear()
+
+    def create_games(self, player_name: str, start_money: int, start_energy: int, home_location: int, layouts: list[Layout], seeds: Optional[list[int]] = None, status: str = "playing") -> list[int]:
+        game_ids: list[int] = []
+        created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        with self._lock:
+            for layout, seed in zip(layouts, seeds or [None] * len(layouts)):
+                game_id = self._next_game_id
+                self._next_game_id += 1
+                self._games[game_id] = GameStateRow(
+                    id=game_id,
+                    player_name=player_name,
+                    money=start_money,
+                    energy=start_energy,
+                    current_place=home_location,
+                    key_found=False,
+                    layout_seed=seed,
+                    turn=0,
+                )
+                if status == IDLE:
+                    self._idle.add(game_id)
+                self._active[game_id] = created_at
+                event_location_ids: list[int] = []
+                for event_id, place_id in layout:
+                    self._event_locations[self._next_event_location_id] = [game_id, event_id, place_id, False]
+                    event_location_ids.append(self._next_event_location_id)
+                    self._next_event_location_id += 1
+                self._game_event_locations[game_id] = event_location_ids
+                self._snapshots[game_id] = [
+                    SnapshotRow(game_id=game_id, turn=0, money=start_money, energy=start_energy, current_place=home_location, key_found=False)
+                ]
+                game_ids.append(game_id)
+        return game_ids
+
+    def claim_game(self, game_id: int, player_name: str) -> bool:
+        with self._lock:
+            if game_id not in self._idle:
+                return False
+            self._idle.discard(game_id)
+            self._games[game_id]["player_name"] = player_name
+            self._active[game_id] = datetime.now(timezone.utc).replace(tzinfo=None)
+            return True
+
+    def get_game_state(self, game_id: int) -> Optional[GameStateRow]:
+        game = self._games.get(game_id)
+        return GameStateRow(**game) if game else None
+
+    def _event_row(self, event_location_id: int) -> GameEventRow:
+        _, event_id, place_id, _ = self._event_locations[event_location_id]
+        event = self._events_by_id[event_id]
+        return GameEventRow(
+            event_location_id=event_location_id,
+            place_id=place_id,
+            name=event["name"],
+            money_change=event["money_change"],
+            energy_change=event["energy_change"],
+            is_key=event["is_key"],
+            is_bully=event["is_bully"],
+            description=event["description"],
+        )
+
+    def fetch_unresolved_events(self, game_id: int) -> list[GameEventRow]:
+        return [
+            self._event_row(event_location_id)
+            for event_location_id in self._game_event_locations.get(game_id, [])
+            if not self._event_locations[event_location_id][3]
+        ]
+
+    def commit_game(self, commit: GameCommit) -> None:
+        with self._lock:
+            game = self._games.get(commit.game_id)
+            if not game or game["turn"] != commit.base_turn:
+                raise GameConflictError(commit.game_id)
+            game["turn"] = commit.turn
+            self._active[commit.game_id] = datetime.now(timezone.utc).replace(tzinfo=None)
+            for name, value in commit.fields.items():
+                game[GAME_FIELD_COLUMNS[name]] = value  # type: ignore
+            self._actions.setdefault(commit.game_id, []).extend(ActionRow(**action) for action in commit.actions)
+            for event_location_id in commit.resolved:
+                row = self._event_locations.get(event_location_id)
+                if row:
+                    row[3] = True
+            if commit.snapshot:
+                self._snapshots.setdefault(commit.game_id, []).append(SnapshotRow(**commit.snapshot))
+            if commit.status and commit.finished_at:
+                self._finished[commit.game_id] = (commit.status, commit.finished_at)
+            if commit.score:
+                for board, scores in self._scores.items():
+                    insort(scores, ScoreRow(**commit.score), key=self._score_key(board))
+
+    @staticmethod
+    def _score_key(board: str) -> Callable[[ScoreRow], tuple[int, ...]]:
+        """Sort key that puts a board's best scores first"""
+        columns, descending = LEADERBOARDS[board]
+        sign = -1 if descending else 1
+        return lambda score: tuple(sign * score[column] for column in columns)  # type: ignore
+
+    def fetch_scores(self, board: str, limit: int, after: Optional[ScoreRow] = None) -> list[ScoreRow]:
+        key = self._score_key(board)
+        with self._lock:
+            scores = self._scores[board]
+            start = bisect_right(scores, key(after), key=key) if after else 0
+            return [ScoreRow(**score) for score in scores[start:start + limit]]
+
+    def fetch_last_turn(self, game_id: int) -> int:
+        actions = self._actions.get(game_id)
+        return actions[-1]["turn"] if actions else 0
+
+    def fetch_snapshot(self, game_id: int, turn: int) -> Optional[SnapshotRow]:
+        earlier = [snapshot for snapshot in self._snapshots.get(game_id, []) if snapshot["turn"] <= turn]
+        return SnapshotRow(**max(earlier, key=lambda snapshot: snapshot["turn"])) if earlier else None
+
+    def fetch_actions(self, game_id: int, after_turn: int, up_to_turn: int) -> list[ActionRow]:
+        return [
+            ActionRow(**action)
+            for action in self._actions.get(game_id, [])
+            if after_turn < action["turn"] <= up_to_turn
+        ]
+
+    def iter_finished_games(self, finished_before: datetime, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        with self._lock:
+            finished = sorted(
+                game_id for game_id, (_, finished_at) in self._finished.items() if finished_at < finished_before
+            )
+        for chunk in chunked(finished, chunk_size):
+            rows = []
+            for game_id in chunk:
+                game = self._games.get(game_id)
+                if game:
+                    status, finished_at = self._finished[game_id]
+                    rows.append({**game, "status": status, "finished_at": finished_at})
+            if rows:
+                yield rows
+
+    def iter_abandoned_games(self, active_before: datetime, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        with self._lock:
+            abandoned = sorted(
+                game_id for game_id, active_at in self._active.items()
+                if active_at < active_before and game_id not in self._finished and game_id not in self._idle
+            )
+        for chunk in chunked(abandoned, chunk_size):
+            rows = [{**self._games[game_id], "status": "playing"} for game_id in chunk if game_id in self._games]
+            if rows:
+                yield rows
+
+    def delete_idle_games(self, created_before: datetime, batch_size: int) -> int:
+        with self._lock:
+            stale = [game_id for game_id in self._idle if self._active[game_id] < created_before]
+            # No longer claimable from here on
+            self._idle.difference_update(stale)
+        self.delete_games(stale)
+        return len(stale)
+
+    def fetch_game_children(self, game_ids: list[int]) -> dict[str, list[dict[str, Any]]]:
+        event_locations: list[dict[str, Any]] = []
+        for game_id in game_ids:
+            for event_location_id in self._game_event_locations.get(game_id, []):
+                _, event_id, place_id, resolved = self._event_locations[event_location_id]
+                event_locations.append(
+                    {"id": event_location_id, "game_id": game_id, "event_id": event_id, "place_id": place_id, "resolved": resolved}
+                )
+        return {
+            "event_locations": event_locations,
+            "game_actions": [dict(action) for game_id in game_ids for action in self._actions.get(game_id, [])],
+            "game_snapshots": [dict(snapshot) for game_id in game_ids for snapshot in self._snapshots.get(game_id, [])],
+        }
+
+    def delete_games(self, game_ids: list[int]) -> None:
+        with self._lock:
+            for game_id in game_ids:
+                self._games.pop(game_id, None)
+                self._finished.pop(game_id, None)
+                self._idle.discard(game_id)
+                self._active.pop(game_id, None)
+                self._actions.pop(game_id, None)
+                self._snapshots.pop(game_id, None)
+                for event_location_id in self._game_event_locations.pop(game_id, []):
+                    del self._event_locations[event_location_id]
+
+    def iter_game_events(self, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+        locations = {loc["id"]: loc for loc in self._locations}
+
+        def rows() -> Iterator[dict[str, Any]]:
+            for event_location_id, (game_id, event_id, place_id, resolved) in list(self._event_locations.items()):
+                game = self._games[game_id]
+                event = self._events_by_id[event_id]
+                location = locations[place_id]
+                status = IDLE if game_id in self._idle else self._finished.get(game_id, ("playing",))[0]
+                yield {
+                    "game_id": game_id,
+                    "status": status,
+                    "money": game["money"],
+                    "energy": game["energy"],
+                    "key_found": game["key_found"],
+                    "event_id": event_id,
+                    "place_id": place_id,
+                    "resolved": resolved,
+                    "event_name": event["name"],
+                    "money_change": event["money_change"],
+                    "energy_change": event["energy_change"],
+                    "is_key": event["is_key"],
+                    "is_bully": event["is_bully"],
+                    "place_name": location["name"],
+                    "x_coord": location["x_coord"],
+                    "y_coord": location["y_coord"],
+                }
+
+        yield from chunked(rows(), chunk_size)
+
+
+def is_database_error(error: BaseException) -> bool:
+    """Whether an error came from a database driver; the MySQL one is only checked if it was loaded"""
+    connector = sys.modules.get("mysql.connector")
+    return isinstance(error, sqlite3.Error) or (connector is not None and isinstance(error, connector.Error))
+
+
+def create_storage(backend: Optional[str] = None) -> Storage:
+    """Create a storage backend by name: mysql, sqlite or memory (default: $GAME_STORAGE)"""
+    backend = (backend or os.environ.get("GAME_STORAGE", "mysql")).lower()
+    if backend == "mysql":
+        return MySQLStorage()
+    if backend == "sqlite":
+        return SQLiteStorage(os.environ.get("SQLITE_PATH", "bike_in_town.sqlite3"))
+    if backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+_storage: Optional[Storage] = None
+
+
+def get_storage() -> Storage:
+    """Get the active storage backend, creating it on first use"""
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage: Storage) -> None:
+    """Replace the active storage backend"""
+    global _storage
+    _storage = storage
@@ -1,4 +1,4 @@
-import textwrap
+from functools import lru_cache
 
 story = '''You are a young adventurer living in a small town, and you've just gotten your first bike!
 Your grandmother has told you stories about a mysterious hidden key somewhere in town that unlocks
@@ -29,10 +29,14 @@ The treasure awaits, but only if you can find the key and return home safely.
 
 Good luck, young explorer!'''
 
-# Set column width to 80 characters
-wrapper = textwrap.TextWrapper(width=80, break_long_words=False, replace_whitespace=False)
-# Wrap text
-word_list = wrapper.wrap(text=story)
+
+@lru_cache(maxsize=None)
+def wrapped_story() -> tuple[str, ...]:
+    """Wrap the story to 80 columns; done on first use, not at import"""
+    import textwrap
+
+    wrapper = textwrap.TextWrapper(width=80, break_long_words=False, replace_whitespace=False)
+    return tuple(wrapper.wrap(text=story))
 
 
 def justify_line(line: str, width: int = 80) -> str:
@@ -65,6 +69,7 @@ def justify_line(line: str, width: int = 80) -> str:
 
 def get_story():
     """Get the story with justified text formatting"""
+    word_list = wrapped_story()
     justified_lines = []
     for i, line in enumerate(word_list):
         # Don't justify the last line or empty lines
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# The game's modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mapgen  # noqa: E402
+from engine import seeded_layout  # noqa: E402
+from storage import MemoryStorage, SQLiteStorage, Storage  # noqa: E402
+from world import World  # noqa: E402
+
+
+def town_world(width: int, height: int, seed: int = 0) -> World:
+    """Build a World over a generated town, without a database"""
+    tables = mapgen.generate_town(width, height, seed)
+    return World(lambda: (list(tables[0]), list(tables[1]), list(tables[2])))
+
+
+@pytest.fixture
+def small_town() -> World:
+    return town_world(6, 6, seed=3)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request: pytest.FixtureRequest) -> Storage:
+    """A fresh in-memory or SQLite (in-memory database) backend with the default town"""
+    return MemoryStorage() if request.param == "memory" else SQLiteStorage()
+
+
+def new_game(backend: Storage, seed: int = 1, money: int = 100, energy: int = 100) -> int:
+    """Create one game with a seeded event layout"""
+    place_ids = [location["id"] for location in backend.fetch_locations() if not location["is_home"]]
+    event_ids = [event["id"] for event in backend.fetch_events()]
+    layout = seeded_layout(place_ids, event_ids, seed)
+    return backend.create_games("tester", money, energy, 1, [layout], [seed])[0]
@@ -0,0 +1,52 @@
+import math
+
+import numpy as np
+
+from analytics import decode, export_game_events, load_export, outcome_by
+from conftest import new_game
+from storage import MemoryStorage
+
+
+def encoded(values: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    distinct = sorted(set(values))
+    return np.array([distinct.index(value) for value in values], dtype=np.int32), np.array(distinct)
+
+
+def columns_for(rows: list[tuple[str, str, bool]]) -> dict[str, np.ndarray]:
+    """Columns from (game status, event name, resolved) rows"""
+    columns: dict[str, np.ndarray] = {}
+    for i, name in enumerate(("status", "event_name")):
+        columns[name], columns[name + "__dict"] = encoded([row[i] for row in rows])
+    columns["resolved"] = np.array([row[2] for row in rows])
+    return columns
+
+
+def test_outcome_by_conditions_on_opened() -> None:
+    rows = [
+        # Every game places both events; only opening the note goes with winning
+        ("won", "Note", True), ("won", "Crash", False),
+        ("won", "Note", True), ("won", "Crash", True),
+        ("lost", "Note", False), ("lost", "Crash", True),
+        ("quit", "Note", False), ("quit", "Crash", False),
+        ("playing", "Note", True), ("playing", "Crash", True),
+    ]
+    result = outcome_by(columns_for(rows), "event_name")
+    assert result == [("Note", 4, 2, 1.0, 0.0), ("Crash", 4, 2, 0.5, 0.5)]
+
+
+def test_outcome_by_rates_over_no_games_are_nan() -> None:
+    rows = [("won", "Key", True), ("lost", "Key", True), ("lost", "Stash", False)]
+    (key, stash) = outcome_by(columns_for(rows), "event_name")
+    assert key[:4] == ("Key", 2, 2, 0.5) and math.isnan(key[4])
+    assert stash[:3] == ("Stash", 1, 0) and math.isnan(stash[3]) and stash[4] == 0.0
+
+
+def test_export_round_trip(tmp_path) -> None:
+    backend = MemoryStorage()
+    game_ids = [new_game(backend, seed) for seed in range(3)]
+    path = str(tmp_path / "events.npz")
+    rows = export_game_events(backend, path, chunk_size=7)
+    columns = load_export(path)
+    assert rows == len(columns["game_id"]) == sum(len(backend.fetch_unresolved_events(game_id)) for game_id in game_ids)
+    assert set(decode(columns, "status").tolist()) == {"playing"}
+    assert not columns["resolved"].any()
@@ -0,0 +1,82 @@
+import sys
+from datetime import timedelta
+
+import pytest
+
+import archive
+from conftest import new_game
+from session import GameSession
+from storage import IDLE, SQLiteStorage, Storage
+
+# A cutoff in the future, so every candidate counts as old enough
+ANY_AGE = timedelta(minutes=-1)
+
+
+def play_turn(backend: Storage, game_id: int, finish: str = "") -> None:
+    session = GameSession(backend, game_id, flush_every=0)
+    session.update(energy=95, location=2)
+    session.record("move", 2, energy_change=-5)
+    if finish:
+        session.finish(finish)
+    session.flush()
+
+
+def test_archive_finished_and_abandoned(backend: Storage, tmp_path) -> None:
+    finished, playing = new_game(backend), new_game(backend)
+    play_turn(backend, finished, "quit")
+    play_turn(backend, playing)
+    idle = backend.create_games("pool", 100, 100, 1, [[]], status=IDLE)[0]
+    out = str(tmp_path)
+
+    stats = archive.archive_games(backend, out, ANY_AGE)
+    assert (stats["games"], stats["abandoned"]) == (1, 0)
+    assert backend.get_game_state(finished) is None and backend.get_game_state(playing) is not None
+
+    stats = archive.archive_games(backend, out, ANY_AGE, abandon_after=ANY_AGE)
+    assert (stats["games"], stats["abandoned"]) == (1, 1)
+    assert backend.get_game_state(playing) is None
+    # Pooled games waiting for a player are never archived, but old ones are deleted
+    assert stats["idle"] == 1 and backend.get_game_state(idle) is None
+
+    assert stats["path"] is not None
+    record = archive.read_archive(stats["path"])[-1]
+    assert record["game"]["id"] == playing and [action["turn"] for action in record["game_actions"]] == [1]
+
+
+def test_abandoned_means_no_recent_action(tmp_path) -> None:
+    backend = SQLiteStorage()
+    stale, active, fresh = new_game(backend), new_game(backend), new_game(backend)
+    # Both started two days ago, but one was still played a moment ago
+    backend.connection.execute("UPDATE game SET created_at = datetime('now', '-2 days') WHERE id IN (?, ?)", (stale, active))
+    play_turn(backend, active)
+
+    stats = archive.archive_games(backend, str(tmp_path), timedelta(days=1), abandon_after=timedelta(days=1))
+    assert (stats["games"], stats["abandoned"]) == (1, 1)
+    assert backend.get_game_state(stale) is None
+    assert backend.get_game_state(active) is not None and backend.get_game_state(fresh) is not None
+
+
+def test_keep_with_every_is_rejected(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(sys, "argv", ["archive.py", "--keep", "--every", "600"])
+    with pytest.raises(SystemExit) as exit_info:
+        archive.main()
+    assert exit_info.value.code == 2
+
+
+def test_only_stale_idle_games_are_deleted(tmp_path) -> None:
+    backend = SQLiteStorage()
+    stale, fresh, claimed = backend.create_games("", 100, 100, 1, [[(1, 2)], [(1, 2)], [(1, 2)]], status=IDLE)
+    backend.connection.execute("UPDATE game SET created_at = datetime('now', '-2 days') WHERE id IN (?, ?)", (stale, claimed))
+    assert backend.claim_game(claimed, "alice")
+    # The claim restarted the game's clock, so it is neither idle nor abandoned
+    stats = archive.archive_games(backend, str(tmp_path), timedelta(days=1), delete_batch=1, abandon_after=timedelta(days=1))
+    assert (stats["games"], stats["idle"]) == (0, 1)
+    assert backend.get_game_state(stale) is None
+    assert backend.get_game_state(fresh) is not None and backend.get_game_state(claimed) is not None
+
+
+def test_keep_leaves_idle_games(tmp_path) -> None:
+    backend = SQLiteStorage()
+    idle = backend.create_games("", 100, 100, 1, [[]], status=IDLE)[0]
+    stats = archive.archive_games(backend, str(tmp_path), ANY_AGE, delete=False, abandon_after=ANY_AGE)
+    assert stats["idle"] == 0 and backend.get_game_state(idle) is not None
@@ -0,0 +1,24 @@
+import io
+import json
+
+import batch
+
+
+def transcript(answers: list[str]) -> list[dict]:
+    out = io.StringIO()
+    batch.run_batch(out, 1, [answers], storage="memory")
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_exhausted_script_keeps_last_step_output() -> None:
+    records = transcript(["N", "alice", "move park", "Y", "info"])
+    steps = [record for record in records if record["type"] == "step"]
+    assert [step["input"] for step in steps] == ["N", "alice", "move park", "Y", "info"]
+    assert "You are at Park" in steps[-1]["output"]
+    assert all("output" in step and step["ms"] >= 0 for step in steps)
+    assert records[-1]["exhausted"] and records[-1]["status"] == "quit"
+
+
+def test_quit_closes_last_step() -> None:
+    steps = [record for record in transcript(["N", "alice", "quit"]) if record["type"] == "step"]
+    assert steps[-1]["input"] == "quit" and steps[-1]["output"]
@@ -0,0 +1,109 @@
+import random
+import statistics
+import time
+
+import pytest
+
+import mapgen
+from conftest import town_world
+from names import NameIndex, edit_distance, normalize
+
+NAMES = ["HOME", "Post Office", "Park", "Parking Lot", "Library", "Central Library", "Cafe", "Cafe Royal", "Bakery", "Barbershop"]
+
+
+@pytest.fixture
+def index() -> NameIndex:
+    return NameIndex(NAMES)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("post office", "Post Office"),
+    ("  POST   office ", "Post Office"),
+    ("park", "Park"),  # exact beats the longer "Parking Lot"
+    ("cafe", "Cafe"),
+    ("offi", "Post Office"),  # the only name with a word starting "offi"
+    ("parki", "Parking Lot"),
+    ("cent", "Central Library"),
+    ("libary", "Library"),  # one deletion
+    ("bakrey", "Bakery"),  # one swap
+    ("barbrshopp", "Barbershop"),  # two edits, clearly closest
+])
+def test_resolve_matches(index: NameIndex, query: str, expected: str) -> None:
+    match, suggestions = index.resolve(query)
+    assert match is not None and NAMES[match] == expected
+    assert suggestions == []
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("par", ["Park", "Parking Lot"]),  # ambiguous prefix, shortest names first
+    ("libr", ["Library", "Central Library"]),
+    ("caf", ["Cafe", "Cafe Royal"]),
+    ("bakr", ["Bakery"]),  # a one-letter typo in a short word is not enough to guess
+])
+def test_resolve_ambiguous_suggests(index: NameIndex, query: str, expected: list[str]) -> None:
+    match, suggestions = index.resolve(query)
+    assert match is None
+    assert [NAMES[i] for i in suggestions][:len(expected)] == expected
+
+
+def test_resolve_unknown(index: NameIndex) -> None:
+    assert index.resolve("zzzzzzzz") == (None, [])
+    assert index.resolve("") == (None, [])
+    assert NameIndex([]).resolve("park") == (None, [])
+
+
+def test_duplicate_names_resolve_to_the_first(index: NameIndex) -> None:
+    assert NameIndex(["Park", "Cafe", "park"]).resolve("PARK") == (0, [])
+
+
+def test_one_edit_and_similar_against_edit_distance() -> None:
+    world = town_world(12, 12, seed=4)
+    names = world.get_locations().names
+    index = NameIndex(names)
+    rng = random.Random(0)
+    for _ in range(50):
+        name = normalize(rng.choice(names))
+        position = rng.randrange(len(name))
+        typo = name[:position] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[position + 1:]
+        expected = {i for i, other in enumerate(names) if edit_distance(typo, normalize(other)) == 1}
+        assert set(index.one_edit(typo)) == expected
+        for i, distance in index.similar(typo):
+            assert edit_distance(typo, normalize(names[i])) == distance
+
+
+def test_find_location(small_town) -> None:
+    location, suggestions = small_town.find_location("home")
+    assert location is not None and location["is_home"] and suggestions == []
+    location, suggestions = small_town.find_location("no such place anywhere")
+    assert location is None
+
+
+def reference_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def test_edit_distance_matches_reference() -> None:
+    rng = random.Random(1)
+    for _ in range(500):
+        a = "".join(rng.choice("ab c") for _ in range(rng.randint(0, 8)))
+        b = "".join(rng.choice("ab c") for _ in range(rng.randint(0, 8)))
+        assert edit_distance(a, b) == reference_distance(a, b)
+
+
+def test_typo_lookups_on_a_big_index_are_fast() -> None:
+    names = [location["name"] for location in mapgen.generate_locations(400, 250)]
+    index = NameIndex(names)
+    for query in ["parkk 12345", "libary 777", "harbr west 1234"]:
+        timings = []
+        for _ in range(15):
+            started = time.perf_counter()
+            index.resolve(query)
+            timings.append(time.perf_counter() - started)
+        # The first lookup included; about 0.5 ms each on a laptop
+        assert max(timings) < 0.01 and statistics.median(timings) < 0.0015
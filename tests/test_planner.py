@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+import pytest
+
+import mapgen
+import world
+from planner import RoutePlanner, dijkstra, dijkstra_many
+from world import World
+
+
+def holey_town(width: int, height: int, seed: int) -> World:
+    """A generated town with some cells emptied, some doubled up and a few long routes"""
+    locations, events, routes = mapgen.generate_town(width, height, seed)
+    rng = random.Random(seed)
+    kept = [location for location in locations if location["is_home"] or rng.random() < 0.8]
+    next_id = max(location["id"] for location in locations) + 1
+    for location in rng.sample(kept, 3):
+        kept.append({**location, "id": next_id, "name": f"Annex {next_id}", "is_home": False})
+        next_id += 1
+    ids = {location["id"] for location in kept}
+    routes = [route for route in routes if route["from_location_id"] in ids and route["to_location_id"] in ids]
+    for _ in range(10):
+        start, end = rng.sample(kept, 2)
+        condition, multiplier = rng.choice([("excellent", 0.8), ("good", 1.0), ("poor", 1.5)])
+        routes.append({"from_location_id": start["id"], "to_location_id": end["id"], "road_condition": condition, "terrain_multiplier": multiplier})
+    unique = {(route["from_location_id"], route["to_location_id"]): route for route in routes}
+    return World(lambda: (list(kept), list(events), list(unique.values())))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_big_map_search_matches_dense(monkeypatch: pytest.MonkeyPatch, seed: int) -> None:
+    dense = holey_town(9, 8, seed)
+    ids = [location["id"] for location in dense.get_locations()]
+    rng = random.Random(seed)
+    pairs = [(rng.choice(ids), rng.choice(ids)) for _ in range(300)]
+    expected = {(a, b): RoutePlanner(dense).cheapest_cost(a, b) for a, b in pairs}
+    sources, targets = ids[:5], ids[-7:]
+    rows = [RoutePlanner(dense).costs_from(a) for a in sources]
+    between = [[int(row[dense.index_of(b)]) for b in targets] for row in rows]
+
+    monkeypatch.setattr(world, "MATRIX_MAX_LOCATIONS", 0)
+    sparse = holey_town(9, 8, seed)
+    planner = RoutePlanner(sparse)
+    assert not sparse.dense and planner.multi_hop
+    for (a, b), cost in expected.items():
+        assert planner.cheapest_cost(a, b) == cost
+        path, total = planner.plan(a, b)
+        assert (path[0]["id"], path[-1]["id"], total) == (a, b, cost)
+        assert sum(sparse.energy_cost(u["id"], v["id"]) for u, v in zip(path, path[1:])) == cost
+    assert planner.costs_between(sources, targets) == between
+
+
+def test_scattered_big_map_takes_the_direct_hop(monkeypatch: pytest.MonkeyPatch) -> None:
+    locations, events, _ = mapgen.generate_town(3, 3, 0)
+    for location in locations:
+        location["x_coord"] *= 100
+    monkeypatch.setattr(world, "MATRIX_MAX_LOCATIONS", 0)
+    scattered = World(lambda: (list(locations), list(events), []))
+    planner = RoutePlanner(scattered)
+    assert not planner.multi_hop
+    a, b = locations[0]["id"], locations[-1]["id"]
+    assert planner.plan(a, b) == ([scattered.get_location_info(a), scattered.get_location_info(b)], scattered.energy_cost(a, b))
+
+
+def test_dijkstra_many_matches_dijkstra() -> None:
+    costs = holey_town(8, 8, seed=9).cost_matrix()
+    sources = [0, 5, 17, 40]
+    dist, pred = dijkstra_many(costs, sources)
+    for row, source in enumerate(sources):
+        one_dist, one_pred = dijkstra(costs, source)
+        assert np.array_equal(dist[row], one_dist) and np.array_equal(pred[row], one_pred)
@@ -0,0 +1,89 @@
+import random
+import sys
+
+import pytest
+
+import replay
+from conftest import new_game
+from models import SnapshotRow
+from session import GameSession
+from storage import SQLiteStorage, Storage
+
+FLUSH_EVERY = 4
+SNAPSHOT_EVERY = 5
+
+
+def play(backend: Storage, game_id: int, turns: int, seed: int = 0) -> list[SnapshotRow]:
+    """Play random moves, buys and events through a session; return the state after each turn"""
+    rng = random.Random(seed)
+    session = GameSession(backend, game_id, flush_every=FLUSH_EVERY, snapshot_every=SNAPSHOT_EVERY)
+    state = session.state
+    history = [SnapshotRow(game_id=game_id, turn=0, money=state["money"], energy=state["energy"], current_place=state["current_place"], key_found=False)]
+    for _ in range(turns):
+        money, energy, place, key_found = state["money"], state["energy"], state["current_place"], bool(state["key_found"])
+        kind = rng.choice(["move", "buy", "event"])
+        if kind == "move":
+            place, cost = rng.randint(1, 20), rng.randint(1, 5)
+            energy -= cost
+            session.update(energy=energy, location=place)
+            session.record("move", place, energy_change=-cost)
+        elif kind == "buy":
+            money, energy = money - 3, energy + 3
+            session.update(money=money, energy=energy)
+            session.record("buy", 3, money_change=-3, energy_change=3)
+        else:
+            found = rng.random() < 0.1
+            key_found = key_found or found
+            money += 10
+            session.update(money=money, key_found=key_found)
+            session.record("event", 0, money_change=10, key_found=found)
+        session.command_done()
+        history.append(SnapshotRow(game_id=game_id, turn=session.turn, money=money, energy=energy, current_place=place, key_found=key_found))
+    session.flush()
+    return history
+
+
+def test_replay_every_turn(backend: Storage) -> None:
+    game_id = new_game(backend)
+    history = play(backend, game_id, 23)
+    for expected in history:
+        result = replay.replay(backend, game_id, expected["turn"])
+        assert result is not None
+        state, actions = result
+        assert state == expected
+        # Only the actions since the nearest snapshot are read, in turn order
+        assert [action["turn"] for action in actions] == list(range(expected["turn"] - len(actions) + 1, expected["turn"] + 1))
+        assert len(actions) < FLUSH_EVERY + SNAPSHOT_EVERY
+    # The last flush wrote a snapshot, so the final state needs no actions
+    result = replay.replay(backend, game_id)
+    assert result is not None and result[0] == history[-1] and result[1] == []
+
+
+def run_main(monkeypatch: pytest.MonkeyPatch, backend: Storage, *args: str) -> None:
+    monkeypatch.setattr(replay, "create_storage", lambda name=None: backend)
+    monkeypatch.setattr(sys, "argv", ["replay.py", *args])
+    replay.main()
+
+
+def test_verify_round_trip(backend: Storage, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+    game_id = new_game(backend, seed=42)
+    play(backend, game_id, 12)
+    run_main(monkeypatch, backend, str(game_id), "--verify", "--layout", "--log")
+    out = capsys.readouterr().out
+    assert "✅ Matches the live game row" in out
+    assert "✅ Regenerates the stored event layout" in out
+
+
+def test_verify_detects_a_diverged_game_row(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+    backend = SQLiteStorage()
+    game_id = new_game(backend)
+    play(backend, game_id, 7)
+    backend.connection.execute("UPDATE game SET money = money + 1 WHERE id = ?", (game_id,))
+    with pytest.raises(SystemExit) as exit_info:
+        run_main(monkeypatch, backend, str(game_id), "--verify")
+    assert exit_info.value.code == 1
+    assert "❌ Differs from the live game row" in capsys.readouterr().out
+
+
+def test_replay_without_snapshot(backend: Storage) -> None:
+    assert replay.replay(backend, 999, None) is None
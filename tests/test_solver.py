@@ -0,0 +1,101 @@
+import itertools
+import random
+from typing import Optional
+
+import pytest
+
+from engine import apply_event
+from models import GameEventRow
+from planner import RoutePlanner
+import world
+from solver import TourSolver, event_gain
+from world import World
+
+HOME = 1
+
+
+def make_event(event_location_id: int, place_id: int, money: int = 0, energy: int = 0, key: bool = False) -> GameEventRow:
+    return GameEventRow(
+        event_location_id=event_location_id, name=f"event {event_location_id}", money_change=money,
+        energy_change=energy, is_key=key, is_bully=False, description="", place_id=place_id,
+    )
+
+
+def brute_force(planner: RoutePlanner, start: int, energy: int, money: int, events: list[GameEventRow]) -> Optional[int]:
+    """Cheapest energy over every order of every subset of stops that includes the key"""
+    key = next(event for event in events if event["is_key"])
+    optional = [event for event in events if not event["is_key"] and event_gain(event, money) > 0]
+    best: Optional[int] = None
+    rides: dict[tuple[int, int], Optional[int]] = {}
+    for size in range(len(optional) + 1):
+        for chosen in itertools.combinations(optional, size):
+            for order in itertools.permutations([key, *chosen]):
+                here, budget, ridden = start, energy + money, 0
+                for place, gain in [(event["place_id"], event_gain(event, money)) for event in order] + [(HOME, 0)]:
+                    if (here, place) not in rides:
+                        rides[here, place] = planner.cheapest_cost(here, place)
+                    ride = rides[here, place]
+                    if ride is None or ride > budget:
+                        break
+                    here, budget, ridden = place, budget - ride + gain, ridden + ride
+                else:
+                    best = ridden if best is None else min(best, ridden)
+    return best
+
+
+def random_events(rng: random.Random, place_ids: list[int]) -> list[GameEventRow]:
+    places = rng.sample(place_ids, 6)
+    events = [make_event(1, places[0], key=True)]
+    kinds = [dict(money=10), dict(money=20), dict(energy=20), dict(money=-10), dict(energy=-20)]
+    for n, place in enumerate(places[1:], start=2):
+        events.append(make_event(n, place, **rng.choice(kinds)))
+    return events
+
+
+@pytest.mark.parametrize("big_map", [False, True])
+def test_solver_matches_brute_force(monkeypatch: pytest.MonkeyPatch, small_town: World, big_map: bool) -> None:
+    if big_map:
+        monkeypatch.setattr(world, "MATRIX_MAX_LOCATIONS", 0)
+    planner = RoutePlanner(small_town)
+    solver = TourSolver(small_town, planner)
+    place_ids = [location["id"] for location in small_town.get_locations() if not location["is_home"]]
+    rng = random.Random(7)
+    solved = unsolved = 0
+    for _ in range(60):
+        events = random_events(rng, place_ids)
+        start = rng.choice(place_ids)
+        energy, money = rng.randint(0, 8), rng.randint(0, 4)
+        expected = brute_force(planner, start, energy, money, events)
+        tour = solver.solve(start, HOME, energy, money, False, events)
+        if expected is None:
+            assert tour is None
+            unsolved += 1
+            continue
+        solved += 1
+        assert tour is not None and tour.energy == expected
+
+        # The tour itself is playable: no leg rides on missing energy, and it ends HOME with the key
+        key_found = False
+        for leg in tour.legs:
+            assert 0 <= leg.buy <= money
+            money, energy = money - leg.buy, energy + leg.buy - leg.energy_cost
+            assert energy >= 0
+            if leg.event is not None:
+                money, energy, key_found = apply_event(money, energy, key_found, leg.event)  # type: ignore
+        assert key_found and tour.legs[-1].location_id == HOME
+        assert sum(leg.energy_cost for leg in tour.legs) == tour.energy
+        assert (money, energy) == (tour.money_left, tour.energy_left)
+    assert solved and unsolved
+
+
+def test_solver_without_key_event(small_town: World) -> None:
+    solver = TourSolver(small_town, RoutePlanner(small_town))
+    assert solver.solve(8, HOME, 100, 100, False, [make_event(1, 9, money=10)]) is None
+
+
+@pytest.mark.parametrize("energy, money", [(100, 0), (0, 100)])
+def test_solver_key_found_rides_home(small_town: World, energy: int, money: int) -> None:
+    planner = RoutePlanner(small_town)
+    tour = TourSolver(small_town, planner).solve(36, HOME, energy, money, True, [])
+    assert tour is not None and tour.legs[-1].location_id == HOME
+    assert tour.energy == planner.cheapest_cost(36, HOME)
@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+import pytest
+
+import world
+from conftest import town_world
+from spatial import GridIndex
+
+
+def full_scan(xs: np.ndarray, ys: np.ndarray, x: int, y: int, radius: int) -> np.ndarray:
+    return np.flatnonzero(np.abs(xs - x) + np.abs(ys - y) <= radius)
+
+
+@pytest.mark.parametrize("cell_size", [1, 4, 32])
+def test_within_matches_full_scan(cell_size: int) -> None:
+    rng = np.random.default_rng(cell_size)
+    xs, ys = rng.integers(-40, 120, 500), rng.integers(-40, 120, 500)
+    index = GridIndex(xs, ys, cell_size)
+    for _ in range(300):
+        x, y = int(rng.integers(-80, 160)), int(rng.integers(-80, 160))
+        radius = int(rng.integers(0, 80))
+        assert np.array_equal(index.within(x, y, radius), full_scan(xs, ys, x, y, radius))
+
+
+def test_within_huge_radius_and_edges() -> None:
+    xs, ys = np.repeat(np.arange(50), 50), np.tile(np.arange(50), 50)
+    index = GridIndex(xs, ys, cell_size=8)
+    assert np.array_equal(index.within(0, 0, 10**9), np.arange(len(xs)))
+    assert np.array_equal(index.within(10**6, -10**6, 10**9), np.arange(len(xs)))
+    assert len(index.within(500, 500, 10)) == 0
+    assert len(index.within(3, 3, -1)) == 0
+    assert len(GridIndex(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)).within(0, 0, 10**9)) == 0
+
+
+def test_reachable_grid_matches_dense_and_full_scan(monkeypatch: pytest.MonkeyPatch) -> None:
+    dense = town_world(14, 14, seed=5)
+    ids = [location["id"] for location in dense.get_locations()]
+    rng = random.Random(2)
+    queries = [(rng.choice(ids), rng.randint(0, 30), rng.random() < 0.5) for _ in range(200)]
+    assert dense.dense
+    expected = [dense.reachable(*query) for query in queries]
+    costs = {(a, b): dense.energy_cost(a, b) for a in {query[0] for query in queries} for b in ids}
+
+    # The same town above the matrix limit answers from the grid index
+    monkeypatch.setattr(world, "MATRIX_MAX_LOCATIONS", 0)
+    sparse = town_world(14, 14, seed=5)
+    assert not sparse.dense
+    for (location_id, energy, include_self), want in zip(queries, expected):
+        got = sparse.reachable(location_id, energy, include_self)
+        for a, b in zip(want, got):
+            assert np.array_equal(a, b)
+        # Every location within energy, by a direct-hop scan
+        scan = {
+            sparse.index_of(other) for other in ids
+            if costs[location_id, other] <= energy and (include_self or other != location_id)
+        }
+        assert set(got[0].tolist()) == scan
+        assert all(sparse.energy_cost(location_id, other) == costs[location_id, other] for other in ids)
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from session import GameSession
+from storage import GameConflictError, Storage
+from conftest import new_game
+
+
+def play_event(session: GameSession) -> int:
+    """Ride to the first open event and open it, as the game would"""
+    event = session.unresolved_events()[0]
+    energy = session.state["energy"] - 10
+    session.update(energy=energy, location=event["place_id"])
+    session.record("move", event["place_id"], energy_change=-10)
+    session.update(money=session.state["money"] + 20)
+    session.resolve_event(event["event_location_id"])
+    session.record("event", event["event_location_id"], money_change=20)
+    return event["event_location_id"]
+
+
+def test_commit_game_writes_one_turn_range(backend: Storage) -> None:
+    game_id = new_game(backend)
+    session = GameSession(backend, game_id, flush_every=0, snapshot_every=2)
+    opened = play_event(session)
+    session.flush()
+
+    state = backend.get_game_state(game_id)
+    assert state is not None
+    assert (state["turn"], state["money"], state["energy"]) == (2, 120, 90)
+    assert backend.fetch_last_turn(game_id) == 2
+    assert [action["kind"] for action in backend.fetch_actions(game_id, 0, 2)] == ["move", "event"]
+    assert opened not in [event["event_location_id"] for event in backend.fetch_unresolved_events(game_id)]
+    snapshot = backend.fetch_snapshot(game_id, 2)
+    assert snapshot is not None and snapshot["turn"] == 2
+    assert GameSession(backend, game_id).turn == 2
+
+
+def test_commit_game_conflict_writes_nothing(backend: Storage) -> None:
+    game_id = new_game(backend)
+    first = GameSession(backend, game_id, flush_every=0)
+    second = GameSession(backend, game_id, flush_every=0)
+    unresolved = len(backend.fetch_unresolved_events(game_id))
+
+    play_event(first)
+    first.flush()
+    before = backend.get_game_state(game_id)
+
+    # The second session still thinks the game is at turn 0
+    second.update(energy=50, location=3)
+    second.resolve_event(second.unresolved_events()[-1]["event_location_id"])
+    second.record("move", 3, energy_change=-50)
+    second.finish("quit")
+    with pytest.raises(GameConflictError):
+        second.flush()
+
+    assert backend.get_game_state(game_id) == before
+    assert backend.fetch_last_turn(game_id) == 2
+    assert len(backend.fetch_unresolved_events(game_id)) == unresolved - 1
+    # The rejected changes are kept, not dropped
+    assert second.dirty
+
+    # The first session, still in step with the stored turn, carries on
+    first.finish("quit")
+    first.flush()
+    finished = [game for chunk in backend.iter_finished_games(datetime.now() + timedelta(days=1), 10) for game in chunk]
+    assert [(game["id"], game["status"]) for game in finished] == [(game_id, "quit")]
@@ -0,0 +1,207 @@
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional, TypedDict
+
+# Set to dump the query report to stderr when the game exits
+TRACE_ENV_FLAG = "GAME_TRACE_QUERIES"
+# A template running this many times within one command is flagged as N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("GAME_TRACE_N_PLUS_ONE", "5"))
+
+NO_COMMAND = "(no command)"
+
+
+class TemplateStats(TypedDict):
+    count: int
+    total_time: float
+    max_time: float
+    rows: int
+
+
+def sql_template(sql: str) -> str:
+    """Normalize a statement so repeated shapes group together"""
+    template = re.sub(r"\s+", " ", sql).strip()
+    template = template.replace("?", "%s")
+    # Collapse variable-length placeholder lists: IN (%s, %s, ...) and multi-row VALUES
+    template = re.sub(r"\(%s(, %s)+\)", "(%s, ...)", template)
+    template = re.sub(r"(\(%s(, %s)*(, \.\.\.)?\))(, \(%s(, %s)*(, \.\.\.)?\))+", r"\1, ...", template)
+    return template
+
+
+class QueryTracer:
+    """Records statement counts and timings per SQL template, grouped by command"""
+
+    def __init__(self, n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD) -> None:
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self._command: ContextVar[str] = ContextVar("traced_command", default=NO_COMMAND)
+        self._repeats: ContextVar[Optional[dict[str, int]]] = ContextVar("traced_repeats", default=None)
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded so far"""
+        with self._lock:
+            # command -> template -> stats
+            self.stats: dict[str, dict[str, TemplateStats]] = {}
+            self.invocations: dict[str, int] = {}
+            # (command, template) -> most executions seen within a single invocation
+            self.n_plus_one: dict[tuple[str, str], int] = {}
+
+    def begin_command(self, name: str) -> None:
+        """Attribute the following statements to a command"""
+        self._command.set(name)
+        self._repeats.set({})
+        with self._lock:
+            self.invocations[name] = self.invocations.get(name, 0) + 1
+
+    def end_command(self) -> None:
+        """Finish the current command and check it for N+1 patterns"""
+        name = self._command.get()
+        repeats = self._repeats.get() or {}
+        with self._lock:
+            for template, count in repeats.items():
+                if count >= self.n_plus_one_threshold:
+                    key = (name, template)
+                    self.n_plus_one[key] = max(self.n_plus_one.get(key, 0), count)
+        self._command.set(NO_COMMAND)
+        self._repeats.set(None)
+
+    @contextmanager
+    def command(self, name: str) -> Iterator[None]:
+        """Attribute the enclosed statements to a command"""
+        self.begin_command(name)
+        try:
+            yield
+        finally:
+            self.end_command()
+
+    def record(self, sql: str, elapsed: float, rows: int = 0) -> str:
+        """Record one executed statement and return its template"""
+        template = sql_template(sql)
+        name = self._command.get()
+        with self._lock:
+            by_template = self.stats.setdefault(name, {})
+            stats = by_template.get(template)
+            if stats is None:
+                stats = by_template[template] = TemplateStats(count=0, total_time=0.0, max_time=0.0, rows=0)
+            stats["count"] += 1
+            stats["total_time"] += elapsed
+            stats["max_time"] = max(stats["max_time"], elapsed)
+            stats["rows"] += rows
+        repeats = self._repeats.get()
+        if repeats is not None:
+            repeats[template] = repeats.get(template, 0) + 1
+        return template
+
+    def record_fetch(self, template: str, elapsed: float, rows: int) -> None:
+        """Add fetched rows and fetch time to the statement that produced them"""
+        name = self._command.get()
+        with self._lock:
+            stats = self.stats.get(name, {}).get(template)
+            if stats:
+                stats["total_time"] += elapsed
+                stats["rows"] += rows
+
+    def statement_count(self) -> int:
+        """Total statements recorded"""
+        with self._lock:
+            return sum(stats["count"] for by_template in self.stats.values() for stats in by_template.values())
+
+    def report(self) -> str:
+        """Format the recorded statistics"""
+        lines = ["", "📊 QUERY STATS", "=" * 78]
+        with self._lock:
+            if not self.stats:
+                lines.append("No SQL statements recorded.")
+            for name, by_template in self.stats.items():
+                runs = self.invocations.get(name, 0)
+                total = sum(stats["count"] for stats in by_template.values())
+                per_run = f", {total / runs:.1f} per run" if runs else ""
+                lines.append(f"\n{name}: {runs} run(s), {total} statement(s){per_run}")
+                lines.append("  count  total ms   max ms    rows  template")
+                ordered = sorted(by_template.items(), key=lambda item: item[1]["total_time"], reverse=True)
+                for template, stats in ordered:
+                    short = template if len(template) <= 60 else template[:57] + "..."
+                    lines.append(
+                        f"  {stats['count']:5d} {stats['total_time'] * 1000:9.2f} "
+                        f"{stats['max_time'] * 1000:8.2f} {stats['rows']:7d}  {short}"
+                    )
+            if self.n_plus_one:
+                lines.append("")
+                for (name, template), count in sorted(self.n_plus_one.items(), key=lambda item: -item[1]):
+                    short = template if len(template) <= 60 else template[:57] + "..."
+                    lines.append(f"⚠️ Possible N+1 in '{name}': ran {count}x in one command: {short}")
+        return "\n".join(lines)
+
+
+# Process-wide tracer used by the storage backends
+tracer = QueryTracer()
+
+
+class TracedCursor:
+    """DB-API cursor wrapper that reports every statement to the tracer"""
+
+    def __init__(self, cursor: Any, query_tracer: Optional[QueryTracer] = None) -> None:
+        self._cursor = cursor
+        self._tracer = query_tracer or tracer
+        self._template: Optional[str] = None
+
+    def execute(self, sql: str, params: Any = ()) -> Any:
+        started = time.perf_counter()
+        result = self._cursor.execute(sql, params)
+        self._template = self._tracer.record(sql, time.perf_counter() - started)
+        return result
+
+    def executemany(self, sql: str, seq_of_params: Any) -> Any:
+        started = time.perf_counter()
+        result = self._cursor.executemany(sql, seq_of_params)
+        self._template = self._tracer.record(sql, time.perf_counter() - started)
+        return result
+
+    def _fetched(self, started: float, rows: int) -> None:
+        if self._template is not None:
+            self._tracer.record_fetch(self._template, time.perf_counter() - started, rows)
+
+    def fetchone(self) -> Any:
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, size: int = 1) -> list[Any]:
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self) -> list[Any]:
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def __enter__(self) -> "TracedCursor":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._cursor.close()
+
+
+def traced(cursor: Any) -> TracedCursor:
+    """Wrap a cursor so its statements are recorded"""
+    return TracedCursor(cursor)
+
+
+def dump_on_exit() -> None:
+    """Print the report to stderr at exit when GAME_TRACE_QUERIES is set"""
+    if os.environ.get(TRACE_ENV_FLAG):
+        import atexit
+
+        atexit.register(lambda: print(tracer.report(), file=sys.stderr))
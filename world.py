@@ -0,0 +1,558 @@
+import math
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from typing import Any, Callable, Iterator, Optional, Union, overload
+
+import numpy as np
+
+from models import EventRow, LocationRow, RouteInfoRow, RouteRow
+from names import NAME_SUGGESTIONS, NameIndex
+from spatial import GridIndex
+
+# A loader returns the three static tables: locations, events and routes
+WorldLoader = Callable[[], tuple[list[LocationRow], list[EventRow], list[RouteRow]]]
+
+DEFAULT_ROUTE = RouteInfoRow(road_condition="good", terrain_multiplier=1.0)
+
+# Above this many locations the N x N matrices are not built; costs are computed per row
+MATRIX_MAX_LOCATIONS = int(os.environ.get("WORLD_MATRIX_MAX_LOCATIONS", "1000"))
+
+
+def hop_cost(distance: int, multiplier: float) -> int:
+    """Energy cost of a hop: int(distance * multiplier), robust to float error"""
+    # The epsilon absorbs float error on products such as 0.8 * 5 that should be whole numbers
+    return int(math.floor(distance * multiplier + 1e-9))
+
+
+class LocationTable(Sequence[LocationRow]):
+    """Read-only list of locations over the world's columns
+
+    Rows are built when they are accessed, so a map of a million places
+    costs a few arrays instead of a million dicts. Small maps can keep every
+    row built once with ``cache_rows()``.
+    """
+
+    __slots__ = ("_ids", "_names", "_xs", "_ys", "_home", "_rows", "ids", "xs", "ys", "home")
+
+    def __init__(self, ids: array, names: list[str], xs: array, ys: array, home: array) -> None:
+        # array.array columns hand out plain ints for single rows; the NumPy views share their memory
+        self._ids = ids
+        self._names = names
+        self._xs = xs
+        self._ys = ys
+        self._home = home
+        self.ids = np.frombuffer(ids, dtype=np.int64)
+        self.xs = np.frombuffer(xs, dtype=np.int64)
+        self.ys = np.frombuffer(ys, dtype=np.int64)
+        self.home = np.frombuffer(home, dtype=bool)
+        self._rows: Optional[list[LocationRow]] = None
+
+    def cache_rows(self) -> None:
+        """Build every row now and serve them from then on"""
+        self._rows = list(self)
+
+    @property
+    def names(self) -> list[str]:
+        """Location names, by index"""
+        return self._names
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @overload
+    def __getitem__(self, index: int) -> LocationRow: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[LocationRow]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[LocationRow, list[LocationRow]]:
+        if self._rows is not None:
+            return self._rows[index]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        # A dict display builds rows about twice as fast as calling LocationRow(...)
+        row: LocationRow = {
+            "id": self._ids[index],
+            "name": self._names[index],
+            "x_coord": self._xs[index],
+            "y_coord": self._ys[index],
+            "is_home": bool(self._home[index]),
+        }
+        return row
+
+    def __iter__(self) -> Iterator[LocationRow]:
+        if self._rows is not None:
+            yield from self._rows
+            return
+        for location_id, name, x, y, is_home in zip(self._ids, self._names, self._xs, self._ys, self._home):
+            row: LocationRow = {"id": location_id, "name": name, "x_coord": x, "y_coord": y, "is_home": bool(is_home)}
+            yield row
+
+
+class EventTable(Sequence[EventRow]):
+    """Read-only list of event types over an id column and interned event kinds
+
+    Generated towns repeat a handful of event kinds (name, effects and
+    description) thousands of times, so each event only keeps its id and the
+    code of its kind. Like locations, small tables can keep their rows.
+    """
+
+    __slots__ = ("ids", "_codes", "_kinds", "_rows")
+
+    def __init__(self, ids: np.ndarray, codes: np.ndarray, kinds: list[tuple[str, int, int, bool, bool, str]]) -> None:
+        self.ids = ids
+        self._codes = codes
+        self._kinds = kinds
+        self._rows: Optional[list[EventRow]] = None
+
+    def cache_rows(self) -> None:
+        """Build every row now and serve them from then on"""
+        self._rows = list(self)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @overload
+    def __getitem__(self, index: int) -> EventRow: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[EventRow]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[EventRow, list[EventRow]]:
+        if self._rows is not None:
+            return self._rows[index]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._row(int(self.ids[index]), self._kinds[self._codes[index]])
+
+    def __iter__(self) -> Iterator[EventRow]:
+        if self._rows is not None:
+            yield from self._rows
+            return
+        kinds = self._kinds
+        for event_id, code in zip(self.ids.tolist(), self._codes.tolist()):
+            yield self._row(event_id, kinds[code])
+
+    @staticmethod
+    def _row(event_id: int, kind: tuple[str, int, int, bool, bool, str]) -> EventRow:
+        name, money_change, energy_change, is_key, is_bully, description = kind
+        row: EventRow = {
+            "id": event_id,
+            "name": name,
+            "money_change": money_change,
+            "energy_change": energy_change,
+            "is_key": is_key,
+            "is_bully": is_bully,
+            "description": description,
+        }
+        return row
+
+
+class World:
+    """In-memory cache of the static world tables (locations, events, routes)
+
+    The tables never change while a game runs, so they are loaded once on
+    first use and served from memory afterwards. Call ``reload()`` to fetch
+    them again right away, or ``invalidate()`` to drop the cache and reload
+    lazily on the next access. Maps above ``MATRIX_MAX_LOCATIONS`` skip the
+    N x N matrices; their reachability queries go through a spatial index
+    and only look at locations inside the energy budget's Manhattan diamond.
+
+    Locations are kept as columns (ids, names, coordinates, HOME flags) with
+    an id -> index array, events as ids plus interned event-kind codes, and
+    routes as a CSR table: each location's route targets sorted in one array,
+    with interned road-condition codes. Rows are only built when asked for.
+    """
+
+    def __init__(self, loader: WorldLoader) -> None:
+        self._loader = loader
+        self._loaded = False
+        # Bumped on every reload so derived caches can tell they are stale
+        self.version = 0
+        self._events = EventTable(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32), [])
+        self._event_slots = array("i")
+        self._names: list[str] = []
+        self._locations = LocationTable(array("q"), self._names, array("q"), array("q"), array("B"))
+        self._ids, self._xs, self._ys, self._home = self._locations.ids, self._locations.xs, self._locations.ys, self._locations.home
+        # location id -> index, -1 for ids with no location; an array.array indexes faster than NumPy
+        self._slots = array("i")
+        # (x, y) packed into one sorted key per location, and the index it belongs to
+        self._coord_keys = array("q")
+        self._coord_slots = array("i")
+        self._bounds = (0, 0, 0, 0)
+        # Routes leaving index i are route_targets[route_offsets[i]:route_offsets[i + 1]], sorted;
+        # kept in array.array buffers for single lookups, with NumPy views over them for bulk work
+        self._route_offsets = array("q", [0])
+        self._route_targets = array("i")
+        self._route_target_array = np.zeros(0, dtype=np.int32)
+        self._route_codes = array("B")
+        self._route_code_array = np.zeros(0, dtype=np.uint8)
+        # Distinct (road condition, multiplier) pairs, indexed by route code
+        self._route_kinds: list[RouteInfoRow] = []
+        self._kind_multipliers = np.zeros(0, dtype=np.float64)
+        # Hop energy cost of each route, built on first use
+        self._route_costs: Optional[array] = None
+        self._distance_matrix: Optional[np.ndarray] = None
+        self._cost_matrix: Optional[np.ndarray] = None
+        self._grid: Optional[GridIndex] = None
+        self._name_lookup: Optional[NameIndex] = None
+
+    def reload(self) -> None:
+        """Load all static tables from the loader"""
+        locations, events, routes = self._loader()
+        self._load_events(events)
+        count = len(locations)
+        self._names = [loc["name"] for loc in locations]
+        self._locations = LocationTable(
+            array("q", (loc["id"] for loc in locations)),
+            self._names,
+            array("q", (loc["x_coord"] for loc in locations)),
+            array("q", (loc["y_coord"] for loc in locations)),
+            array("B", (1 if loc["is_home"] else 0 for loc in locations)),
+        )
+        del locations
+        self._ids, self._xs, self._ys, self._home = self._locations.ids, self._locations.xs, self._locations.ys, self._locations.home
+        if count <= MATRIX_MAX_LOCATIONS:
+            # Small enough that rows cost nothing worth saving, and serving built rows is faster
+            self._locations.cache_rows()
+            self._events.cache_rows()
+
+        # Ids are AUTO_INCREMENT keys, so an array indexed by id stays about as long as the map
+        slots = np.full(int(self._ids.max()) + 1 if count else 0, -1, dtype=np.int32)
+        slots[self._ids] = np.arange(count, dtype=np.int32)
+        self._slots = array("i", slots.tobytes())
+
+        if count:
+            self._bounds = (int(self._xs.min()), int(self._ys.min()), int(self._xs.max()), int(self._ys.max()))
+        else:
+            self._bounds = (0, 0, 0, 0)
+        keys = self._coord_key(self._xs, self._ys)
+        order = np.argsort(keys, kind="stable")
+        self._coord_keys = array("q", keys[order].tobytes())
+        self._coord_slots = array("i", order.astype(np.int32).tobytes())
+
+        kinds: dict[tuple[str, float], int] = {}
+        sources: list[int] = []
+        targets: list[int] = []
+        codes: list[int] = []
+        for route in routes:
+            i = self._slot(route["from_location_id"])
+            j = self._slot(route["to_location_id"])
+            if i >= 0 and j >= 0:
+                sources.append(i)
+                targets.append(j)
+                codes.append(kinds.setdefault((route["road_condition"], float(route["terrain_multiplier"])), len(kinds)))
+        source_array = np.array(sources, dtype=np.int64)
+        target_array = np.array(targets, dtype=np.int32)
+        code_type = "B" if len(kinds) <= 256 else "I"
+        code_array = np.array(codes, dtype=np.uint8 if code_type == "B" else np.uint32)
+        del sources, targets, codes
+        # Sort by (from, to); of duplicate pairs the last one listed wins, as a dict would keep it
+        order = np.lexsort((target_array, source_array))
+        source_array, target_array, code_array = source_array[order], target_array[order], code_array[order]
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = (source_array[1:] != source_array[:-1]) | (target_array[1:] != target_array[:-1])
+        source_array, target_array, code_array = source_array[last], target_array[last], code_array[last]
+        self._route_offsets = array("q", np.searchsorted(source_array, np.arange(count + 1)).astype(np.int64).tobytes())
+        self._route_targets = array("i", target_array.tobytes())
+        self._route_target_array = np.frombuffer(self._route_targets, dtype=np.int32)
+        self._route_codes = array(code_type, code_array.tobytes())
+        self._route_code_array = np.frombuffer(self._route_codes, dtype=code_array.dtype)
+        self._route_kinds = [
+            RouteInfoRow(road_condition=condition, terrain_multiplier=multiplier) for condition, multiplier in kinds
+        ]
+        self._kind_multipliers = np.array([multiplier for _, multiplier in kinds], dtype=np.float64)
+
+        self._route_costs = None
+        self._distance_matrix = None
+        self._cost_matrix = None
+        self._grid = None
+        self._name_lookup = None
+        self._loaded = True
+        self.version += 1
+
+    def _load_events(self, events: list[EventRow]) -> None:
+        kinds: dict[tuple[str, int, int, bool, bool, str], int] = {}
+        codes = [
+            kinds.setdefault(
+                (event["name"], event["money_change"], event["energy_change"], event["is_key"], event["is_bully"], event["description"]),
+                len(kinds),
+            )
+            for event in events
+        ]
+        ids = np.fromiter((event["id"] for event in events), dtype=np.int64, count=len(events))
+        self._events = EventTable(ids, np.array(codes, dtype=np.int32), list(kinds))
+        slots = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int32)
+        slots[ids] = np.arange(len(ids), dtype=np.int32)
+        self._event_slots = array("i", slots.tobytes())
+
+    def invalidate(self) -> None:
+        """Drop the cached tables; they are reloaded on next access"""
+        self._loaded = False
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.reload()
+
+    def _coord_key(self, xs: Any, ys: Any) -> Any:
+        min_x, min_y, _, max_y = self._bounds
+        return (xs - min_x) * (max_y - min_y + 1) + (ys - min_y)
+
+    def _slot(self, location_id: int) -> int:
+        """Get the index of a location id, or -1 if there is no such location"""
+        if 0 <= location_id < len(self._slots):
+            return self._slots[location_id]
+        return -1
+
+    def _route_code(self, i: int, j: int) -> int:
+        """Get the road-condition code of the route from index i to index j, or -1 if there is none"""
+        end = self._route_offsets[i + 1]
+        position = bisect_left(self._route_targets, j, self._route_offsets[i], end)
+        if position < end and self._route_targets[position] == j:
+            return self._route_codes[position]
+        return -1
+
+    def _routes_from(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        """Get the target indices and multipliers of the routes leaving index i"""
+        start, end = self._route_offsets[i], self._route_offsets[i + 1]
+        return self._route_target_array[start:end], self._kind_multipliers[self._route_code_array[start:end]]
+
+    def get_locations(self) -> LocationTable:
+        """Get all locations ordered by x_coord, y_coord"""
+        self._ensure_loaded()
+        return self._locations
+
+    def get_events(self) -> EventTable:
+        """Get all event types"""
+        self._ensure_loaded()
+        return self._events
+
+    def get_event(self, event_id: int) -> Optional[EventRow]:
+        """Get an event type by id"""
+        self._ensure_loaded()
+        if 0 <= event_id < len(self._event_slots) and self._event_slots[event_id] >= 0:
+            return self._events[self._event_slots[event_id]]
+        return None
+
+    def event_ids(self) -> list[int]:
+        """Get every event type id, in event order"""
+        self._ensure_loaded()
+        return self._events.ids.tolist()
+
+    def event_place_ids(self) -> list[int]:
+        """Get the ids of the locations events can be placed at (all but HOME), in location order"""
+        self._ensure_loaded()
+        return self._ids[~self._home].tolist()
+
+    def get_location_info(self, location_id: int) -> Optional[LocationRow]:
+        """Get a location by id"""
+        self._ensure_loaded()
+        i = self._slot(location_id)
+        return self._locations[i] if i >= 0 else None
+
+    def has_location(self, location_id: int) -> bool:
+        """Whether a location id exists"""
+        self._ensure_loaded()
+        return self._slot(location_id) >= 0
+
+    def is_home(self, location_id: int) -> bool:
+        """Whether a location is HOME (False for unknown ids)"""
+        self._ensure_loaded()
+        i = self._slot(location_id)
+        return i >= 0 and bool(self._home[i])
+
+    def get_route_info(self, from_location_id: int, to_location_id: int) -> RouteInfoRow:
+        """Get route information between two locations"""
+        self._ensure_loaded()
+        i = self._slot(from_location_id)
+        j = self._slot(to_location_id)
+        code = self._route_code(i, j) if i >= 0 and j >= 0 else -1
+        # Default road condition if no specific route exists
+        return self._route_kinds[code] if code >= 0 else DEFAULT_ROUTE
+
+    def get_location_at(self, x: int, y: int) -> Optional[LocationRow]:
+        """Get the location at a grid coordinate, if any"""
+        self._ensure_loaded()
+        min_x, min_y, max_x, max_y = self._bounds
+        if not self._names or not (min_x <= x <= max_x and min_y <= y <= max_y):
+            return None
+        key = self._coord_key(x, y)
+        # Of locations sharing a coordinate the last one listed wins, as a dict would keep it
+        position = bisect_right(self._coord_keys, key) - 1
+        if position < 0 or self._coord_keys[position] != key:
+            return None
+        return self._locations[self._coord_slots[position]]
+
+    def indices_at(self, x: int, y: int) -> list[int]:
+        """Get the indices of every location at a grid coordinate, in location order"""
+        self._ensure_loaded()
+        min_x, min_y, max_x, max_y = self._bounds
+        if not (min_x <= x <= max_x and min_y <= y <= max_y):
+            return []
+        key = self._coord_key(x, y)
+        start = bisect_left(self._coord_keys, key)
+        end = bisect_right(self._coord_keys, key, start)
+        return sorted(self._coord_slots[start:end])
+
+    def route_table(self) -> tuple[array, array, array]:
+        """Get the routes as (offsets, targets, hop energy costs) arrays
+
+        The routes leaving index i are ``targets[offsets[i]:offsets[i + 1]]``,
+        sorted, and ``costs`` holds the energy each of those hops takes.
+        """
+        self._ensure_loaded()
+        if self._route_costs is None:
+            sources = np.repeat(np.arange(len(self._names)), np.diff(self._route_offsets))
+            targets = self._route_target_array
+            distances = np.abs(self._xs[targets] - self._xs[sources]) + np.abs(self._ys[targets] - self._ys[sources])
+            costs = np.floor(distances * self._kind_multipliers[self._route_code_array] + 1e-9).astype(np.int64)
+            self._route_costs = array("q", costs.tobytes())
+        return self._route_offsets, self._route_targets, self._route_costs
+
+    def bounds(self) -> tuple[int, int, int, int]:
+        """Get the map extent as (min_x, min_y, max_x, max_y)"""
+        self._ensure_loaded()
+        return self._bounds
+
+    @property
+    def dense(self) -> bool:
+        """Whether the map is small enough to keep the N x N matrices"""
+        self._ensure_loaded()
+        return len(self._names) <= MATRIX_MAX_LOCATIONS
+
+    def prepare(self) -> None:
+        """Load the tables now and build the name index, plus the matrices when the map is small enough"""
+        self._name_index()
+        if self.dense:
+            self.cost_matrix()
+
+    def _name_index(self) -> NameIndex:
+        self._ensure_loaded()
+        if self._name_lookup is None:
+            self._name_lookup = NameIndex(self._names)
+        return self._name_lookup
+
+    def find_location(self, name: str) -> tuple[Optional[LocationRow], list[LocationRow]]:
+        """Match a typed location name, allowing prefixes and typos
+
+        Returns the location, or None and up to ``NAME_SUGGESTIONS`` ranked
+        suggestions when the name is unknown or ambiguous.
+        """
+        match, suggestions = self._name_index().resolve(name, NAME_SUGGESTIONS)
+        if match is not None:
+            return self._locations[match], []
+        return None, [self._locations[i] for i in suggestions]
+
+    def _build_matrices(self) -> None:
+        """Build the all-pairs distance and energy-cost matrices"""
+        xs, ys = self._xs, self._ys
+        distance = np.abs(xs[:, None] - xs[None, :]) + np.abs(ys[:, None] - ys[None, :])
+
+        multiplier = np.ones(distance.shape, dtype=np.float64)
+        sources = np.repeat(np.arange(len(xs)), np.diff(np.frombuffer(self._route_offsets, dtype=np.int64)))
+        multiplier[sources, self._route_target_array] = self._kind_multipliers[self._route_code_array]
+
+        # Same truncation as hop_cost(), vectorized
+        self._distance_matrix = distance
+        self._cost_matrix = np.floor(distance * multiplier + 1e-9).astype(np.int64)
+
+    def distance_matrix(self) -> np.ndarray:
+        """Get the N x N Manhattan distance matrix, indexed like get_locations()"""
+        self._ensure_loaded()
+        if self._distance_matrix is None:
+            self._build_matrices()
+        return self._distance_matrix  # type: ignore
+
+    def cost_matrix(self) -> np.ndarray:
+        """Get the N x N energy-cost matrix, indexed like get_locations()"""
+        self._ensure_loaded()
+        if self._cost_matrix is None:
+            self._build_matrices()
+        return self._cost_matrix  # type: ignore
+
+    def index_of(self, location_id: int) -> int:
+        """Get the matrix index of a location id"""
+        self._ensure_loaded()
+        i = self._slot(location_id)
+        if i < 0:
+            raise KeyError(location_id)
+        return i
+
+    def distance_row(self, location_id: int) -> np.ndarray:
+        """Get the Manhattan distance from a location to every index"""
+        return self._distance_row(self.index_of(location_id))
+
+    def cost_row(self, location_id: int) -> np.ndarray:
+        """Get the direct-hop energy cost from a location to every index"""
+        return self._cost_row(self.index_of(location_id))
+
+    def _distance_row(self, i: int) -> np.ndarray:
+        if self.dense:
+            return self.distance_matrix()[i]
+        return np.abs(self._xs - self._xs[i]) + np.abs(self._ys - self._ys[i])
+
+    def _cost_row(self, i: int) -> np.ndarray:
+        if self.dense:
+            return self.cost_matrix()[i]
+        distance = self._distance_row(i)
+        row = distance.copy()
+        targets, multipliers = self._routes_from(i)
+        row[targets] = np.floor(distance[targets] * multipliers + 1e-9).astype(np.int64)
+        return row
+
+    def energy_cost(self, from_location_id: int, to_location_id: int) -> int:
+        """Get the energy cost of a direct hop between two locations"""
+        i = self.index_of(from_location_id)
+        j = self.index_of(to_location_id)
+        if self.dense:
+            return int(self.cost_matrix()[i, j])
+        distance = abs(int(self._xs[i]) - int(self._xs[j])) + abs(int(self._ys[i]) - int(self._ys[j]))
+        code = self._route_code(i, j)
+        return hop_cost(distance, float(self._kind_multipliers[code]) if code >= 0 else 1.0)
+
+    def _grid_index(self) -> GridIndex:
+        if self._grid is None:
+            self._grid = GridIndex(self._xs, self._ys)
+        return self._grid
+
+    def _candidates(self, i: int, energy: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get indices, distances and energy costs of locations within energy, by index"""
+        if self.dense:
+            costs = self._cost_row(i)
+            candidates = np.flatnonzero(costs <= energy)
+            return candidates, self._distance_row(i)[candidates], costs[candidates]
+
+        # Costs are truncated, so a hop is affordable while distance * multiplier < energy + 1;
+        # bound the search by the cheapest multiplier leaving this location
+        targets, multipliers = self._routes_from(i)
+        cheapest = min(1.0, float(multipliers.min())) if len(multipliers) else 1.0
+        radius = int(math.floor((energy + 1) / cheapest - 1e-9)) if cheapest > 0 else len(self._names)
+        candidates = self._grid_index().within(int(self._xs[i]), int(self._ys[i]), radius)
+        distances = np.abs(self._xs[candidates] - self._xs[i]) + np.abs(self._ys[candidates] - self._ys[i])
+        costs = distances.copy()
+        if len(targets):
+            # candidates is sorted, so the route targets inside it can be found by binary search
+            positions = np.searchsorted(candidates, targets)
+            hit = positions < len(candidates)
+            hit[hit] = candidates[positions[hit]] == targets[hit]
+            positions, multipliers = positions[hit], multipliers[hit]
+            costs[positions] = np.floor(distances[positions] * multipliers + 1e-9).astype(np.int64)
+        within = costs <= energy
+        return candidates[within], distances[within], costs[within]
+
+    def reachable(self, location_id: int, energy: int, include_self: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get indices, distances and energy costs of locations within energy, cheapest first"""
+        i = self.index_of(location_id)
+        candidates, distances, costs = self._candidates(i, energy)
+        if not include_self:
+            keep = candidates != i
+            candidates, distances, costs = candidates[keep], distances[keep], costs[keep]
+        # Stable sort keeps ties in location order
+        order = np.argsort(costs, kind="stable")
+        return candidates[order], distances[order], costs[order]
+
+    def reachable_indices(self, location_id: int, energy: int, include_self: bool = False) -> np.ndarray:
+        """Get location indices within energy, cheapest first"""
+        return self.reachable(location_id, energy, include_self)[0]